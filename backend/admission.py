@@ -0,0 +1,178 @@
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import g, jsonify, request
+
+
+class Overloaded(Exception):
+    """Raised when a request would not finish within the latency budget"""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f'Detection is overloaded ({reason}), retry later')
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def queued_seconds(header: str, now: float = None) -> float:
+    """
+    Time a request spent waiting before this worker picked it up
+
+    Reads nginx's ``X-Request-Start: t=<seconds.millis>`` (see nginx.conf);
+    millisecond and microsecond timestamps are accepted too.
+
+    Returns:
+        Seconds queued, 0 if the header is missing or unusable
+    """
+    if not header:
+        return 0.0
+    try:
+        started = float(header.strip().split('=', 1)[-1])
+    except ValueError:
+        return 0.0
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    now = time.time() if now is None else now
+    return max(0.0, now - started)
+
+
+class AdmissionController:
+    """
+    Admission control in front of the detector
+
+    Tracks requests in flight in this process and a moving average of how
+    long each one occupies the worker. A new request's latency is predicted as
+    the time it already spent queued in front of the worker, plus the work
+    ahead of it here, plus its own service time. If that exceeds the latency
+    budget the request is rejected immediately instead of timing out later
+    with its work wasted.
+    """
+
+    def __init__(self, latency_budget: float = 30.0, concurrency: int = 1, max_in_flight: int = 0,
+                 initial_service_time: float = 1.0, smoothing: float = 0.2, enabled: bool = True):
+        """
+        Initialize the controller
+
+        Args:
+            latency_budget: Seconds a detection request may take end to end
+            concurrency: Requests this process serves in parallel (gunicorn threads)
+            max_in_flight: Hard cap on requests in flight, 0 for none
+            initial_service_time: Service time assumed before the first observation
+            smoothing: Weight of the newest observation in the moving average
+            enabled: Admit everything when False, still counting
+        """
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = {'latency_budget': 0, 'max_in_flight': 0}
+        self.configure(latency_budget, concurrency, max_in_flight, initial_service_time, smoothing, enabled)
+
+    def configure(self, latency_budget: float = None, concurrency: int = None, max_in_flight: int = None,
+                  initial_service_time: float = None, smoothing: float = None, enabled: bool = None):
+        """Apply settings from the app config"""
+        with self._lock:
+            if latency_budget is not None:
+                self.latency_budget = latency_budget
+            if concurrency is not None:
+                self.concurrency = max(1, concurrency)
+            if max_in_flight is not None:
+                self.max_in_flight = max_in_flight
+            if initial_service_time is not None:
+                self.service_time = initial_service_time
+            if smoothing is not None:
+                self.smoothing = smoothing
+            if enabled is not None:
+                self.enabled = enabled
+
+    def predicted_latency(self, queued: float = 0.0) -> float:
+        """Predicted seconds until a request arriving now would be answered"""
+        ahead = self.in_flight / self.concurrency * self.service_time
+        return queued + ahead + self.service_time
+
+    def admit(self, queued: float = 0.0):
+        """
+        Admit a request or raise Overloaded
+
+        Every admitted request must be followed by release().
+        """
+        with self._lock:
+            reason = None
+            if self.enabled:
+                if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                    reason = 'max_in_flight'
+                elif self.predicted_latency(queued) > self.latency_budget:
+                    reason = 'latency_budget'
+            if reason is not None:
+                self.rejected[reason] += 1
+                # Roughly when enough of the backlog will have drained to fit the budget
+                excess = self.predicted_latency(queued) - self.latency_budget
+                retry_after = max(1, math.ceil(min(excess, self.latency_budget)))
+                raise Overloaded(reason, retry_after)
+            self.in_flight += 1
+            self.admitted += 1
+
+    def release(self, service_time: float = None):
+        """Finish an admitted request, folding its service time into the average if given"""
+        with self._lock:
+            self.in_flight -= 1
+            if service_time is not None:
+                self.service_time += self.smoothing * (service_time - self.service_time)
+
+    def stats(self) -> dict:
+        """Counters for the metrics endpoint"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'in_flight': self.in_flight,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+                'service_time_ms': round(self.service_time * 1000, 1),
+                'service_rate': round(self.concurrency / self.service_time, 3) if self.service_time > 0 else None,
+                'latency_budget': self.latency_budget
+            }
+
+
+def record_service_time(seconds: float):
+    """
+    Report how long the current request occupied the detector
+
+    Only the model call counts: waiting for a scheduler slot is queueing,
+    which predicted_latency already accounts for through in_flight.
+    """
+    g.admission_service_time = seconds
+
+
+def admission_controlled(f):
+    """
+    Decorator shedding load on an endpoint with 429 and Retry-After
+
+    The view reports its service time with record_service_time; requests that
+    do not (rejected input, results shared with a concurrent request) leave
+    the moving average alone.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        try:
+            admission.admit(queued_seconds(request.headers.get('X-Request-Start')))
+        except Overloaded as e:
+            response = jsonify({'error': 'Detection is at capacity, please retry shortly'})
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 429
+
+        service_time = None
+        try:
+            response = f(*args, **kwargs)
+            status = response[1] if isinstance(response, tuple) else getattr(response, 'status_code', 200)
+            if status < 400:
+                service_time = g.pop('admission_service_time', None)
+            return response
+        finally:
+            admission.release(service_time)
+    return decorated_function
+
+
+# Shared per-process controller, configured by create_app
+admission = AdmissionController()
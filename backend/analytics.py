@@ -0,0 +1,161 @@
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+GRANULARITIES = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1)
+}
+
+# Default window returned when no start is given
+DEFAULT_WINDOWS = {
+    'hour': timedelta(hours=48),
+    'day': timedelta(days=30)
+}
+
+CLASSES = ['REAL', 'DEEPFAKE']
+
+CONFIDENCE_BINS = 10
+
+# Upper edges (seconds) of the processing-time histogram, the last bin is open-ended
+LATENCY_EDGES = [0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 10.0]
+
+def bucket_start(timestamp: datetime, granularity: str) -> datetime:
+    """Truncate a timestamp to the start of its hour or day bucket"""
+    if granularity == 'day':
+        return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+def confidence_bin(confidence: float) -> int:
+    """Histogram bin (0-9) for a confidence in [0, 1]"""
+    return min(max(int(confidence * CONFIDENCE_BINS), 0), CONFIDENCE_BINS - 1)
+
+def latency_bin(processing_time) -> int:
+    """Histogram bin for a processing time, -1 when it was not recorded"""
+    if processing_time is None:
+        return -1
+    for index, edge in enumerate(LATENCY_EDGES):
+        if processing_time <= edge:
+            return index
+    return len(LATENCY_EDGES)
+
+def rollup_increments(records, sign: int = 1) -> Counter:
+    """
+    Compute rollup counter deltas for a set of detections
+
+    Args:
+        records: Dicts with user_id, created_at, prediction, confidence and processing_time
+        sign: 1 for inserted detections, -1 for deleted ones
+
+    Returns:
+        Counter keyed by (user_id, granularity, bucket_start, prediction,
+        confidence_bin, latency_bin)
+    """
+    increments = Counter()
+    for record in records:
+        created_at = record.get('created_at') or datetime.utcnow()
+        conf_bin = confidence_bin(record['confidence'])
+        lat_bin = latency_bin(record.get('processing_time'))
+        for granularity in GRANULARITIES:
+            key = (record['user_id'], granularity, bucket_start(created_at, granularity),
+                   record['prediction'], conf_bin, lat_bin)
+            increments[key] += sign
+    return increments
+
+def _parse_datetime(value: str) -> datetime:
+    """Parse an ISO date/datetime, converting an aware one to the naive UTC rollups are keyed by"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def parse_analytics_args(args):
+    """
+    Parse granularity and date-range query parameters
+
+    Returns:
+        Tuple of (granularity, start, end) with start/end aligned to buckets
+    """
+    granularity = args.get('granularity', 'day').lower()
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity '{granularity}', use 'hour' or 'day'")
+
+    try:
+        end = _parse_datetime(args['end']) if args.get('end') else datetime.utcnow()
+        start = _parse_datetime(args['start']) if args.get('start') else end - DEFAULT_WINDOWS[granularity]
+    except ValueError:
+        raise ValueError('Invalid start/end date, use ISO format (YYYY-MM-DD)')
+
+    start = bucket_start(start, granularity)
+    end = bucket_start(end, granularity) + GRANULARITIES[granularity]
+    if start >= end:
+        raise ValueError('start must be before end')
+    if (end - start) / GRANULARITIES[granularity] > 10000:
+        raise ValueError('Requested range has too many buckets')
+
+    return granularity, start, end
+
+def _percentile(histogram, total, fraction):
+    """Upper bound of the bin containing the given fraction of samples"""
+    threshold = fraction * total
+    running = 0
+    for index, count in enumerate(histogram):
+        running += count
+        if running >= threshold:
+            return LATENCY_EDGES[index] if index < len(LATENCY_EDGES) else None
+    return None
+
+def build_analytics(rows, granularity: str, start: datetime, end: datetime) -> dict:
+    """
+    Assemble the analytics response from rollup rows
+
+    Args:
+        rows: Iterable of (bucket_start, prediction, confidence_bin, latency_bin, count)
+        granularity: 'hour' or 'day'
+        start: First bucket (inclusive)
+        end: End of the range (exclusive)
+
+    Returns:
+        Per-bucket class counts, confidence histograms and processing-time percentiles
+    """
+    step = GRANULARITIES[granularity]
+    series = {}
+    bucket = start
+    while bucket < end:
+        series[bucket] = dict.fromkeys(CLASSES, 0)
+        bucket += step
+
+    confidence_hist = {name: [0] * CONFIDENCE_BINS for name in CLASSES}
+    latency_hist = [0] * (len(LATENCY_EDGES) + 1)
+
+    for bucket, prediction, conf_bin, lat_bin, count in rows:
+        if count <= 0 or bucket not in series:
+            continue
+        series[bucket][prediction] = series[bucket].get(prediction, 0) + count
+        confidence_hist.setdefault(prediction, [0] * CONFIDENCE_BINS)[conf_bin] += count
+        if lat_bin >= 0:
+            latency_hist[lat_bin] += count
+
+    timed = sum(latency_hist)
+    percentiles = {
+        name: _percentile(latency_hist, timed, fraction) if timed else None
+        for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p95', 0.95), ('p99', 0.99))
+    }
+
+    return {
+        'granularity': granularity,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'series': [
+            {'bucket': bucket.isoformat(), **counts, 'total': sum(counts.values())}
+            for bucket, counts in series.items()
+        ],
+        'confidence_histogram': {
+            'bins': [round(i / CONFIDENCE_BINS, 2) for i in range(CONFIDENCE_BINS + 1)],
+            **confidence_hist
+        },
+        'processing_time_histogram': {
+            'edges': LATENCY_EDGES,
+            'counts': latency_hist
+        },
+        'processing_time_percentiles': percentiles
+    }
@@ -1,10 +1,28 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import current_user, login_required
-from models import db, Detection
-from deepfake_detector import DeepfakeDetector
-from decorators import validate_file_upload, handle_exceptions
+from models import db, Detection, DetectionRollup, StoredFile, DetectionVersion
+from decorators import validate_file_upload, handle_exceptions, admin_required
+from admission import admission_controlled, record_service_time
+from model_loader import model_loader, model_required
+from model_registry import model_registry
+from cpu_topology import plan_from_config, apply_torch_plan
+from scheduler import scheduler, request_priority
+from singleflight import singleflight
+from write_buffer import DetectionWriteBuffer
+from export import parse_export_args, export_response
+from analytics import rollup_increments, parse_analytics_args, build_analytics
+from upload_store import UploadStore, file_references, streaming_request_class
+from image_io import load_image
+from renditions import RenditionBackfill, encode_thumbnail, save_thumbnail, ensure_thumbnail
+from delivery import deliver_file
+from http_cache import version_etag, conditional_json
+from vector_index import VectorIndex, pack_embedding
+from janitor import UploadJanitor, expiry_for
 import os
+import time
 import uuid
+from datetime import datetime
+from sqlalchemy import select
 from werkzeug.utils import secure_filename
 import logging
 
@@ -16,20 +34,269 @@ detection_bp = Blueprint('detection', __name__, url_prefix='/api/detection')
 # Initialize detector globally
 detector = None
 
-def init_detector(app):
-    """Initialize detector with app context"""
+def build_detector(config, version: str = None):
+    """
+    Build the detector for a registered model version
+    
+    Args:
+        config: App config
+        version: Registry version, None for the active one (or MODEL_PATH while the registry is empty)
+    """
+    registered = model_registry.get(version) if version else model_registry.active()
+    if version and registered is None:
+        raise ValueError(f'Model version {version} is not registered')
+    if registered is not None:
+        # Fails the load (or swap) if the weights were changed or truncated after registration
+        registered.verify()
+    
+    # torch and transformers are only imported here, off the startup path
+    apply_torch_plan(plan_from_config(config))
+    from deepfake_detector import DeepfakeDetector
+    return DeepfakeDetector(
+        model_path=registered.path if registered else config['MODEL_PATH'],
+        device=config['DEVICE'],
+        model_name=(registered and registered.model_name) or config['MODEL_NAME'],
+        warmup_batch_sizes=config['WARMUP_BATCH_SIZES'],
+        warmup_iterations=config['WARMUP_ITERATIONS'],
+        compile_mode=config['INFERENCE_COMPILE'] or None,
+        compile_cache_dir=config['COMPILE_CACHE_DIR'],
+        model_version=registered.version if registered else config['MODEL_VERSION']
+    )
+
+def _publish_detector(loaded):
+    """Swap the detector used by new requests, in-flight requests keep their reference"""
     global detector
-    detector = DeepfakeDetector(
-        model_path=app.config['MODEL_PATH'],
-        device=app.config['DEVICE']
+    detector = loaded
+
+def init_detector(app):
+    """Start loading the detector in the background, uploads answer 503 until it is ready"""
+    model_loader.start(
+        lambda: build_detector(app.config), _publish_detector,
+        retry_interval=app.config['MODEL_LOAD_RETRY_INTERVAL'],
+        background=app.config['MODEL_LOAD_IN_BACKGROUND']
+    )
+    if app.config['MODEL_REGISTRY_POLL_INTERVAL'] > 0:
+        # Follow versions activated through another worker or the registry CLI
+        model_loader.follow(
+            model_registry.active_version,
+            lambda version: lambda: build_detector(app.config, version),
+            app.config['MODEL_REGISTRY_POLL_INTERVAL']
+        )
+
+# Content-addressed upload storage
+upload_store = None
+
+def init_upload_store(app):
+    """Initialize the upload store under UPLOAD_FOLDER and stream uploads into it"""
+    global upload_store
+    upload_store = UploadStore(app.config['UPLOAD_FOLDER'])
+    # Hash uploads into the store's temp area while the body is received
+    app.request_class = streaming_request_class(upload_store)
+    
+    if app.config.get('THUMBNAIL_BACKFILL_ENABLED'):
+        def unpurged_uploads(after_id, limit):
+            """Keyset batch of (id, filename) of detections whose upload is still stored"""
+            with app.app_context():
+                try:
+                    table = Detection.__table__
+                    return db.session.execute(
+                        select(table.c.id, table.c.filename)
+                        .where(table.c.purged_at.is_(None), table.c.id > after_id)
+                        .order_by(table.c.id)
+                        .limit(limit)
+                    ).all()
+                finally:
+                    db.session.remove()
+        
+        # Render thumbnails for uploads stored before renditions existed, in one worker per host
+        RenditionBackfill(
+            upload_store, unpurged_uploads, app.config['THUMBNAIL_SIZE'], app.config['THUMBNAIL_QUALITY'],
+            lock_path=os.path.join(upload_store.temp_dir, 'rendition-backfill.lock')
+        ).start()
+
+def _write_detections(rows):
+    """Insert detection rows together with their rollup, stored-file reference and version updates"""
+    db.session.execute(Detection.__table__.insert(), rows)
+    DetectionRollup.apply(db.session, rollup_increments(rows))
+    StoredFile.acquire(db.session, file_references(rows))
+    DetectionVersion.bump(db.session, (row['user_id'] for row in rows))
+
+def _encode_thumbnail(image):
+    """Dashboard thumbnail of a decoded upload, None if encoding failed"""
+    try:
+        return encode_thumbnail(image, current_app.config['THUMBNAIL_SIZE'], current_app.config['THUMBNAIL_QUALITY'])
+    except Exception as e:
+        logger.warning(f"Thumbnail rendering failed, it will be rendered on first request: {e}")
+        return None
+
+def _finish_upload(staged, thumbnail):
+    """Callback(stored) moving an upload into place once its detection is stored, or discarding it"""
+    def finish(stored):
+        if not stored:
+            upload_store.discard(staged)
+            return
+        upload_store.commit(staged)
+        if thumbnail is not None:
+            try:
+                save_thumbnail(upload_store, staged.relpath, thumbnail)
+            except OSError as e:
+                logger.warning(f"Saving thumbnail failed, it will be rendered on first request: {e}")
+    return finish
+
+def _release_upload(content_hash, filename):
+    """Unlink a deleted detection's upload if it held the last reference"""
+    if not content_hash:
+        # Legacy flat upload owned by a single detection
+        upload_store.remove(filename)
+        return
+    
+    stored = db.session.get(StoredFile, content_hash)
+    if stored is None or stored.ref_count > 0:
+        return
+    upload_store.release(stored.path, lambda: StoredFile.drop_if_unreferenced(db.session, content_hash))
+
+# Per-user cosine similarity index over stored embeddings
+similarity_index = None
+
+def _load_embeddings(user_id):
+    """Embeddings of a user's detections, with the model version that produced each, for the similarity index"""
+    table = Detection.__table__
+    rows = db.session.execute(
+        select(table.c.id, table.c.embedding, table.c.model_version)
+        .where(table.c.user_id == user_id, table.c.embedding.isnot(None))
+    ).all()
+    return [row.id for row in rows], [row.embedding for row in rows], [row.model_version for row in rows]
+
+def _index_detections(rows):
+    """Append committed detection rows to the users' cached similarity partitions"""
+    if similarity_index is None:
+        return
+    by_user = {}
+    for row in rows:
+        by_user.setdefault(row['user_id'], []).append(row)
+    for user_id, user_rows in by_user.items():
+        # Only worth reading the version when the partition would otherwise be reloaded
+        if similarity_index.is_cached(user_id):
+            similarity_index.add(
+                user_id, DetectionVersion.current(db.session, user_id),
+                [row['id'] for row in user_rows], [row.get('embedding') for row in user_rows],
+                [row.get('model_version') for row in user_rows]
+            )
+
+def _unindex_detection(user_id, detection_id):
+    """Drop a deleted detection from the user's cached similarity partition"""
+    if similarity_index is not None and similarity_index.is_cached(user_id):
+        similarity_index.remove(user_id, DetectionVersion.current(db.session, user_id), detection_id)
+
+def init_similarity_index(app):
+    """Initialize the in-process similarity index"""
+    global similarity_index
+    similarity_index = VectorIndex(_load_embeddings, max_users=app.config['SIMILARITY_INDEX_MAX_USERS'])
+
+# Background janitor purging expired uploads
+janitor = None
+
+def init_janitor(app):
+    """Start the upload janitor if enabled in config"""
+    global janitor
+    if not app.config.get('JANITOR_ENABLED') or janitor is not None:
+        return
+
+    def sweep_expired_uploads(batch_size):
+        """Purge up to batch_size expired uploads using the expires_at index"""
+        with app.app_context():
+            try:
+                now = datetime.utcnow()
+                table = Detection.__table__
+                expired = db.session.execute(
+                    select(table.c.id, table.c.content_hash, table.c.filename)
+                    .where(table.c.expires_at <= now)
+                    .order_by(table.c.expires_at)
+                    .limit(batch_size)
+                ).all()
+
+                released = []
+                for detection_id, content_hash, filename in expired:
+                    # Claim the row so janitors in other workers skip it
+                    result = db.session.execute(
+                        table.update()
+                        .where(table.c.id == detection_id, table.c.expires_at.isnot(None))
+                        .values(expires_at=None, purged_at=now)
+                    )
+                    if result.rowcount:
+                        if content_hash:
+                            StoredFile.release(db.session, content_hash)
+                        released.append((content_hash, filename))
+                db.session.commit()
+
+                for content_hash, filename in released:
+                    _release_upload(content_hash, filename)
+                return len(expired)
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+    janitor = UploadJanitor(
+        sweep_expired_uploads,
+        interval=app.config['JANITOR_INTERVAL'],
+        batch_size=app.config['JANITOR_BATCH_SIZE']
     )
+    janitor.start()
+
+# Optional write-behind buffer for detection records
+write_buffer = None
+
+def init_write_buffer(app):
+    """Start the write-behind buffer if enabled in config"""
+    global write_buffer
+    if not app.config.get('WRITE_BEHIND_ENABLED') or write_buffer is not None:
+        return
+
+    def flush_detections(rows):
+        """Group-commit a batch of detection rows with a single executemany, returns the ids dropped"""
+        dropped = []
+        with app.app_context():
+            try:
+                _write_detections(rows)
+                db.session.commit()
+                _index_detections(rows)
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Batch insert failed, retrying rows individually: {e}")
+                for row in rows:
+                    try:
+                        _write_detections([row])
+                        db.session.commit()
+                        _index_detections([row])
+                    except Exception as row_error:
+                        db.session.rollback()
+                        logger.error(f"Dropping detection {row['id']}: {row_error}")
+                        dropped.append(row['id'])
+            finally:
+                db.session.remove()
+        return dropped
+
+    write_buffer = DetectionWriteBuffer(
+        flush_detections,
+        max_batch=app.config['WRITE_BEHIND_BATCH_SIZE'],
+        flush_interval_ms=app.config['WRITE_BEHIND_FLUSH_MS']
+    )
+
+def _detections_etag():
+    """ETag of the current user's detection data, read from the version counter"""
+    return version_etag(current_user.id, DetectionVersion.current(db.session, current_user.id))
 
 @detection_bp.route('/upload', methods=['POST'])
 @login_required
+@model_required
+@admission_controlled
 @validate_file_upload()
 @handle_exceptions
 def upload_and_detect():
     """Upload image and detect deepfake"""
+    staged = None
     try:
         logger.info("=== Upload request started ===")
         logger.info(f"User: {current_user.username}")
@@ -37,65 +304,88 @@ def upload_and_detect():
         file = request.files['file']
         logger.info(f"File received: {file.filename}")
         
-        # Get upload folder from config
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        logger.info(f"Upload folder: {upload_folder}")
-        
-        # Ensure upload folder exists
-        os.makedirs(upload_folder, exist_ok=True)
-        logger.info(f"Upload folder exists: {os.path.exists(upload_folder)}")
-        
-        # Generate unique filename
-        unique_id = str(uuid.uuid4())
-        ext = secure_filename(file.filename).rsplit('.', 1)[1].lower()
-        filename = f"{unique_id}.{ext}"
-        filepath = os.path.join(upload_folder, filename)
-        logger.info(f"Saving to: {filepath}")
+        # Claim the upload, hashed while it was received; identical bytes share one stored file
+        staged = upload_store.stage(file.stream)
+        logger.info(f"Upload staged: {staged.content_hash} ({staged.size} bytes)")
         
-        # Save uploaded file
-        file.save(filepath)
-        logger.info(f"File saved successfully")
+        # The whole request uses the detector current now, even if a new version is swapped in meanwhile
+        model = detector
         
-        # Verify file was saved
-        if not os.path.exists(filepath):
-            logger.error(f"File NOT saved: {filepath}")
-            raise Exception(f"Failed to save file at {filepath}")
-        
-        logger.info(f"File verification passed, size: {os.path.getsize(filepath)} bytes")
+        # Validate and decode once, oversized images are rejected from the header and
+        # large JPEGs are decoded at reduced resolution
+        image, _ = load_image(
+            staged.temp_path, current_app.config['MAX_IMAGE_PIXELS'], min_size=model.input_size
+        )
         
-        # Run detection
+        # Run detection once the fair-share scheduler grants this user a slot
         logger.info("Starting deepfake detection...")
-        prediction, confidence, processing_time = detector.detect(filepath)
-        logger.info(f"Detection result: {prediction}, confidence: {confidence}")
+        def infer():
+            with scheduler.slot(current_user.id, request_priority()) as waited:
+                started = time.perf_counter()
+                result = model.analyze(image)
+                # Admission control predicts queueing itself, it only wants the time on the model
+                record_service_time(time.perf_counter() - started)
+                return dict(result, queue_time=waited)
+        
+        # Identical concurrent uploads on the same model version share one inference, each still gets its own record
+        started = time.perf_counter()
+        result, shared = singleflight.do(f'{staged.content_hash}-{model.model_version}', infer)
+        # A shared result carries the leader's wait, this request waited for the shared inference instead
+        queue_time = time.perf_counter() - started if shared else result['queue_time']
+        prediction, confidence, processing_time = result['prediction'], result['confidence'], result['processing_time']
+        logger.info(f"Detection result: {prediction}, confidence: {confidence}, queued {queue_time:.3f}s"
+                    + (" (shared with a concurrent identical upload)" if shared else ""))
         
         # Save to database
-        detection = Detection(
+        created_at = datetime.utcnow()
+        record = dict(
             user_id=current_user.id,
-            filename=filename,
+            filename=staged.relpath,
             original_filename=secure_filename(file.filename),
             prediction=prediction,
             confidence=confidence,
-            processing_time=processing_time
+            processing_time=processing_time,
+            content_hash=staged.content_hash,
+            created_at=created_at,
+            expires_at=expiry_for(created_at, current_user.retention_days, current_app.config['UPLOAD_RETENTION_DAYS']),
+            probabilities=result['probabilities'],
+            embedding=pack_embedding(result['embedding']),
+            model_version=model.model_version
         )
-        
-        db.session.add(detection)
-        db.session.commit()
-        logger.info(f"Detection record saved with ID: {detection.id}")
-        
+
+        # Encode the dashboard thumbnail while the image is still decoded
+        thumbnail = _encode_thumbnail(image)
+
+        if write_buffer is not None:
+            # Id is returned now, the row is group-committed by the buffer, which then
+            # moves the bytes into place (or discards them if the row was dropped)
+            detection_id = write_buffer.submit(record, _finish_upload(staged, thumbnail))
+            logger.info(f"Detection record queued with ID: {detection_id}")
+        else:
+            record['id'] = str(uuid.uuid4())
+            _write_detections([record])
+            db.session.commit()
+            _index_detections([record])
+            detection_id = record['id']
+            logger.info(f"Detection record saved with ID: {detection_id}")
+            # The reference is recorded, now move the bytes into place
+            _finish_upload(staged, thumbnail)(True)
+
         return jsonify({
-            'detection_id': detection.id,
+            'detection_id': detection_id,
             'prediction': prediction,
             'confidence': round(confidence, 4),
             'processing_time': round(processing_time, 2),
+            'queue_time': round(queue_time, 3),
+            'model_version': model.model_version,
             'filename': file.filename,
             'message': f'Image classified as {prediction.upper()}'
         }), 200
     
     except Exception as e:
         logger.error(f"Upload error: {str(e)}", exc_info=True)
-        # Clean up uploaded file if detection fails
-        if 'filepath' in locals() and os.path.exists(filepath):
-            os.remove(filepath)
+        # Clean up staged file if detection fails
+        upload_store.discard(staged)
         db.session.rollback()
         raise
 
@@ -112,42 +402,135 @@ def get_history():
         if page < 1 or limit < 1 or limit > 100:
             return jsonify({'error': 'Invalid pagination parameters'}), 400
         
-        # Query detections
-        paginated = Detection.query.filter_by(user_id=current_user.id).order_by(
-            Detection.created_at.desc()
-        ).paginate(page=page, per_page=limit)
-        
-        detections = [d.to_dict() for d in paginated.items]
+        def build():
+            # Query detections
+            paginated = Detection.query.filter_by(user_id=current_user.id).order_by(
+                Detection.created_at.desc()
+            ).paginate(page=page, per_page=limit)
+            
+            return {
+                'detections': [d.to_dict() for d in paginated.items],
+                'total': paginated.total,
+                'pages': paginated.pages,
+                'current_page': page
+            }
         
-        return jsonify({
-            'detections': detections,
-            'total': paginated.total,
-            'pages': paginated.pages,
-            'current_page': page
-        }), 200
+        # Unchanged history is answered with 304 from the version counter alone
+        return conditional_json(_detections_etag(), build)
     
     except Exception as e:
         raise
 
+@detection_bp.route('/export', methods=['GET'])
+@login_required
+@handle_exceptions
+def export_history():
+    """Stream detection history as NDJSON or CSV"""
+    fmt, start, end = parse_export_args(request.args)
+    
+    query = Detection.query.filter_by(user_id=current_user.id)
+    if start:
+        query = query.filter(Detection.created_at >= start)
+    if end:
+        query = query.filter(Detection.created_at < end)
+    
+    # yield_per keeps a server-side cursor open instead of loading every row
+    query = query.order_by(Detection.created_at.asc()).yield_per(500)
+    
+    return export_response((detection.to_dict() for detection in query), fmt)
+
 @detection_bp.route('/details/<detection_id>', methods=['GET'])
 @login_required
 @handle_exceptions
 def get_detection_details(detection_id):
     """Get details of a specific detection"""
     try:
-        detection = Detection.query.filter_by(
-            id=detection_id,
-            user_id=current_user.id
-        ).first()
-        
-        if not detection:
-            return jsonify({'error': 'Detection not found'}), 404
+        def build():
+            detection = Detection.query.filter_by(
+                id=detection_id,
+                user_id=current_user.id
+            ).first()
+            
+            if not detection:
+                return jsonify({'error': 'Detection not found'}), 404
+            
+            return detection.to_dict()
         
-        return jsonify(detection.to_dict()), 200
+        return conditional_json(_detections_etag(), build)
     
     except Exception as e:
         raise
 
+@detection_bp.route('/thumbnail/<detection_id>', methods=['GET'])
+@login_required
+@handle_exceptions
+def get_thumbnail(detection_id):
+    """Serve the cached WebP thumbnail of a detection's upload"""
+    detection = Detection.query.filter_by(id=detection_id, user_id=current_user.id).first()
+    if not detection or detection.purged_at is not None:
+        return jsonify({'error': 'Thumbnail not found'}), 404
+    
+    size = current_app.config['THUMBNAIL_SIZE']
+    path = ensure_thumbnail(upload_store, detection.filename, size, current_app.config['THUMBNAIL_QUALITY'])
+    if path is None:
+        return jsonify({'error': 'Thumbnail not found'}), 404
+    
+    # Content-addressed uploads never change, so the ETag only depends on the bytes and size
+    response = deliver_file(
+        upload_store, upload_store.rendition_path(detection.filename), mimetype='image/webp',
+        etag=f'{detection.content_hash or detection_id}-{size}', max_age=current_app.config['THUMBNAIL_MAX_AGE']
+    )
+    response.cache_control.immutable = True
+    return response
+
+@detection_bp.route('/file/<detection_id>', methods=['GET'])
+@login_required
+@handle_exceptions
+def download_upload(detection_id):
+    """Serve the original upload of a detection, via nginx when X-Accel-Redirect is enabled"""
+    detection = Detection.query.filter_by(id=detection_id, user_id=current_user.id).first()
+    if not detection or detection.purged_at is not None:
+        return jsonify({'error': 'File not found'}), 404
+    
+    try:
+        return deliver_file(
+            upload_store, detection.filename,
+            etag=detection.content_hash or detection_id,
+            max_age=current_app.config['THUMBNAIL_MAX_AGE'],
+            download_name=detection.original_filename,
+            as_attachment=request.args.get('download', type=int) == 1
+        )
+    except FileNotFoundError:
+        return jsonify({'error': 'File not found'}), 404
+
+@detection_bp.route('/<detection_id>/similar', methods=['GET'])
+@login_required
+@handle_exceptions
+def get_similar(detection_id):
+    """Find the current user's past detections most similar to one of theirs"""
+    k = request.args.get('k', 10, type=int)
+    if k < 1 or k > 100:
+        return jsonify({'error': 'k must be between 1 and 100'}), 400
+    
+    version = DetectionVersion.current(db.session, current_user.id)
+    
+    def build():
+        # Embeddings come from the in-process index, only the matches are read back
+        matches = similarity_index.search(current_user.id, version, detection_id, k)
+        if matches is None:
+            return jsonify({'error': 'Detection not found or has no embedding'}), 404
+        
+        found = {d.id: d for d in Detection.query.filter(Detection.id.in_([i for i, _ in matches]))}
+        return {
+            'detection_id': detection_id,
+            'similar': [
+                dict(found[match_id].to_dict(), similarity=round(score, 4))
+                for match_id, score in matches if match_id in found
+            ]
+        }
+    
+    return conditional_json(version_etag(current_user.id, version), build)
+
 @detection_bp.route('/delete/<detection_id>', methods=['DELETE'])
 @login_required
 @handle_exceptions
@@ -162,14 +545,22 @@ def delete_detection(detection_id):
         if not detection:
             return jsonify({'error': 'Detection not found'}), 404
         
-        # Delete uploaded image file
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], detection.filename)
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        content_hash, filename = detection.content_hash, detection.filename
+        # A purged detection already gave up its upload reference
+        holds_upload = detection.purged_at is None
         
         # Delete database record
+        DetectionRollup.apply(db.session, rollup_increments([detection.to_record()], sign=-1))
+        if content_hash and holds_upload:
+            StoredFile.release(db.session, content_hash)
+        DetectionVersion.bump(db.session, [current_user.id])
         db.session.delete(detection)
         db.session.commit()
+        _unindex_detection(current_user.id, detection_id)
+        
+        # Delete uploaded image file once nothing references it
+        if holds_upload:
+            _release_upload(content_hash, filename)
         
         return jsonify({'message': 'Detection deleted successfully'}), 200
     
@@ -183,26 +574,91 @@ def delete_detection(detection_id):
 def get_stats():
     """Get detection statistics for current user"""
     try:
-        total_detections = Detection.query.filter_by(user_id=current_user.id).count()
-        real_count = Detection.query.filter_by(
-            user_id=current_user.id,
-            prediction='REAL'
-        ).count()
-        deepfake_count = Detection.query.filter_by(
-            user_id=current_user.id,
-            prediction='DEEPFAKE'
-        ).count()
-        
-        avg_confidence = db.session.query(db.func.avg(Detection.confidence)).filter_by(
-            user_id=current_user.id
-        ).scalar() or 0
+        def build():
+            total_detections = Detection.query.filter_by(user_id=current_user.id).count()
+            real_count = Detection.query.filter_by(
+                user_id=current_user.id,
+                prediction='REAL'
+            ).count()
+            deepfake_count = Detection.query.filter_by(
+                user_id=current_user.id,
+                prediction='DEEPFAKE'
+            ).count()
+            
+            avg_confidence = db.session.query(db.func.avg(Detection.confidence)).filter_by(
+                user_id=current_user.id
+            ).scalar() or 0
+            
+            return {
+                'total_detections': total_detections,
+                'real_images': real_count,
+                'deepfake_images': deepfake_count,
+                'average_confidence': round(float(avg_confidence), 4)
+            }
         
-        return jsonify({
-            'total_detections': total_detections,
-            'real_images': real_count,
-            'deepfake_images': deepfake_count,
-            'average_confidence': round(float(avg_confidence), 4)
-        }), 200
+        return conditional_json(_detections_etag(), build)
     
     except Exception as e:
         raise
+
+@detection_bp.route('/analytics', methods=['GET'])
+@login_required
+@handle_exceptions
+def get_analytics():
+    """Get per-hour/day class counts, confidence histograms and latency percentiles"""
+    granularity, start, end = parse_analytics_args(request.args)
+    
+    rows = db.session.query(
+        DetectionRollup.bucket_start,
+        DetectionRollup.prediction,
+        DetectionRollup.confidence_bin,
+        DetectionRollup.latency_bin,
+        DetectionRollup.count
+    ).filter(
+        DetectionRollup.user_id == current_user.id,
+        DetectionRollup.granularity == granularity,
+        DetectionRollup.bucket_start >= start,
+        DetectionRollup.bucket_start < end
+    ).all()
+    
+    return jsonify(build_analytics(rows, granularity, start, end)), 200
+
+@detection_bp.route('/models', methods=['GET'])
+@login_required
+@admin_required
+def list_models():
+    """List registered model versions, the active one and this worker's serving version"""
+    return jsonify({
+        'active': model_registry.active_version(),
+        'serving': model_loader.version,
+        'swap': model_loader.swap_status,
+        'versions': [model.to_dict() for model in model_registry.versions()]
+    }), 200
+
+@detection_bp.route('/models/<version>/activate', methods=['POST'])
+@login_required
+@admin_required
+@handle_exceptions
+def activate_model(version):
+    """Load and warm up a registered model version in the background, then swap it in"""
+    if model_registry.get(version) is None:
+        return jsonify({'error': 'Model version not found'}), 404
+    
+    if version == model_loader.version:
+        model_registry.activate(version)
+        return jsonify({'message': f'Model version {version} is already being served', 'serving': version}), 200
+    
+    config = current_app.config
+    started = model_loader.swap(
+        lambda: build_detector(config, version), version,
+        # Other workers follow the manifest once this one has proven the version loads
+        on_swapped=lambda _: model_registry.activate(version)
+    )
+    if not started:
+        return jsonify({'error': 'The model is still loading or another version is being swapped in'}), 409
+    
+    return jsonify({
+        'message': f'Loading model version {version}, it is swapped in after its warm-up',
+        'serving': model_loader.version,
+        'swap': model_loader.swap_status
+    }), 202
@@ -9,9 +9,20 @@ from werkzeug.exceptions import BadRequest
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import config
-from models import db, User
+from models import db, User, ApiKey, upgrade_schema
 from auth import auth_bp
-from api_routes import detection_bp, init_detector
+from decorators import login_required, admin_required
+from api_routes import detection_bp, init_detector, init_write_buffer, init_upload_store, init_janitor, init_similarity_index
+from sqlite_profile import is_file_sqlite, sqlite_engine_options, init_sqlite_profile
+from user_cache import user_cache
+from api_keys import api_key_cache, api_key_secret, authenticate
+from password_hasher import password_hasher
+from admission import admission
+from scheduler import scheduler
+from singleflight import singleflight
+from model_loader import model_loader
+from model_registry import model_registry
+from cpu_topology import plan_from_config, apply_process_plan
 
 def create_app(config_name='development'):
     """Application factory"""
@@ -23,7 +34,13 @@ def create_app(config_name='development'):
     config[config_name].init_app(app)
     
     # Initialize extensions
+    if app.config.get('SQLITE_MANAGED') and is_file_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+            **sqlite_engine_options(app),
+            **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        }
     db.init_app(app)
+    init_sqlite_profile(app, db)
     CORS(app, supports_credentials=True)
     
     # Initialize Flask-Login
@@ -31,9 +48,52 @@ def create_app(config_name='development'):
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
     
+    # Take this worker's share of the CPU before the model loader imports torch
+    thread_plan = plan_from_config(app.config)
+    apply_process_plan(thread_plan)
+    
+    user_cache.configure(ttl=app.config['USER_CACHE_TTL'], max_size=app.config['USER_CACHE_MAX_SIZE'])
+    api_key_cache.configure(ttl=app.config['API_KEY_CACHE_TTL'], max_size=app.config['API_KEY_CACHE_MAX_SIZE'])
+    password_hasher.configure(
+        max_workers=app.config['PASSWORD_HASH_WORKERS'], queue_size=app.config['PASSWORD_HASH_QUEUE_SIZE'],
+        method=app.config['PASSWORD_HASH_METHOD'], timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+        slot_dir=os.path.join(app.config['UPLOAD_FOLDER'], 'tmp', 'password-hash')
+    )
+    admission.configure(
+        latency_budget=app.config['ADMISSION_LATENCY_BUDGET'], concurrency=app.config['ADMISSION_CONCURRENCY'],
+        max_in_flight=app.config['ADMISSION_MAX_IN_FLIGHT'], enabled=app.config['ADMISSION_ENABLED']
+    )
+    scheduler.configure(
+        concurrency=app.config['INFERENCE_CONCURRENCY'],
+        class_weights={'interactive': app.config['SCHEDULER_INTERACTIVE_WEIGHT'], 'bulk': app.config['SCHEDULER_BULK_WEIGHT']}
+    )
+    singleflight.configure(
+        lock_dir=os.path.join(app.config['UPLOAD_FOLDER'], 'tmp', 'inflight') if app.config['SINGLEFLIGHT_CROSS_WORKER'] else None,
+        result_ttl=app.config['SINGLEFLIGHT_RESULT_TTL'], enabled=app.config['SINGLEFLIGHT_ENABLED']
+    )
+    model_registry.configure(app.config['MODEL_REGISTRY_DIR'])
+    
+    def fetch_user(user_id):
+        user = User.query.get(user_id)
+        return user.detached_copy() if user else None
+    
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(user_id)
+        cached = user_cache.get(user_id, lambda: fetch_user(user_id))
+        if cached is None:
+            return None
+        # Attach a copy to this request's session without querying the database
+        return db.session.merge(cached, load=False)
+    
+    @login_manager.request_loader
+    def load_user_from_api_key(request):
+        # Machine clients send an API key instead of a session cookie
+        user_id = authenticate(
+            request.headers.get('Authorization'), api_key_secret(app.config),
+            lambda prefix, key_hash: ApiKey.verify(db.session, prefix, key_hash)
+        )
+        user = load_user(user_id) if user_id is not None else None
+        return user if user is not None and user.is_active else None
     
     # Request handler for JSON parsing errors
     @app.before_request
@@ -48,7 +108,12 @@ def create_app(config_name='development'):
     # Initialize database
     with app.app_context():
         db.create_all()
+        upgrade_schema()
         init_detector(app)
+    init_upload_store(app)
+    init_write_buffer(app)
+    init_janitor(app)
+    init_similarity_index(app)
     
     # Routes
     @app.route('/')
@@ -71,11 +136,41 @@ def create_app(config_name='development'):
         """Dashboard page"""
         return render_template('dashboard.html')
     
+    @app.route('/api/health/live', methods=['GET'])
+    def liveness():
+        """Liveness probe: the process is up and serving requests"""
+        return jsonify({'status': 'alive'}), 200
+    
+    @app.route('/api/health/ready', methods=['GET'])
+    def readiness():
+        """Readiness probe: the detector is loaded and passed its warm-up inference"""
+        ready = model_loader.ready
+        return jsonify({
+            'status': 'ready' if ready else 'not ready',
+            'model': model_loader.status()
+        }), 200 if ready else 503
+    
     @app.route('/api/health', methods=['GET'])
     def health_check():
-        """Health check endpoint"""
+        """Health check endpoint (liveness, see /api/health/ready for the model)"""
         return jsonify({'status': 'healthy'}), 200
     
+    @app.route('/api/metrics', methods=['GET'])
+    @login_required
+    @admin_required
+    def metrics():
+        """Runtime metrics endpoint, administrators only (scheduler stats list users)"""
+        return jsonify({
+            'user_cache': user_cache.stats(),
+            'api_key_cache': api_key_cache.stats(),
+            'password_hasher': password_hasher.stats(),
+            'admission': admission.stats(),
+            'scheduler': scheduler.stats(),
+            'singleflight': singleflight.stats(),
+            'model': model_loader.status(),
+            'thread_plan': thread_plan.to_dict()
+        }), 200
+    
     # Error handlers
     @app.errorhandler(404)
     def not_found(error):
@@ -1,8 +1,18 @@
 import os
 from flask import Flask, render_template, request, jsonify, redirect, url_for
 from flask_login import LoginManager, current_user
+from decorators import login_required, admin_required
 from flask_cors import CORS
 from config import config
+from user_cache import user_cache
+from api_keys import api_key_cache, api_key_secret, authenticate
+from password_hasher import password_hasher
+from admission import admission
+from scheduler import scheduler
+from singleflight import singleflight
+from model_loader import model_loader
+from model_registry import model_registry
+from cpu_topology import plan_from_config, apply_process_plan
 
 # Initialize extensions (will be configured in create_app)
 login_manager = LoginManager()
@@ -19,6 +29,31 @@ def create_app(config_name=None):
     # Enable CORS
     CORS(app)
     
+    # Take this worker's share of the CPU before the model loader imports torch
+    thread_plan = plan_from_config(app.config)
+    apply_process_plan(thread_plan)
+    
+    user_cache.configure(ttl=app.config['USER_CACHE_TTL'], max_size=app.config['USER_CACHE_MAX_SIZE'])
+    api_key_cache.configure(ttl=app.config['API_KEY_CACHE_TTL'], max_size=app.config['API_KEY_CACHE_MAX_SIZE'])
+    password_hasher.configure(
+        max_workers=app.config['PASSWORD_HASH_WORKERS'], queue_size=app.config['PASSWORD_HASH_QUEUE_SIZE'],
+        method=app.config['PASSWORD_HASH_METHOD'], timeout=app.config['PASSWORD_HASH_TIMEOUT'],
+        slot_dir=os.path.join(app.config['UPLOAD_FOLDER'], 'tmp', 'password-hash')
+    )
+    admission.configure(
+        latency_budget=app.config['ADMISSION_LATENCY_BUDGET'], concurrency=app.config['ADMISSION_CONCURRENCY'],
+        max_in_flight=app.config['ADMISSION_MAX_IN_FLIGHT'], enabled=app.config['ADMISSION_ENABLED']
+    )
+    scheduler.configure(
+        concurrency=app.config['INFERENCE_CONCURRENCY'],
+        class_weights={'interactive': app.config['SCHEDULER_INTERACTIVE_WEIGHT'], 'bulk': app.config['SCHEDULER_BULK_WEIGHT']}
+    )
+    singleflight.configure(
+        lock_dir=os.path.join(app.config['UPLOAD_FOLDER'], 'tmp', 'inflight') if app.config['SINGLEFLIGHT_CROSS_WORKER'] else None,
+        result_ttl=app.config['SINGLEFLIGHT_RESULT_TTL'], enabled=app.config['SINGLEFLIGHT_ENABLED']
+    )
+    model_registry.configure(app.config['MODEL_REGISTRY_DIR'])
+    
     # Determine database type
     db_type = app.config.get('DB_TYPE', 'sqlite').lower()
     
@@ -38,24 +73,43 @@ def create_app(config_name=None):
             raise
         
         # Register MongoDB login manager
-        from mongo_models import MongoUser
+        from mongo_models import MongoUser, MongoApiKey
+        
+        def fetch_user(user_id):
+            user = MongoUser.objects(id=user_id).first()
+            return user.to_mongo() if user else None
         
         @login_manager.user_loader
         def load_user(user_id):
             try:
-                return MongoUser.objects(id=user_id).first()
+                son = user_cache.get(user_id, lambda: fetch_user(user_id))
+                # Rebuild per request so callers never mutate the shared cached copy
+                return MongoUser._from_son(son) if son is not None else None
             except:
                 return None
         
+        @login_manager.request_loader
+        def load_user_from_api_key(request):
+            # Machine clients send an API key instead of a session cookie
+            user_id = authenticate(
+                request.headers.get('Authorization'), api_key_secret(app.config), MongoApiKey.verify
+            )
+            user = load_user(user_id) if user_id is not None else None
+            return user if user is not None and user.is_active else None
+        
         # Register blueprints for MongoDB
         from auth_mongo import auth_mongo_bp
-        from api_routes_mongo import detection_mongo_bp, init_detector
+        from api_routes_mongo import detection_mongo_bp, init_detector, init_write_buffer, init_upload_store, init_janitor, init_similarity_index
         
         app.register_blueprint(auth_mongo_bp)
         app.register_blueprint(detection_mongo_bp)
         
         # Initialize detector
         init_detector(app)
+        init_upload_store(app)
+        init_write_buffer(app)
+        init_janitor(app)
+        init_similarity_index(app)
         
     else:
         # SQLite initialization
@@ -67,21 +121,40 @@ def create_app(config_name=None):
             db.create_all()
         
         # Register SQLite login manager
-        from models import User
+        from models import User, ApiKey
+        
+        def fetch_user(user_id):
+            user = User.query.get(user_id)
+            return user.detached_copy() if user else None
         
         @login_manager.user_loader
         def load_user(user_id):
-            return User.query.get(int(user_id))
+            cached = user_cache.get(user_id, lambda: fetch_user(user_id))
+            return db.session.merge(cached, load=False) if cached is not None else None
+        
+        @login_manager.request_loader
+        def load_user_from_api_key(request):
+            # Machine clients send an API key instead of a session cookie
+            user_id = authenticate(
+                request.headers.get('Authorization'), api_key_secret(app.config),
+                lambda prefix, key_hash: ApiKey.verify(db.session, prefix, key_hash)
+            )
+            user = load_user(user_id) if user_id is not None else None
+            return user if user is not None and user.is_active else None
         
         # Register blueprints for SQLite
         from auth import auth_bp
-        from api_routes import detection_bp, init_detector
+        from api_routes import detection_bp, init_detector, init_write_buffer, init_upload_store, init_janitor, init_similarity_index
         
         app.register_blueprint(auth_bp)
         app.register_blueprint(detection_bp)
         
         # Initialize detector
         init_detector(app)
+        init_upload_store(app)
+        init_write_buffer(app)
+        init_janitor(app)
+        init_similarity_index(app)
     
     # Initialize LoginManager
     login_manager.init_app(app)
@@ -113,15 +186,45 @@ def create_app(config_name=None):
         """Dashboard page"""
         return render_template('dashboard.html', user=current_user)
     
+    @app.route('/api/health/live', methods=['GET'])
+    def liveness():
+        """Liveness probe: the process is up and serving requests"""
+        return jsonify({'status': 'alive'}), 200
+    
+    @app.route('/api/health/ready', methods=['GET'])
+    def readiness():
+        """Readiness probe: the detector is loaded and passed its warm-up inference"""
+        ready = model_loader.ready
+        return jsonify({
+            'status': 'ready' if ready else 'not ready',
+            'model': model_loader.status()
+        }), 200 if ready else 503
+    
     @app.route('/api/health', methods=['GET'])
     def health_check():
-        """Health check endpoint"""
+        """Health check endpoint (liveness, see /api/health/ready for the model)"""
         return jsonify({
             'status': 'healthy',
             'database': db_type,
             'message': f'Deepfake Detector API running on {db_type}'
         }), 200
     
+    @app.route('/api/metrics', methods=['GET'])
+    @login_required
+    @admin_required
+    def metrics():
+        """Runtime metrics endpoint, administrators only (scheduler stats list users)"""
+        return jsonify({
+            'user_cache': user_cache.stats(),
+            'api_key_cache': api_key_cache.stats(),
+            'password_hasher': password_hasher.stats(),
+            'admission': admission.stats(),
+            'scheduler': scheduler.stats(),
+            'singleflight': singleflight.stats(),
+            'model': model_loader.status(),
+            'thread_plan': thread_plan.to_dict()
+        }), 200
+    
     # Error handlers
     @app.errorhandler(400)
     def bad_request(error):
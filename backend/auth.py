@@ -1,6 +1,9 @@
-from flask import Blueprint, request, jsonify, render_template, redirect, url_for
+from flask import Blueprint, request, jsonify, render_template, redirect, url_for, current_app
 from flask_login import login_user, logout_user, current_user
-from models import db, User
+from models import db, User, Detection, ApiKey
+from password_hasher import HasherBusy
+from api_keys import api_key_cache, api_key_secret, generate_api_key, hash_api_key, is_api_key_request
+from datetime import datetime
 import re
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/auth')
@@ -20,6 +23,20 @@ def validate_password(password):
         return False, "Password must contain at least one digit"
     return True, ""
 
+def validate_retention_days(value):
+    """Validate an upload retention policy (null = server default, 0 = keep forever)"""
+    if value is None:
+        return True, ""
+    if isinstance(value, bool) or not isinstance(value, int) or not 0 <= value <= 3650:
+        return False, "retention_days must be null or an integer between 0 and 3650"
+    return True, ""
+
+def hashing_busy(error):
+    """Fast rejection while password hashing is saturated"""
+    response = jsonify({'error': 'Too many sign-in attempts in progress, please retry shortly'})
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new user"""
@@ -76,6 +93,9 @@ def register():
             'username': user.username
         }), 201
     
+    except HasherBusy as e:
+        return hashing_busy(e)
+    
     except Exception as e:
         print(f"Registration error: {str(e)}")
         db.session.rollback()
@@ -111,6 +131,10 @@ def login():
         if not user.is_active:
             return jsonify({'error': 'Account is disabled'}), 403
         
+        # Upgrade hashes made with an older method or work factor
+        if user.rehash_password(password):
+            db.session.commit()
+        
         login_user(user, remember=data.get('remember', False))
         
         return jsonify({
@@ -120,6 +144,9 @@ def login():
             'email': user.email
         }), 200
     
+    except HasherBusy as e:
+        return hashing_busy(e)
+    
     except Exception as e:
         return jsonify({'error': f'Login failed: {str(e)}'}), 500
 
@@ -173,6 +200,126 @@ def change_password():
         
         return jsonify({'message': 'Password changed successfully'}), 200
     
+    except HasherBusy as e:
+        return hashing_busy(e)
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': f'Failed to change password: {str(e)}'}), 500
+
+@auth_bp.route('/retention', methods=['GET'])
+def get_retention():
+    """Get the upload retention policy of the current user"""
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    return jsonify({
+        'retention_days': current_user.retention_days,
+        'default_retention_days': current_app.config['UPLOAD_RETENTION_DAYS']
+    }), 200
+
+@auth_bp.route('/retention', methods=['PUT'])
+def set_retention():
+    """Set the upload retention policy and reschedule existing uploads"""
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict) or 'retention_days' not in data:
+            return jsonify({'error': 'retention_days is required'}), 400
+        
+        retention_days = data['retention_days']
+        valid, message = validate_retention_days(retention_days)
+        if not valid:
+            return jsonify({'error': message}), 400
+        
+        current_user.retention_days = retention_days
+        db.session.commit()
+        
+        # Existing uploads follow the new policy
+        rescheduled = Detection.reschedule_expiry(
+            db.session, current_user.id, retention_days, current_app.config['UPLOAD_RETENTION_DAYS']
+        )
+        
+        return jsonify({
+            'message': 'Retention policy updated',
+            'retention_days': retention_days,
+            'rescheduled': rescheduled
+        }), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to update retention policy: {str(e)}'}), 500
+
+@auth_bp.route('/api-keys', methods=['GET'])
+def list_api_keys():
+    """List the current user's API keys"""
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Authentication required'}), 401
+    
+    keys = ApiKey.query.filter_by(user_id=current_user.id).order_by(ApiKey.created_at.desc()).all()
+    return jsonify({'api_keys': [key.to_dict() for key in keys]}), 200
+
+@auth_bp.route('/api-keys', methods=['POST'])
+def create_api_key():
+    """Create an API key, the key itself is only returned in this response"""
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Authentication required'}), 401
+    if is_api_key_request():
+        return jsonify({'error': 'API keys can only be managed from a login session'}), 403
+    
+    try:
+        data = request.get_json(silent=True) or {}
+        name = str(data.get('name') or 'API key').strip()
+        if not name or len(name) > 80:
+            return jsonify({'error': 'name must be between 1 and 80 characters'}), 400
+        
+        active = ApiKey.query.filter_by(user_id=current_user.id, revoked_at=None).count()
+        if active >= current_app.config['API_KEY_MAX_PER_USER']:
+            return jsonify({'error': 'Too many active API keys, revoke one first'}), 409
+        
+        key, prefix = generate_api_key()
+        api_key = ApiKey(
+            user_id=current_user.id,
+            name=name,
+            prefix=prefix,
+            key_hash=hash_api_key(key, api_key_secret(current_app.config))
+        )
+        db.session.add(api_key)
+        db.session.commit()
+        
+        return jsonify({
+            'message': 'API key created, store it now since it cannot be shown again',
+            'key': key,
+            'api_key': api_key.to_dict()
+        }), 201
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to create API key: {str(e)}'}), 500
+
+@auth_bp.route('/api-keys/<key_id>', methods=['DELETE'])
+def revoke_api_key(key_id):
+    """Revoke an API key"""
+    if not current_user.is_authenticated:
+        return jsonify({'error': 'Authentication required'}), 401
+    if is_api_key_request():
+        return jsonify({'error': 'API keys can only be managed from a login session'}), 403
+    
+    try:
+        api_key = ApiKey.query.filter_by(id=key_id, user_id=current_user.id).first()
+        if not api_key:
+            return jsonify({'error': 'API key not found'}), 404
+        
+        if api_key.revoked_at is None:
+            api_key.revoked_at = datetime.utcnow()
+            db.session.commit()
+        # Other workers keep accepting the key until their cache entry expires
+        api_key_cache.invalidate(api_key.key_hash)
+        
+        return jsonify({'message': 'API key revoked', 'api_key': api_key.to_dict()}), 200
+    
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': f'Failed to revoke API key: {str(e)}'}), 500
@@ -0,0 +1,191 @@
+import hashlib
+import logging
+import os
+import time
+import warnings
+
+import torch
+import torch.nn as nn
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent workers may each trace once
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+EAGER = 'eager'
+TORCHSCRIPT = 'torchscript'
+INDUCTOR = 'inductor'
+
+
+class _ClassifierGraph(nn.Module):
+    """The detector's forward pass as one module returning tensors only"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+        self.split = hasattr(model, 'vit') and hasattr(model, 'classifier')
+
+    def forward(self, inputs):
+        if self.split:
+            embedding = self.model.vit(inputs)[0][:, 0, :]
+            return self.model.classifier(embedding), embedding
+        return (self.model(inputs).logits,)
+
+
+def cache_key(model_name: str, model_path: str = None, device: str = 'cpu') -> str:
+    """
+    Identity of a compiled graph
+
+    Covers the weights (path, size and mtime of a fine-tuned file, or the hub
+    name), the device and the torch version, so a new model or torch upgrade
+    never loads a stale graph.
+    """
+    if model_path and os.path.exists(model_path):
+        stat = os.stat(model_path)
+        weights = f'{os.path.abspath(model_path)}:{stat.st_size}:{stat.st_mtime_ns}'
+    else:
+        weights = model_name
+    return hashlib.sha256(f'{weights}|{device}|{torch.__version__}'.encode()).hexdigest()[:16]
+
+
+class CompiledForward:
+    """
+    Compiled execution of the detector's forward pass
+
+    ``torchscript`` traces and freezes the graph once per supported batch
+    size at the fixed input shape; ``inductor`` uses torch.compile with
+    static shapes. Traced graphs are saved under ``cache_dir`` (inductor
+    keeps its own FX graph cache there), so only the first worker on a host
+    pays for compilation - the others wait on a file lock and load the
+    result. Every graph is checked against eager output before use; any
+    failure leaves that batch size, or the whole detector, on eager.
+    """
+
+    def __init__(self, model, mode: str, batch_sizes, input_size: int, cache_dir: str = None,
+                 key: str = None, device: str = 'cpu', tolerance: float = 1e-3):
+        """
+        Initialize the compiled forward pass (call prepare() before use)
+
+        Args:
+            model: Eager model in eval mode
+            mode: 'torchscript' or 'inductor'
+            batch_sizes: Batch sizes to compile for
+            input_size: Height and width of the model input
+            cache_dir: Directory for compiled artifacts, None to compile in memory only
+            key: Cache key from cache_key()
+            device: Device the model runs on
+            tolerance: Largest absolute difference from eager output accepted
+        """
+        if mode not in (TORCHSCRIPT, INDUCTOR):
+            raise ValueError(f'Unknown compile mode: {mode}')
+        self.graph = _ClassifierGraph(model).eval()
+        self.mode = mode
+        self.batch_sizes = tuple(sorted(set(batch_sizes)))
+        self.input_size = input_size
+        self.cache_dir = cache_dir
+        self.key = key or 'default'
+        self.device = device
+        self.tolerance = tolerance
+        self._compiled = {}
+        self.report = {'mode': mode, 'batch_sizes': {}}
+
+    def prepare(self) -> dict:
+        """
+        Compile (or load) a graph per batch size
+
+        Returns:
+            Report with the outcome and time per batch size ('compiled',
+            'cached' or 'eager' with the error)
+        """
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+        if self.mode == INDUCTOR:
+            inductor = self._inductor()
+        for batch_size in self.batch_sizes:
+            start = time.perf_counter()
+            example = torch.randn(batch_size, 3, self.input_size, self.input_size, device=self.device)
+            try:
+                if self.mode == TORCHSCRIPT:
+                    compiled, status = self._torchscript(example)
+                else:
+                    compiled, status = inductor, 'compiled'
+                self._check(compiled, example)
+                self._compiled[batch_size] = compiled
+                outcome = {'status': status}
+            except Exception as e:
+                logger.warning(f"Compiling the {self.mode} graph for batch size {batch_size} failed, using eager: {e}")
+                outcome = {'status': EAGER, 'error': str(e)}
+            outcome['ms'] = round((time.perf_counter() - start) * 1000, 2)
+            self.report['batch_sizes'][batch_size] = outcome
+        return self.report
+
+    def _inductor(self):
+        if self.cache_dir:
+            # Inductor reads its cache location when it first compiles
+            os.environ.setdefault('TORCHINDUCTOR_CACHE_DIR', os.path.join(self.cache_dir, 'inductor'))
+        # Compilation happens on the first call of each shape, i.e. in _check
+        return torch.compile(self.graph, backend='inductor', dynamic=False)
+
+    def _torchscript(self, example):
+        if not self.cache_dir:
+            return self._trace(example), 'compiled'
+
+        path = os.path.join(self.cache_dir, f'{self.key}-b{example.shape[0]}-{self.input_size}.pt')
+        with open(f'{path}.lock', 'a') as lock_file:
+            # Blocks while another worker traces the same graph
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(path):
+                    try:
+                        return torch.jit.load(path, map_location=self.device), 'cached'
+                    except Exception as e:
+                        logger.warning(f"Discarding unreadable compiled graph {path}: {e}")
+
+                traced = self._trace(example)
+                temp_path = f'{path}.{os.getpid()}.tmp'
+                torch.jit.save(traced, temp_path)
+                os.replace(temp_path, path)
+                return traced, 'compiled'
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _trace(self, example):
+        with torch.no_grad(), warnings.catch_warnings():
+            # The input shape is fixed, so shape-dependent branches are meant to be baked in
+            warnings.simplefilter('ignore', torch.jit.TracerWarning)
+            traced = torch.jit.trace(self.graph, example, check_trace=False)
+            return torch.jit.freeze(traced)
+
+    def _check(self, compiled, example):
+        """Raise unless the compiled graph reproduces eager output"""
+        with torch.no_grad():
+            expected = self.graph(example)
+            actual = compiled(example)
+        if len(actual) != len(expected):
+            raise RuntimeError('compiled graph returns different outputs')
+        for want, got in zip(expected, actual):
+            difference = (want - got).abs().max().item()
+            if difference > self.tolerance:
+                raise RuntimeError(f'compiled output differs from eager by {difference:.2e}')
+
+    def __call__(self, inputs):
+        """
+        Run the compiled graph for this input's shape
+
+        Returns:
+            Tuple of (logits, embedding or None), or None when the shape was not
+            compiled and the caller should run eager
+        """
+        compiled = self._compiled.get(inputs.shape[0])
+        if compiled is None or tuple(inputs.shape[1:]) != (3, self.input_size, self.input_size):
+            return None
+        outputs = compiled(inputs)
+        return outputs[0], outputs[1] if len(outputs) > 1 else None
+
+    @property
+    def active(self) -> bool:
+        return bool(self._compiled)
@@ -12,15 +12,109 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///users.db')
     
+    # Managed SQLite profile (WAL journal, pragmas, pooling, checkpoints)
+    SQLITE_MANAGED = os.getenv('SQLITE_MANAGED', 'False').lower() == 'true'
+    SQLITE_SYNCHRONOUS = os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))
+    SQLITE_CACHE_SIZE = int(os.getenv('SQLITE_CACHE_SIZE', -65536))  # negative = KiB
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', 268435456))  # 256MB
+    SQLITE_WAL_AUTOCHECKPOINT = int(os.getenv('SQLITE_WAL_AUTOCHECKPOINT', 1000))  # pages
+    SQLITE_CHECKPOINT_INTERVAL = float(os.getenv('SQLITE_CHECKPOINT_INTERVAL', 60))  # seconds
+    SQLITE_CHECKPOINT_TRUNCATE_BYTES = int(os.getenv('SQLITE_CHECKPOINT_TRUNCATE_BYTES', 67108864))  # 64MB
+    SQLITE_POOL_SIZE = int(os.getenv('SQLITE_POOL_SIZE', 5))
+    SQLITE_POOL_MAX_OVERFLOW = int(os.getenv('SQLITE_POOL_MAX_OVERFLOW', 10))
+    
     # MongoDB configuration
     MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/deepfake_detector')
     MONGODB_DB = os.getenv('MONGODB_DB', 'deepfake_detector')
+
+    # Write-behind persistence of detection records
+    WRITE_BEHIND_ENABLED = os.getenv('WRITE_BEHIND_ENABLED', 'False').lower() == 'true'
+    WRITE_BEHIND_BATCH_SIZE = int(os.getenv('WRITE_BEHIND_BATCH_SIZE', 50))
+    WRITE_BEHIND_FLUSH_MS = int(os.getenv('WRITE_BEHIND_FLUSH_MS', 200))
+
+    # Per-worker cache of user principals for the session user loader
+    USER_CACHE_TTL = float(os.getenv('USER_CACHE_TTL', 60))  # seconds, 0 disables
+    USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', 10000))
+    
+    # API keys for machine clients (Authorization: Bearer <key>), verified keys cached per worker
+    API_KEY_SECRET = os.getenv('API_KEY_SECRET')  # HMAC key for stored key hashes, defaults to SECRET_KEY
+    API_KEY_CACHE_TTL = float(os.getenv('API_KEY_CACHE_TTL', 300))  # seconds, also the revocation delay in other workers
+    API_KEY_CACHE_MAX_SIZE = int(os.getenv('API_KEY_CACHE_MAX_SIZE', 10000))
+    API_KEY_MAX_PER_USER = int(os.getenv('API_KEY_MAX_PER_USER', 20))
+    
+    # Users allowed to manage model versions (comma-separated usernames)
+    ADMIN_USERNAMES = [name.strip() for name in os.getenv('ADMIN_USERNAMES', '').split(',') if name.strip()]
+    
+    # Password hashing is limited host-wide (slot files under UPLOAD_FOLDER/tmp), logins beyond workers + queue get 503
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))  # hashes running at once across all workers
+    PASSWORD_HASH_QUEUE_SIZE = int(os.getenv('PASSWORD_HASH_QUEUE_SIZE', 8))  # hashes waiting across all workers
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))  # seconds a queued hash waits
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')  # older hashes upgraded on login
+    
+    # Admission control on detection uploads: 429 once the predicted latency exceeds the budget
+    ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', 'True').lower() == 'true'
+    ADMISSION_LATENCY_BUDGET = float(os.getenv('ADMISSION_LATENCY_BUDGET', 30))  # seconds, below gunicorn's --timeout
+    ADMISSION_CONCURRENCY = int(os.getenv('ADMISSION_CONCURRENCY', 1))  # requests served in parallel per worker
+    ADMISSION_MAX_IN_FLIGHT = int(os.getenv('ADMISSION_MAX_IN_FLIGHT', 0))  # 0 = no hard cap
+    
+    # Fair-share scheduling of inference slots: per-user round robin inside weighted
+    # priority classes (login sessions are interactive, API-key clients bulk)
+    INFERENCE_CONCURRENCY = int(os.getenv('INFERENCE_CONCURRENCY', 1))  # model runs at once per worker
+    SCHEDULER_INTERACTIVE_WEIGHT = int(os.getenv('SCHEDULER_INTERACTIVE_WEIGHT', 4))
+    SCHEDULER_BULK_WEIGHT = int(os.getenv('SCHEDULER_BULK_WEIGHT', 1))
+    
+    # Inference threading plan per worker (see cpu_topology.py, gunicorn.conf.py exports the worker index)
+    INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', 0))  # workers sharing the host, 0 = gunicorn's count
+    TORCH_INTRA_OP_THREADS = int(os.getenv('TORCH_INTRA_OP_THREADS', 0))  # 0 = cores / workers
+    TORCH_INTER_OP_THREADS = int(os.getenv('TORCH_INTER_OP_THREADS', 0))  # 0 = 1
+    CPU_AFFINITY_ENABLED = os.getenv('CPU_AFFINITY_ENABLED', 'False').lower() == 'true'  # pin workers to disjoint cores
+    CPU_NUMA_AWARE = os.getenv('CPU_NUMA_AWARE', 'True').lower() == 'true'  # keep a pinned worker inside one NUMA node
+    
+    # Concurrent uploads of identical bytes share one inference (across workers via lock files)
+    SINGLEFLIGHT_ENABLED = os.getenv('SINGLEFLIGHT_ENABLED', 'True').lower() == 'true'
+    SINGLEFLIGHT_CROSS_WORKER = os.getenv('SINGLEFLIGHT_CROSS_WORKER', 'True').lower() == 'true'
+    SINGLEFLIGHT_RESULT_TTL = float(os.getenv('SINGLEFLIGHT_RESULT_TTL', 30))  # seconds
     
     # Upload folder with absolute path
     BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     UPLOAD_FOLDER = os.path.join(BASE_DIR, 'backend', 'uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16777216))  # 16MB
+    MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 40000000))  # decoded size budget, checked from the header
+    
+    # WebP thumbnails cached next to uploads for the dashboard
+    THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', 200))  # max width/height in pixels
+    THUMBNAIL_QUALITY = int(os.getenv('THUMBNAIL_QUALITY', 80))
+    THUMBNAIL_MAX_AGE = int(os.getenv('THUMBNAIL_MAX_AGE', 31536000))  # seconds, thumbnails never change
+    THUMBNAIL_BACKFILL_ENABLED = os.getenv('THUMBNAIL_BACKFILL_ENABLED', 'True').lower() == 'true'
+    
+    # Let nginx send upload files (internal location aliasing UPLOAD_FOLDER, see nginx.conf)
+    X_ACCEL_REDIRECT_ENABLED = os.getenv('X_ACCEL_REDIRECT_ENABLED', 'False').lower() == 'true'
+    X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '/protected-uploads/')
+    
+    # Users whose embeddings are kept in the in-process similarity index
+    SIMILARITY_INDEX_MAX_USERS = int(os.getenv('SIMILARITY_INDEX_MAX_USERS', 256))
+    
+    # Upload retention (per-user policies override the default, 0 = keep forever)
+    UPLOAD_RETENTION_DAYS = int(os.getenv('UPLOAD_RETENTION_DAYS', 0))
+    JANITOR_ENABLED = os.getenv('JANITOR_ENABLED', 'True').lower() == 'true'
+    JANITOR_INTERVAL = float(os.getenv('JANITOR_INTERVAL', 300))  # seconds
+    JANITOR_BATCH_SIZE = int(os.getenv('JANITOR_BATCH_SIZE', 200))
     MODEL_PATH = os.getenv('MODEL_PATH', 'models/vit_deepfake_detector.pth')
+    # Load the model on a background thread, /api/health/ready turns 200 after its warm-up
+    MODEL_LOAD_IN_BACKGROUND = os.getenv('MODEL_LOAD_IN_BACKGROUND', 'True').lower() == 'true'
+    MODEL_LOAD_RETRY_INTERVAL = float(os.getenv('MODEL_LOAD_RETRY_INTERVAL', 30))  # seconds
+    # Warm-up before readiness: synthetic forward passes at every batch size inference uses
+    WARMUP_BATCH_SIZES = [int(size) for size in os.getenv('WARMUP_BATCH_SIZES', '1').split(',')]
+    WARMUP_ITERATIONS = int(os.getenv('WARMUP_ITERATIONS', 3))  # passes per batch size, first one is the cold pass
+    # Compiled inference at the warm-up batch sizes: '' (eager), 'torchscript' or 'inductor', eager on failure
+    INFERENCE_COMPILE = os.getenv('INFERENCE_COMPILE', '').lower()
+    COMPILE_CACHE_DIR = os.getenv('COMPILE_CACHE_DIR', os.path.join(BASE_DIR, 'models', 'compiled'))
+    # Model registry: versioned weights plus manifest (model_registry.py); while it is empty
+    # MODEL_PATH is served and detections record MODEL_VERSION
+    MODEL_REGISTRY_DIR = os.getenv('MODEL_REGISTRY_DIR', os.path.join(BASE_DIR, 'models', 'registry'))
+    MODEL_VERSION = os.getenv('MODEL_VERSION', 'base')
+    MODEL_REGISTRY_POLL_INTERVAL = float(os.getenv('MODEL_REGISTRY_POLL_INTERVAL', 10))  # seconds, 0 = don't follow
     
     # Model settings
     DEVICE = 'cuda' if os.getenv('USE_GPU', 'False').lower() == 'true' else 'cpu'
@@ -46,11 +140,14 @@ class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    JANITOR_ENABLED = False
+    THUMBNAIL_BACKFILL_ENABLED = False
 
 class ProductionConfig(Config):
     """Production configuration"""
     DEBUG = False
     TESTING = False
+    SQLITE_MANAGED = os.getenv('SQLITE_MANAGED', 'True').lower() == 'true'
 
 config = {
     'development': DevelopmentConfig,
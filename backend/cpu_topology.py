@@ -0,0 +1,277 @@
+"""
+CPU thread topology for multi-worker inference
+
+Plans how many intra-op and inter-op threads each worker's PyTorch uses and,
+optionally, which cores it is pinned to, so N gunicorn workers on one host
+split the CPU instead of each spawning a thread per core. Run as a script to
+benchmark worker/thread splits on this host:
+
+    python backend/cpu_topology.py --benchmark
+"""
+
+import glob
+import logging
+import os
+import re
+import sys
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadPlan:
+    """Thread counts and CPU set for one worker"""
+
+    def __init__(self, intra_op: int, inter_op: int, cpus: list = None, numa_node: int = None):
+        self.intra_op = intra_op
+        self.inter_op = inter_op
+        self.cpus = cpus
+        self.numa_node = numa_node
+
+    def to_dict(self) -> dict:
+        return {
+            'intra_op': self.intra_op,
+            'inter_op': self.inter_op,
+            'cpus': self.cpus,
+            'numa_node': self.numa_node
+        }
+
+    def __repr__(self):
+        return f'<ThreadPlan intra={self.intra_op} inter={self.inter_op} cpus={self.cpus}>'
+
+
+def parse_cpulist(text: str) -> list:
+    """Parse a Linux cpulist such as ``0-3,8-11``"""
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        if '-' in part:
+            first, last = part.split('-')
+            cpus.extend(range(int(first), int(last) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def available_cpus() -> list:
+    """CPUs this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes(cpus: list = None) -> list:
+    """
+    Available CPUs grouped by NUMA node
+
+    Returns:
+        List of CPU lists, one per node with available CPUs; a single group
+        when the host exposes no NUMA information
+    """
+    cpus = available_cpus() if cpus is None else cpus
+    allowed = set(cpus)
+    nodes = []
+    paths = glob.glob('/sys/devices/system/node/node[0-9]*/cpulist')
+    for path in sorted(paths, key=lambda p: int(re.search(r'node(\d+)', p).group(1))):
+        try:
+            with open(path) as f:
+                node_cpus = [cpu for cpu in parse_cpulist(f.read()) if cpu in allowed]
+        except OSError:
+            continue
+        if node_cpus:
+            nodes.append(node_cpus)
+    return nodes or [list(cpus)]
+
+
+def plan_threads(workers: int, worker_index: int = None, cpus: list = None, nodes: list = None,
+                 intra_op: int = 0, inter_op: int = 0, pin: bool = False, numa_aware: bool = True) -> ThreadPlan:
+    """
+    Plan one worker's share of the CPU
+
+    Cores are split evenly between workers. With pinning each worker gets a
+    disjoint contiguous core set; NUMA-aware placement spreads workers across
+    nodes and keeps each worker's cores (and so its memory) on one node.
+
+    Args:
+        workers: Workers sharing the host
+        worker_index: This worker's index (0-based), required for pinning
+        cpus: Available CPUs, detected if omitted
+        nodes: CPUs per NUMA node, detected if omitted
+        intra_op: Intra-op threads, 0 derives it from the core share
+        inter_op: Inter-op threads, 0 for 1 (a single request runs one graph)
+        pin: Pin the worker to its cores
+        numa_aware: Keep each worker inside one NUMA node when pinning
+
+    Returns:
+        ThreadPlan for this worker
+    """
+    cpus = available_cpus() if cpus is None else cpus
+    workers = max(1, workers)
+    share = max(1, len(cpus) // workers)
+    plan = ThreadPlan(intra_op or share, inter_op or 1)
+
+    if not pin or worker_index is None:
+        return plan
+
+    slot = worker_index % workers
+    if numa_aware:
+        nodes = numa_nodes(cpus) if nodes is None else nodes
+        node = slot % len(nodes)
+        # Workers placed on this node before this one
+        position = slot // len(nodes)
+        node_workers = len(range(node, workers, len(nodes)))
+        node_cpus = nodes[node]
+        node_share = max(1, len(node_cpus) // node_workers)
+        start = (position * node_share) % len(node_cpus)
+        plan.cpus = node_cpus[start:start + node_share]
+        plan.numa_node = node
+    else:
+        start = (slot * share) % len(cpus)
+        plan.cpus = cpus[start:start + share]
+    plan.intra_op = intra_op or len(plan.cpus)
+    return plan
+
+
+def worker_position(default_workers: int = 1):
+    """
+    This worker's index and the worker count
+
+    gunicorn.conf.py exports WORKER_INDEX and WORKER_COUNT to each worker;
+    otherwise WEB_CONCURRENCY gives the count and the index is unknown.
+    """
+    index = os.getenv('WORKER_INDEX')
+    count = os.getenv('WORKER_COUNT') or os.getenv('WEB_CONCURRENCY')
+    return (int(index) if index is not None else None), int(count) if count else default_workers
+
+
+def plan_from_config(config) -> ThreadPlan:
+    """Plan this worker's threads from the app config"""
+    index, count = worker_position()
+    return plan_threads(
+        workers=config['INFERENCE_WORKERS'] or count,
+        worker_index=index,
+        intra_op=config['TORCH_INTRA_OP_THREADS'],
+        inter_op=config['TORCH_INTER_OP_THREADS'],
+        pin=config['CPU_AFFINITY_ENABLED'],
+        numa_aware=config['CPU_NUMA_AWARE']
+    )
+
+
+def apply_process_plan(plan: ThreadPlan):
+    """
+    Apply the parts of a plan that must precede torch's import
+
+    Pins the process (threads started later inherit the CPU set) and exports
+    the OpenMP/MKL thread counts torch reads when it is first imported.
+    """
+    for variable in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+        os.environ[variable] = str(plan.intra_op)
+    if plan.cpus and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, plan.cpus)
+        except OSError as e:
+            logger.warning(f"Could not pin worker to CPUs {plan.cpus}: {e}")
+
+
+def apply_torch_plan(plan: ThreadPlan):
+    """Set torch's thread pools, call before the first inference"""
+    import torch
+    torch.set_num_threads(plan.intra_op)
+    try:
+        torch.set_num_interop_threads(plan.inter_op)
+    except RuntimeError:
+        # Only settable before inter-op work started, e.g. not after a hot reload
+        pass
+
+
+def _benchmark_worker(cpus, intra_op, seconds, results):
+    """Measure inference throughput of one pinned process (benchmark child)"""
+    if cpus and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    import torch
+    from transformers import ViTConfig, ViTForImageClassification
+
+    torch.set_num_threads(intra_op)
+    # Same architecture as the detector, random weights so nothing is downloaded
+    model = ViTForImageClassification(ViTConfig(num_labels=2)).eval()
+    inputs = torch.randn(1, 3, 224, 224)
+    latencies = []
+    with torch.no_grad():
+        for _ in range(2):
+            model(inputs)
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            model(inputs)
+            latencies.append(time.perf_counter() - start)
+    results.put(latencies)
+
+
+def benchmark(worker_counts: list, seconds: float = 10.0, pin: bool = True, numa_aware: bool = True) -> list:
+    """
+    Benchmark worker/thread splits of this host's CPUs
+
+    Each candidate runs that many processes concurrently with the planned
+    threads and pinning, and records aggregate throughput and latency.
+
+    Returns:
+        One dict per candidate, best throughput first
+    """
+    import multiprocessing
+    import statistics
+
+    context = multiprocessing.get_context('spawn')
+    cpus = available_cpus()
+    nodes = numa_nodes(cpus)
+    rows = []
+    for workers in worker_counts:
+        results = context.Queue()
+        plans = [plan_threads(workers, i, cpus, nodes, pin=pin, numa_aware=numa_aware) for i in range(workers)]
+        processes = [
+            context.Process(target=_benchmark_worker, args=(plan.cpus, plan.intra_op, seconds, results))
+            for plan in plans
+        ]
+        for process in processes:
+            process.start()
+        latencies = []
+        for _ in processes:
+            latencies.extend(results.get())
+        for process in processes:
+            process.join()
+        latencies.sort()
+        rows.append({
+            'workers': workers,
+            'intra_op': plans[0].intra_op,
+            'throughput': round(len(latencies) / seconds, 2),
+            'p50_ms': round(statistics.median(latencies) * 1000, 1),
+            'p95_ms': round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1)
+        })
+        print(f"workers={workers:<3} intra_op={plans[0].intra_op:<3} {rows[-1]['throughput']:>8} img/s  "
+              f"p50 {rows[-1]['p50_ms']} ms  p95 {rows[-1]['p95_ms']} ms", flush=True)
+    return sorted(rows, key=lambda row: row['throughput'], reverse=True)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Plan or benchmark CPU threads for inference workers')
+    parser.add_argument('--workers', type=int, default=4, help='Workers to plan for')
+    parser.add_argument('--benchmark', action='store_true', help='Search worker/thread splits on this host')
+    parser.add_argument('--seconds', type=float, default=10.0, help='Benchmark duration per candidate')
+    parser.add_argument('--no-pin', action='store_true', help='Benchmark without CPU pinning')
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    nodes = numa_nodes(cpus)
+    print(f"{len(cpus)} CPUs in {len(nodes)} NUMA node(s)")
+
+    if not args.benchmark:
+        for index in range(args.workers):
+            print(f"worker {index}: {plan_threads(args.workers, index, cpus, nodes, pin=True).to_dict()}")
+        sys.exit(0)
+
+    candidates = sorted({workers for workers in (1, 2, 4, 8, 16, len(cpus)) if workers <= len(cpus)})
+    best = benchmark(candidates, args.seconds, pin=not args.no_pin)[0]
+    print(f"\nBest: gunicorn -w {best['workers']} with TORCH_INTRA_OP_THREADS={best['intra_op']}"
+          f"{'' if args.no_pin else ' CPU_AFFINITY_ENABLED=true'}")
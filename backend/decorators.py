@@ -1,5 +1,5 @@
 from functools import wraps
-from flask import request, jsonify, session
+from flask import request, jsonify, session, current_app
 from flask_login import current_user, login_required as flask_login_required
 
 def login_required(f):
@@ -11,6 +11,15 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def admin_required(f):
+    """Decorator restricting an endpoint to the users listed in ADMIN_USERNAMES"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if current_user.username not in current_app.config.get('ADMIN_USERNAMES', []):
+            return jsonify({'error': 'Administrator access required'}), 403
+        return f(*args, **kwargs)
+    return decorated_function
+
 def validate_file_upload(allowed_extensions={'jpg', 'jpeg', 'png', 'bmp', 'gif'}):
     """Decorator to validate file uploads"""
     def decorator(f):
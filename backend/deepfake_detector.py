@@ -2,16 +2,19 @@ import torch
 import torch.nn as nn
 from transformers import ViTImageProcessor, ViTForImageClassification
 from PIL import Image
-import cv2
 import numpy as np
 import os
 from typing import Tuple
 import time
+from image_io import load_image
+from compiled_graph import CompiledForward, EAGER, cache_key
 
 class DeepfakeDetector:
     """ViT-based Deepfake Detector"""
     
-    def __init__(self, model_path: str = None, device: str = 'cpu', model_name: str = 'google/vit-base-patch16-224-in21k'):
+    def __init__(self, model_path: str = None, device: str = 'cpu', model_name: str = 'google/vit-base-patch16-224-in21k',
+                 warmup_batch_sizes: tuple = (1,), warmup_iterations: int = 3,
+                 compile_mode: str = None, compile_cache_dir: str = None, model_version: str = None):
         """
         Initialize the deepfake detector
         
@@ -19,21 +22,36 @@ class DeepfakeDetector:
             model_path: Path to saved model weights
             device: Device to use ('cpu' or 'cuda')
             model_name: HuggingFace model identifier
+            warmup_batch_sizes: Batch sizes exercised by warm_up()
+            warmup_iterations: Forward passes per batch size during warm_up()
+            compile_mode: 'torchscript' or 'inductor' to compile the forward pass for
+                the warm-up batch sizes, None for eager
+            compile_cache_dir: Directory shared by workers for compiled graphs
+            model_version: Version of the weights, recorded with each detection
         """
         self.device = device
         self.model_name = model_name
         self.model_path = model_path
+        self.model_version = model_version
+        self.warmup_batch_sizes = tuple(warmup_batch_sizes)
+        self.warmup_iterations = max(2, warmup_iterations)
         self.image_processor = None
+        self.input_size = None
         self.model = None
         self.classes = ['REAL', 'DEEPFAKE']
+        self.compiled = None
+        self.compile_report = {'mode': EAGER}
         
         self._load_model()
+        if compile_mode and compile_mode != EAGER:
+            self._compile(compile_mode, compile_cache_dir)
     
     def _load_model(self):
         """Load ViT model and image processor"""
         try:
             # Load image processor (replaces feature extractor)
             self.image_processor = ViTImageProcessor.from_pretrained(self.model_name)
+            self.input_size = max(self.image_processor.size['height'], self.image_processor.size['width'])
             
             # Load or initialize model
             if self.model_path and os.path.exists(self.model_path):
@@ -55,24 +73,86 @@ class DeepfakeDetector:
             print(f"Error loading model: {e}")
             raise
     
-    def preprocess_image(self, image_path: str) -> np.ndarray:
+    def _compile(self, mode: str, cache_dir: str = None):
+        """Compile the forward pass, staying on eager if that fails"""
+        start = time.perf_counter()
+        try:
+            compiled = CompiledForward(
+                self.model, mode, self.warmup_batch_sizes, self.input_size,
+                cache_dir=cache_dir,
+                key=cache_key(self.model_name, self.model_path, self.device),
+                device=self.device
+            )
+            self.compile_report = compiled.prepare()
+            if compiled.active:
+                self.compiled = compiled
+        except Exception as e:
+            print(f"Compiling the model failed, using eager mode: {e}")
+            self.compile_report = {'mode': EAGER, 'requested': mode, 'error': str(e)}
+        self.compile_report['total_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    
+    def warm_up(self) -> dict:
+        """
+        Exercise the inference path on synthetic input before taking traffic
+        
+        The first passes pay for allocator growth, oneDNN primitive creation
+        and lazy module initialization. Each configured batch size is run
+        warmup_iterations times under the thread settings in effect, then
+        the full request path (analyze) is timed cold and warm so the report
+        shows whether the first real request will match steady state.
+        
+        Returns:
+            Report with thread settings and per-phase timings in milliseconds
+        """
+        def elapsed_ms(start):
+            return round((time.perf_counter() - start) * 1000, 2)
+        
+        def first_and_steady(run):
+            timings = []
+            for _ in range(self.warmup_iterations):
+                start = time.perf_counter()
+                run()
+                timings.append(elapsed_ms(start))
+            return {'first_ms': timings[0], 'steady_ms': float(np.median(timings[1:]))}
+        
+        total = time.perf_counter()
+        image = np.zeros((self.input_size, self.input_size, 3), dtype=np.uint8)
+        phases = {}
+        
+        start = time.perf_counter()
+        inputs = self.preprocess_image(image)
+        phases['preprocess'] = {'first_ms': elapsed_ms(start)}
+        
+        with torch.no_grad():
+            for batch_size in self.warmup_batch_sizes:
+                batch = inputs.expand(batch_size, -1, -1, -1).contiguous()
+                phases[f'forward_batch_{batch_size}'] = first_and_steady(lambda: self._forward(batch))
+        
+        # The path a request takes, now that everything is initialized
+        phases['analyze'] = first_and_steady(lambda: self.analyze(image))
+        
+        return {
+            'threads': {'intra_op': torch.get_num_threads(), 'inter_op': torch.get_num_interop_threads()},
+            'compile': self.compile_report,
+            'phases': phases,
+            'cold_to_steady': round(phases['analyze']['first_ms'] / max(phases['analyze']['steady_ms'], 1e-3), 2),
+            'total_ms': elapsed_ms(total)
+        }
+    
+    def preprocess_image(self, image) -> np.ndarray:
         """
         Preprocess image for model input
         
         Args:
-            image_path: Path to image file
+            image: Path to image file, or RGB uint8 array already decoded by image_io.load_image
             
         Returns:
             Preprocessed image as tensor
         """
         try:
-            # Read image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Failed to read image: {image_path}")
-            
-            # Convert BGR to RGB
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            if isinstance(image, str):
+                # Large JPEGs are decoded at reduced resolution, the model only needs input_size
+                image, _ = load_image(image, min_size=self.input_size)
             
             # Convert to PIL Image for image processor
             image = Image.fromarray(image)
@@ -85,39 +165,77 @@ class DeepfakeDetector:
             print(f"Error preprocessing image: {e}")
             raise
     
-    def detect(self, image_path: str) -> Tuple[str, float, float]:
+    def _forward(self, inputs):
         """
-        Detect if image contains deepfake
+        Run the model, returning logits and the CLS embedding fed to the classifier
+        
+        The embedding is taken from the same forward pass, so it costs nothing
+        extra. Models without a ViT backbone/classifier split yield no embedding.
+        Batch sizes with a compiled graph run it, others run eager.
+        """
+        if self.compiled is not None:
+            outputs = self.compiled(inputs)
+            if outputs is not None:
+                return outputs
+        if hasattr(self.model, 'vit') and hasattr(self.model, 'classifier'):
+            sequence_output = self.model.vit(inputs)[0]
+            embedding = sequence_output[:, 0, :]
+            return self.model.classifier(embedding), embedding
+        return self.model(inputs).logits, None
+    
+    def analyze(self, image) -> dict:
+        """
+        Classify an image and keep the full model output
         
         Args:
-            image_path: Path to image file
+            image: Path to image file, or decoded RGB uint8 array
             
         Returns:
-            Tuple of (prediction, confidence, processing_time)
+            Dictionary with prediction, confidence, processing_time, probabilities
+            (one per class, in self.classes order) and embedding (L2-normalized
+            float16 array, or None)
         """
         start_time = time.time()
         
         try:
             # Preprocess image
-            inputs = self.preprocess_image(image_path)
+            inputs = self.preprocess_image(image)
             
             # Inference
             with torch.no_grad():
-                outputs = self.model(inputs)
-                logits = outputs.logits
+                logits, embedding = self._forward(inputs)
                 probabilities = torch.softmax(logits, dim=1)
                 prediction_idx = torch.argmax(probabilities, dim=1).item()
                 confidence = probabilities[0, prediction_idx].item()
+                if embedding is not None:
+                    embedding = torch.nn.functional.normalize(embedding[0], dim=0)
+                    embedding = embedding.cpu().numpy().astype(np.float16)
             
-            prediction = self.classes[prediction_idx]
-            processing_time = time.time() - start_time
-            
-            return prediction, confidence, processing_time
+            return {
+                'prediction': self.classes[prediction_idx],
+                'confidence': confidence,
+                'processing_time': time.time() - start_time,
+                'probabilities': probabilities[0].tolist(),
+                'embedding': embedding
+            }
         
         except Exception as e:
             print(f"Error during detection: {e}")
             raise
     
+    def detect(self, image) -> Tuple[str, float, float]:
+        """
+        Detect if image contains deepfake
+        
+        Args:
+            image: Path to image file, or decoded RGB uint8 array
+            
+        Returns:
+            Tuple of (prediction, confidence, processing_time)
+        """
+        result = self.analyze(image)
+        return result['prediction'], result['confidence'], result['processing_time']
+    
     def detect_batch(self, image_paths: list) -> list:
         """
         Detect deepfakes in batch
@@ -0,0 +1,57 @@
+import mimetypes
+import os
+from urllib.parse import quote
+
+from flask import Response, current_app, request, send_file
+
+
+def deliver_file(store, relpath: str, mimetype: str = None, etag: str = None, max_age: int = None,
+                 download_name: str = None, as_attachment: bool = False, private: bool = True):
+    """
+    Respond with a file from the upload store
+
+    With X_ACCEL_REDIRECT_ENABLED the response has an empty body and an
+    ``X-Accel-Redirect`` header pointing at nginx's internal location for
+    UPLOAD_FOLDER, so nginx sends the bytes with sendfile and the worker is
+    released immediately. Otherwise Werkzeug's send_file streams the file.
+    Callers check ownership before calling this.
+
+    Args:
+        store: UploadStore holding the file
+        relpath: Path relative to UPLOAD_FOLDER
+        mimetype: Content type, guessed from the extension if omitted
+        etag: Strong ETag value (unquoted), answered with 304 on If-None-Match
+        max_age: Cache-Control max-age in seconds
+        download_name: File name for Content-Disposition
+        as_attachment: Ask the browser to download instead of display
+        private: Mark the response as cacheable by the browser only
+
+    Returns:
+        Flask response
+    """
+    path = store.abspath(relpath)
+    mimetype = mimetype or mimetypes.guess_type(relpath)[0] or 'application/octet-stream'
+
+    if current_app.config.get('X_ACCEL_REDIRECT_ENABLED'):
+        if not os.path.exists(path):
+            raise FileNotFoundError(relpath)
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = current_app.config['X_ACCEL_REDIRECT_PREFIX'] + quote(relpath)
+        if download_name or as_attachment:
+            disposition = 'attachment' if as_attachment else 'inline'
+            response.headers.set('Content-Disposition', disposition, filename=download_name or os.path.basename(relpath))
+        if etag:
+            response.set_etag(etag)
+        if max_age is not None:
+            response.cache_control.max_age = max_age
+        response = response.make_conditional(request)
+    else:
+        response = send_file(
+            path, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name,
+            etag=etag if etag else True, conditional=True, max_age=max_age
+        )
+
+    if private:
+        response.cache_control.private = True
+        response.cache_control.public = False
+    return response
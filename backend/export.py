@@ -0,0 +1,111 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+from flask import Response, request, stream_with_context
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+EXPORT_FIELDS = ['id', 'filename', 'prediction', 'confidence', 'processing_time', 'created_at']
+
+# Serialized rows are buffered into chunks of roughly this size before being sent
+CHUNK_SIZE = 64 * 1024
+
+def parse_export_args(args):
+    """
+    Parse format and date-range query parameters for an export
+
+    Args:
+        args: Request query arguments
+
+    Returns:
+        Tuple of (format, start, end); start is inclusive and end is exclusive.
+        A date-only end (YYYY-MM-DD) includes that whole day.
+    """
+    fmt = args.get('format', 'ndjson').lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}', use one of {list(EXPORT_FORMATS)}")
+
+    start = _parse_date(args.get('start'), 'start')
+    end = _parse_date(args.get('end'), 'end')
+    if end is not None and len(args.get('end')) == 10:
+        end += timedelta(days=1)
+    if start and end and start >= end:
+        raise ValueError('start must be before end')
+
+    return fmt, start, end
+
+def _parse_date(value, name):
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name} date '{value}', use ISO format (YYYY-MM-DD)")
+    # created_at is stored as naive UTC
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+def serialize_rows(rows, fmt):
+    """Yield serialized export chunks for an iterable of detection dicts"""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+
+    for row in rows:
+        if writer is not None:
+            writer.writerow(row)
+        else:
+            buffer.write(json.dumps(row))
+            buffer.write('\n')
+
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+def gzip_chunks(chunks):
+    """Compress a stream of byte chunks into a single gzip member"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+def export_response(rows, fmt):
+    """
+    Build a streaming export response
+
+    Args:
+        rows: Lazy iterable of detection dicts, consumed while streaming
+        fmt: 'ndjson' or 'csv'
+
+    Returns:
+        Flask Response that streams with constant memory, gzip-encoded
+        when the client accepts it
+    """
+    chunks = serialize_rows(rows, fmt)
+    headers = {
+        'Content-Disposition': f'attachment; filename="detections.{fmt}"',
+        'Cache-Control': 'no-store',
+        'Vary': 'Accept-Encoding',
+        # Keep nginx from buffering the whole export
+        'X-Accel-Buffering': 'no'
+    }
+
+    if request.accept_encodings['gzip'] > 0:
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(stream_with_context(chunks), mimetype=EXPORT_FORMATS[fmt], headers=headers)
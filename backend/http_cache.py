@@ -0,0 +1,37 @@
+from flask import Response, jsonify, request
+
+
+def version_etag(user_id: str, version: int) -> str:
+    """ETag value for a user's detection data at a given version"""
+    return f'{user_id}-v{version}'
+
+
+def conditional_json(etag: str, build):
+    """
+    Answer with 304 if the client already has this version, otherwise build the JSON
+
+    The ETag is weak since it identifies the data version rather than the
+    exact bytes. Read the version before building the body, so a write that
+    races with the build at worst produces a body newer than its ETag.
+
+    Args:
+        etag: ETag value (unquoted) of the current data version
+        build: Callable returning the JSON-serializable body, or a
+            (response, status) tuple that is returned uncached (e.g. a 404)
+
+    Returns:
+        Flask response
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        body = build()
+        if isinstance(body, tuple):
+            return body
+        response = jsonify(body)
+
+    response.set_etag(etag, weak=True)
+    # The browser may keep the body but has to revalidate every time
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
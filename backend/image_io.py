@@ -0,0 +1,110 @@
+import numpy as np
+from PIL import Image, ImageOps
+
+# PIL format name -> canonical extension of the formats the detector accepts
+# (MPO is how PIL reports multi-picture JPEGs written by many cameras)
+SUPPORTED_FORMATS = {'JPEG': 'jpg', 'MPO': 'jpg', 'PNG': 'png', 'BMP': 'bmp', 'GIF': 'gif'}
+
+
+class ImageInfo:
+    """Format and dimensions read from an image header"""
+
+    def __init__(self, format: str, width: int, height: int, mode: str):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.mode = mode
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'format': self.format,
+            'size': (self.width, self.height),
+            'mode': self.mode,
+            'width': self.width,
+            'height': self.height
+        }
+
+    def __repr__(self):
+        return f'<ImageInfo {self.format} {self.width}x{self.height}>'
+
+
+def _open(source):
+    """Open an image lazily, PIL only parses the header at this point"""
+    try:
+        return Image.open(source)
+    except (Image.UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ValueError(f'Invalid image file: {e}')
+
+
+def _check(image, max_pixels: int = None) -> ImageInfo:
+    """Validate the header of an opened image against format and pixel budget"""
+    info = ImageInfo(image.format, image.width, image.height, image.mode)
+    if info.format not in SUPPORTED_FORMATS:
+        raise ValueError(f'Unsupported image format: {info.format}')
+    if info.width < 1 or info.height < 1:
+        raise ValueError('Image has no pixels')
+    if max_pixels and info.pixels > max_pixels:
+        raise ValueError(
+            f'Image is {info.width}x{info.height} pixels, the limit is {max_pixels} pixels'
+        )
+    return info
+
+
+def sniff_image(source, max_pixels: int = None) -> ImageInfo:
+    """
+    Read format and dimensions from the header without decoding pixel data
+
+    Args:
+        source: Path or binary file object
+        max_pixels: Reject images with more pixels than this (None = no limit)
+
+    Returns:
+        ImageInfo of the image
+
+    Raises:
+        ValueError: Not an image, unsupported format or over the pixel budget
+    """
+    with _open(source) as image:
+        return _check(image, max_pixels)
+
+
+def load_image(source, max_pixels: int = None, min_size: int = None):
+    """
+    Validate and decode an image in a single pass
+
+    The header is checked against the pixel budget before any pixel data is
+    decoded, so oversized images are rejected without allocating their bitmap.
+    JPEGs are decoded at the smallest DCT scale (1/2, 1/4 or 1/8) whose
+    width and height are still at least ``min_size``.
+
+    Args:
+        source: Path or binary file object
+        max_pixels: Reject images with more pixels than this (None = no limit)
+        min_size: Smallest width/height the caller needs (None = full resolution)
+
+    Returns:
+        Tuple of (RGB uint8 array of shape (height, width, 3), ImageInfo of
+        the original image)
+
+    Raises:
+        ValueError: Not an image, unsupported format, over the pixel budget or truncated
+    """
+    with _open(source) as image:
+        info = _check(image, max_pixels)
+        try:
+            if min_size and info.format in ('JPEG', 'MPO'):
+                # Only takes effect for JPEG, scale is chosen so both sides stay >= min_size
+                image.draft('RGB', (min_size, min_size))
+            
+            # Honour EXIF orientation like cv2.imread did
+            image = ImageOps.exif_transpose(image)
+            if image.mode != 'RGB':
+                image = image.convert('RGB')
+            return np.asarray(image), info
+        except (OSError, SyntaxError) as e:
+            raise ValueError(f'Invalid image file: {e}')
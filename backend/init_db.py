@@ -5,7 +5,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from app import create_app
-from models import db, User
+from models import db, User, Detection, DetectionRollup
 
 def init_db():
     """Initialize database with sample data"""
@@ -28,6 +28,18 @@ def init_db():
             db.session.commit()
             print("✓ Demo user created: username=demo, password=Demo@12345")
         
+        # Rebuild analytics rollups from existing detection history
+        backfilled = DetectionRollup.backfill(db.session)
+        print(f"✓ Analytics rollups rebuilt from {backfilled} detections")
+        
+        # Schedule upload expiry for detections stored before retention policies
+        scheduled = 0
+        for user in User.query.all():
+            scheduled += Detection.reschedule_expiry(
+                db.session, user.id, user.retention_days, app.config['UPLOAD_RETENTION_DAYS']
+            )
+        print(f"✓ Upload expiry scheduled for {scheduled} detections")
+        
         print("\n✓ Database initialization complete!")
         print(f"✓ Database file: {app.config['SQLALCHEMY_DATABASE_URI']}")
 
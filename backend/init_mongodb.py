@@ -3,7 +3,7 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import Config
-from mongo_models import MongoUser, MongoDetection
+from mongo_models import MongoUser, MongoDetection, MongoDetectionRollup
 import mongoengine
 
 def init_mongodb():
@@ -26,6 +26,7 @@ def init_mongodb():
     try:
         MongoUser.ensure_indexes()
         MongoDetection.ensure_indexes()
+        MongoDetectionRollup.ensure_indexes()
         print("✓ Database indexes created")
     except Exception as e:
         print(f"✗ Index creation failed: {e}")
@@ -48,6 +49,28 @@ def init_mongodb():
         print(f"✗ Demo user creation failed: {e}")
         return False
     
+    # Rebuild analytics rollups from existing detection history, holding off
+    # rollup updates of workers running on this host
+    try:
+        lock_dir = os.path.join(Config.UPLOAD_FOLDER, 'tmp')
+        os.makedirs(lock_dir, exist_ok=True)
+        MongoDetectionRollup.lock_path = os.path.join(lock_dir, 'rollup-backfill.lock')
+        backfilled = MongoDetectionRollup.backfill()
+        print(f"✓ Analytics rollups rebuilt from {backfilled} detections")
+    except Exception as e:
+        print(f"✗ Rollup backfill failed: {e}")
+        return False
+    
+    # Schedule upload expiry for detections stored before retention policies
+    try:
+        scheduled = 0
+        for user in MongoUser.objects.only('id', 'retention_days'):
+            scheduled += MongoDetection.reschedule_expiry(user.id, user.retention_days, Config.UPLOAD_RETENTION_DAYS)
+        print(f"✓ Upload expiry scheduled for {scheduled} detections")
+    except Exception as e:
+        print(f"✗ Upload expiry backfill failed: {e}")
+        return False
+    
     print("\n✓ MongoDB initialization complete!")
     return True
 
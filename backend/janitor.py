@@ -0,0 +1,74 @@
+import logging
+import threading
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+
+def expiry_for(created_at, retention_days, default_days):
+    """
+    Compute when an upload expires
+
+    Args:
+        created_at: Upload time
+        retention_days: The user's policy, None to use the default
+        default_days: UPLOAD_RETENTION_DAYS from config
+
+    Returns:
+        Expiry datetime, or None if the upload is kept forever (0 days)
+    """
+    days = default_days if retention_days is None else retention_days
+    if not days or days <= 0:
+        return None
+    return created_at + timedelta(days=days)
+
+
+class UploadJanitor:
+    """Background thread that purges expired uploads in bounded batches"""
+
+    def __init__(self, sweep_fn, interval: float = 300.0, batch_size: int = 200):
+        """
+        Initialize the janitor
+
+        Args:
+            sweep_fn: Callable(batch_size) that purges up to batch_size expired
+                uploads from the expiry index and returns how many it found
+            interval: Seconds to sleep once no expired uploads are left
+            batch_size: Maximum uploads handled per sweep
+        """
+        self.sweep_fn = sweep_fn
+        self.interval = interval
+        self.batch_size = batch_size
+        self.purged = 0
+        self.sweeps = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='upload-janitor', daemon=True)
+
+    def start(self):
+        """Start the janitor thread"""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the janitor thread"""
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def sweep(self) -> int:
+        """Run one bounded sweep, returns the number of expired uploads found"""
+        found = self.sweep_fn(self.batch_size)
+        self.sweeps += 1
+        self.purged += found
+        if found:
+            logger.info(f"Janitor purged {found} expired uploads")
+        return found
+
+    def _run(self):
+        delay = self.interval
+        while not self._stop.wait(delay):
+            try:
+                found = self.sweep()
+            except Exception as e:
+                logger.error(f"Janitor sweep failed: {e}", exc_info=True)
+                found = 0
+            # Keep draining a backlog with a short pause, otherwise wait a full interval
+            delay = 1.0 if found >= self.batch_size else self.interval
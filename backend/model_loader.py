@@ -0,0 +1,225 @@
+import logging
+import threading
+import time
+from functools import wraps
+
+from flask import jsonify
+
+logger = logging.getLogger(__name__)
+
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class ModelLoader:
+    """
+    Load the detector on a background thread
+
+    The app starts serving logins, pages and history immediately while torch,
+    transformers and the ViT weights load. The detector only becomes
+    available - and the worker ready - after its warm-up succeeded; the
+    warm-up report (per-phase timings) is kept for the health endpoint.
+    A failed load is retried every ``retry_interval`` seconds. Later model
+    versions are swapped in the same way without leaving the ready state.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self.detector = None
+        self.state = LOADING
+        self.error = None
+        self.attempts = 0
+        self.started_at = None
+        self.ready_at = None
+        self.timings = {}
+        self.warm_up_report = None
+        self.swap_status = None
+        self._on_ready = None
+        self._swap_thread = None
+        self._follower = None
+
+    def start(self, factory, on_ready=None, retry_interval: float = 30.0, background: bool = True):
+        """
+        Start loading
+
+        Args:
+            factory: Callable building the detector (heavy imports belong inside it)
+            on_ready: Callable(detector) invoked once the detector is warmed up
+            retry_interval: Seconds between attempts after a failure
+            background: Load on a daemon thread, otherwise block until loaded
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self.state = LOADING
+            self.started_at = time.time()
+            self._on_ready = on_ready
+
+        if not background:
+            self._load(factory, on_ready, retry_interval=None)
+            return
+        self._thread = threading.Thread(
+            target=self._load, args=(factory, on_ready, retry_interval), name='model-loader', daemon=True
+        )
+        self._thread.start()
+
+    def _load(self, factory, on_ready, retry_interval):
+        while True:
+            self.attempts += 1
+            try:
+                start = time.perf_counter()
+                detector = factory()
+                loaded = time.perf_counter()
+                report = detector.warm_up()
+                warmed = time.perf_counter()
+                if on_ready is not None:
+                    on_ready(detector)
+                with self._lock:
+                    self.detector = detector
+                    self.state = READY
+                    self.error = None
+                    self.ready_at = time.time()
+                    self.timings = {
+                        'load_seconds': round(loaded - start, 3),
+                        'warm_up_seconds': round(warmed - loaded, 3)
+                    }
+                    self.warm_up_report = report
+                logger.info(f"Detector ready after {self.ready_at - self.started_at:.1f}s, warm-up: {report}")
+                return
+            except Exception as e:
+                with self._lock:
+                    self.state = FAILED
+                    self.error = str(e)
+                if retry_interval is None:
+                    raise
+                logger.error(f"Detector load failed (attempt {self.attempts}), retrying in {retry_interval}s: {e}")
+                time.sleep(retry_interval)
+                with self._lock:
+                    self.state = LOADING
+
+    def swap(self, factory, version: str, on_swapped=None) -> bool:
+        """
+        Load another model version in the background and swap it in
+
+        The current detector keeps serving while the new one loads and warms
+        up, then on_ready (from start) publishes it in one assignment.
+        Requests holding the old detector finish on it, and it is freed once
+        the last of them completes.
+
+        Args:
+            factory: Callable building the new detector
+            version: Version being loaded, for status reporting
+            on_swapped: Callable(detector) invoked after the swap
+
+        Returns:
+            False if the initial load or another swap is still in progress
+        """
+        with self._lock:
+            if self.state != READY or (self.swap_status or {}).get('state') == LOADING:
+                return False
+            self.swap_status = {'state': LOADING, 'version': version, 'started_at': time.time()}
+            self._swap_thread = threading.Thread(
+                target=self._swap_in, args=(factory, version, on_swapped), name='model-swap', daemon=True
+            )
+            self._swap_thread.start()
+        return True
+
+    def _swap_in(self, factory, version, on_swapped):
+        start = time.perf_counter()
+        try:
+            detector = factory()
+            report = detector.warm_up()
+            with self._lock:
+                previous = self.version
+                if self._on_ready is not None:
+                    self._on_ready(detector)
+                self.detector = detector
+                self.warm_up_report = report
+                self.swap_status = {
+                    'state': READY, 'version': version, 'previous': previous,
+                    'seconds': round(time.perf_counter() - start, 3)
+                }
+            logger.info(f"Swapped detector from model version {previous} to {version}")
+            if on_swapped is not None:
+                on_swapped(detector)
+        except Exception as e:
+            logger.error(f"Loading model version {version} failed, keeping the current model: {e}")
+            with self._lock:
+                self.swap_status = {'state': FAILED, 'version': version, 'error': str(e)}
+
+    def follow(self, desired, make_factory, interval: float = 10.0):
+        """
+        Keep this process on the version desired() names
+
+        Polls every ``interval`` seconds and swaps when it differs from the
+        version being served, e.g. after another worker activated a version
+        in the model registry. A version that failed to load is not retried
+        until desired() names another one.
+
+        Args:
+            desired: Callable returning the version to serve, or None
+            make_factory: Callable(version) returning a detector factory
+            interval: Seconds between polls
+        """
+        def run():
+            failed = None
+            while True:
+                time.sleep(interval)
+                try:
+                    version = desired()
+                    if not version or version in (self.version, failed) or not self.ready:
+                        continue
+                    if self.swap(make_factory(version), version):
+                        self._swap_thread.join()
+                        failed = version if self.swap_status['state'] == FAILED else None
+                except Exception as e:
+                    logger.error(f"Following the active model version failed: {e}")
+
+        if self._follower is None:
+            self._follower = threading.Thread(target=run, name='model-follower', daemon=True)
+            self._follower.start()
+
+    @property
+    def version(self) -> str:
+        """Model version being served"""
+        return getattr(self.detector, 'model_version', None)
+
+    @property
+    def ready(self) -> bool:
+        return self.state == READY
+
+    def status(self) -> dict:
+        """Loader state for the health and metrics endpoints"""
+        with self._lock:
+            status = {'state': self.state, 'attempts': self.attempts, 'version': self.version}
+            if self.error:
+                status['error'] = self.error
+            if self.ready_at:
+                status['startup_seconds'] = round(self.ready_at - self.started_at, 3)
+                status.update(self.timings)
+            if self.warm_up_report:
+                status['warm_up'] = self.warm_up_report
+            if self.swap_status:
+                status['swap'] = self.swap_status
+            return status
+
+
+def model_required(f):
+    """Decorator answering 503 with Retry-After until the detector is ready"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not model_loader.ready:
+            response = jsonify({
+                'error': 'The detection model is still loading, please retry shortly',
+                'model': model_loader.state
+            })
+            response.headers['Retry-After'] = '10'
+            return response, 503
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+# Shared per-process loader, started by init_detector
+model_loader = ModelLoader()
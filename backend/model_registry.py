@@ -0,0 +1,268 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:  # Windows: manifest updates are not locked against other processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+WEIGHTS = 'model.pth'
+VERSION_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    """Hex SHA-256 digest of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelVersion:
+    """One registered model version"""
+
+    def __init__(self, version: str, path: str, sha256: str = None, created_at: str = None,
+                 description: str = None, model_name: str = None):
+        self.version = version
+        self.path = path
+        self.sha256 = sha256
+        self.created_at = created_at
+        self.description = description
+        self.model_name = model_name
+
+    def to_dict(self) -> dict:
+        return {
+            'version': self.version,
+            'sha256': self.sha256,
+            'created_at': self.created_at,
+            'description': self.description,
+            'model_name': self.model_name
+        }
+
+    def verify(self):
+        """
+        Check the weights against the digest recorded at registration
+
+        Raises:
+            FileNotFoundError: The weights file is missing
+            ValueError: The weights changed since they were registered
+        """
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f'Weights of model version {self.version} are missing: {self.path}')
+        if self.sha256 and file_sha256(self.path) != self.sha256:
+            raise ValueError(f'Weights of model version {self.version} do not match the registered sha256 {self.sha256[:12]}')
+
+    def __repr__(self):
+        return f'<ModelVersion {self.version}>'
+
+
+class ModelRegistry:
+    """
+    Local registry of model versions
+
+    Each version lives in ``<root>/<version>/model.pth`` and is listed in
+    ``<root>/manifest.json`` together with the active version. The manifest
+    is the state shared by all workers on a host: a worker that finished
+    swapping to a new version marks it active, and the others follow (see
+    ModelLoader.follow). Writes go through a temp file and rename under a
+    file lock, so readers never see a partial manifest.
+    """
+
+    def __init__(self, root: str = None):
+        """
+        Initialize the registry
+
+        Args:
+            root: Registry directory, created on the first registration
+        """
+        self._lock = threading.Lock()
+        self.configure(root)
+
+    def configure(self, root: str):
+        """Apply settings from the app config"""
+        with self._lock:
+            self.root = root
+            self._cached = (None, {})
+
+    @property
+    def manifest_path(self) -> str:
+        return os.path.join(self.root, MANIFEST)
+
+    def _read(self) -> dict:
+        """Current manifest, re-read only when the file changed"""
+        if self.root is None:
+            return {}
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime_ns
+        except OSError:
+            return {}
+        with self._lock:
+            if self._cached[0] == mtime:
+                return self._cached[1]
+        try:
+            with open(self.manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read model manifest {self.manifest_path}: {e}")
+            return {}
+        with self._lock:
+            self._cached = (mtime, manifest)
+        return manifest
+
+    def _update(self, change):
+        """Apply change(manifest) to the manifest under the registry lock"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, f'{MANIFEST}.lock'), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.manifest_path) as f:
+                        manifest = json.load(f)
+                except FileNotFoundError:
+                    manifest = {'active': None, 'versions': {}}
+                change(manifest)
+                temp_path = f'{self.manifest_path}.{os.getpid()}.tmp'
+                with open(temp_path, 'w') as f:
+                    json.dump(manifest, f, indent=2)
+                os.replace(temp_path, self.manifest_path)
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _version(self, version: str, entry: dict) -> ModelVersion:
+        return ModelVersion(
+            version, os.path.join(self.root, version, WEIGHTS),
+            entry.get('sha256'), entry.get('created_at'), entry.get('description'), entry.get('model_name')
+        )
+
+    def versions(self) -> list:
+        """Registered versions, oldest first"""
+        entries = self._read().get('versions', {})
+        return sorted((self._version(version, entry) for version, entry in entries.items()),
+                      key=lambda model: model.created_at or '')
+
+    def get(self, version: str) -> ModelVersion:
+        """A registered version, or None"""
+        entry = self._read().get('versions', {}).get(version)
+        return self._version(version, entry) if entry is not None else None
+
+    def active_version(self) -> str:
+        """Version workers should serve, None if the registry is empty"""
+        return self._read().get('active')
+
+    def active(self) -> ModelVersion:
+        """The active version, or None"""
+        version = self.active_version()
+        return self.get(version) if version else None
+
+    def register(self, version: str, source_path: str, description: str = None, model_name: str = None) -> ModelVersion:
+        """
+        Copy weights into the registry as a new version
+
+        Args:
+            version: Version name (letters, digits, '.', '_' and '-')
+            source_path: Weights saved with DeepfakeDetector.save_model
+            description: Free-form note, e.g. the training run
+            model_name: Hugging Face model the weights were fine-tuned from
+
+        Returns:
+            The registered ModelVersion
+        """
+        if not VERSION_PATTERN.match(version):
+            raise ValueError(f'Invalid model version: {version!r}')
+        if self.get(version) is not None:
+            raise ValueError(f'Model version {version} is already registered')
+
+        directory = os.path.join(self.root, version)
+        os.makedirs(directory, exist_ok=True)
+        target = os.path.join(directory, WEIGHTS)
+        digest = hashlib.sha256()
+        with open(source_path, 'rb') as source, open(f'{target}.tmp', 'wb') as destination:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                destination.write(chunk)
+        os.replace(f'{target}.tmp', target)
+
+        entry = {
+            'sha256': digest.hexdigest(),
+            'created_at': datetime.utcnow().isoformat(),
+            'description': description,
+            'model_name': model_name
+        }
+        def change(manifest):
+            manifest['versions'][version] = entry
+        self._update(change)
+        logger.info(f"Registered model version {version} ({entry['sha256'][:12]})")
+        return self._version(version, entry)
+
+    def activate(self, version: str):
+        """Mark a registered version as the one all workers serve"""
+        def change(manifest):
+            if version not in manifest['versions']:
+                raise KeyError(version)
+            manifest['active'] = version
+        self._update(change)
+
+    def remove(self, version: str):
+        """Delete an inactive version and its weights"""
+        def change(manifest):
+            if manifest.get('active') == version:
+                raise ValueError(f'Model version {version} is active')
+            manifest['versions'].pop(version, None)
+            # Under the manifest lock, so the version cannot be activated while its weights go
+            shutil.rmtree(os.path.join(self.root, version), ignore_errors=True)
+        self._update(change)
+
+
+# Shared per-process registry, configured by create_app
+model_registry = ModelRegistry()
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Manage the local model registry')
+    parser.add_argument('--root', default=Config.MODEL_REGISTRY_DIR, help='Registry directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='List registered versions')
+    register = commands.add_parser('register', help='Add weights as a new version')
+    register.add_argument('version')
+    register.add_argument('path', help='Weights saved with DeepfakeDetector.save_model')
+    register.add_argument('--description')
+    register.add_argument('--model-name', default=Config.MODEL_NAME)
+    register.add_argument('--activate', action='store_true',
+                          help='Make it active (running workers follow within MODEL_REGISTRY_POLL_INTERVAL)')
+    remove = commands.add_parser('remove', help='Delete an inactive version')
+    remove.add_argument('version')
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == 'register':
+        registry.register(args.version, args.path, args.description, args.model_name)
+        if args.activate:
+            registry.activate(args.version)
+        print(f"Registered {args.version}" + (' (active)' if args.activate else ''))
+    elif args.command == 'remove':
+        registry.remove(args.version)
+        print(f"Removed {args.version}")
+    else:
+        active = registry.active_version()
+        for model in registry.versions():
+            marker = '*' if model.version == active else ' '
+            print(f"{marker} {model.version:<20} {model.created_at}  {model.sha256[:12]}  {model.description or ''}")
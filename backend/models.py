@@ -1,6 +1,14 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import event, select, inspect, bindparam, case, text
+from sqlalchemy.dialects import sqlite, postgresql
+from sqlalchemy.orm import Session, make_transient_to_detached
+from password_hasher import password_hasher
+from user_cache import user_cache
+from analytics import rollup_increments
+from janitor import expiry_for
+from collections import Counter
+import hmac
 import uuid
 from datetime import datetime
 
@@ -17,21 +25,56 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
+    retention_days = db.Column(db.Integer)  # upload retention policy, NULL = UPLOAD_RETENTION_DAYS, 0 = keep forever
     
     # Relationship
     detections = db.relationship('Detection', backref='user', lazy=True, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set password, raises HasherBusy when hashing is saturated"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Check if password matches hash"""
-        return check_password_hash(self.password_hash, password)
+        """Check if password matches hash, raises HasherBusy when hashing is saturated"""
+        return password_hasher.verify(self.password_hash, password)
     
+    def rehash_password(self, password):
+        """Upgrade the stored hash of a verified password to the current method, returns True if changed"""
+        new_hash = password_hasher.rehash(self.password_hash, password)
+        if new_hash is None:
+            return False
+        self.password_hash = new_hash
+        return True
+
+    def detached_copy(self):
+        """Copy column values into a detached instance safe to cache across sessions"""
+        copy = User(**{column.name: getattr(self, column.name) for column in User.__table__.columns})
+        make_transient_to_detached(copy)
+        return copy
+
     def __repr__(self):
         return f'<User {self.username}>'
 
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _mark_user_changed(mapper, connection, target):
+    """Remember changed users so their cache entries are dropped on commit"""
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('changed_user_ids', set()).add(target.id)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    """Invalidate cached principals once password or status changes are committed"""
+    for user_id in session.info.pop('changed_user_ids', ()):
+        user_cache.invalidate(user_id)
+
+def _class_probabilities(probabilities):
+    """Label a stored probability vector with the detector's class names"""
+    if not probabilities:
+        return None
+    return {label: round(p, 4) for label, p in zip(('REAL', 'DEEPFAKE'), probabilities)}
+
 class Detection(db.Model):
     """Detection history model"""
     __tablename__ = 'detections'
@@ -44,6 +87,12 @@ class Detection(db.Model):
     confidence = db.Column(db.Float, nullable=False)
     processing_time = db.Column(db.Float)  # in seconds
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    content_hash = db.Column(db.String(64), index=True)  # SHA-256 of the stored upload, NULL for legacy flat files
+    expires_at = db.Column(db.DateTime, index=True)  # when the upload is purged, NULL = never or already purged
+    purged_at = db.Column(db.DateTime)  # set once the janitor released the upload
+    probabilities = db.Column(db.JSON)  # softmax output, one value per class in detector order
+    embedding = db.deferred(db.Column(db.LargeBinary))  # L2-normalized float16 CLS embedding
+    model_version = db.Column(db.String(64), index=True)  # registry version of the model that classified it
     
     def __repr__(self):
         return f'<Detection {self.id}: {self.prediction}>'
@@ -56,5 +105,290 @@ class Detection(db.Model):
             'prediction': self.prediction,
             'confidence': round(self.confidence, 2),
             'processing_time': round(self.processing_time, 2) if self.processing_time else None,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at.isoformat(),
+            'probabilities': _class_probabilities(self.probabilities),
+            'model_version': self.model_version
         }
+    
+    def to_record(self):
+        """Raw column values, as used by rollups and batch writers"""
+        return {column.name: getattr(self, column.name) for column in Detection.__table__.columns}
+    
+    @classmethod
+    def reschedule_expiry(cls, session, user_id, retention_days, default_days, batch_size=1000):
+        """
+        Recompute expires_at for a user's unpurged uploads after a policy change
+        
+        Returns:
+            Number of detections updated
+        """
+        table = cls.__table__
+        updated = 0
+        last_id = ''
+        while True:
+            batch = session.execute(
+                select(table.c.id, table.c.created_at)
+                .where(table.c.user_id == user_id, table.c.purged_at.is_(None), table.c.id > last_id)
+                .order_by(table.c.id)
+                .limit(batch_size)
+            ).all()
+            if not batch:
+                break
+            session.execute(
+                table.update().where(table.c.id == bindparam('detection_id')).values(expires_at=bindparam('new_expiry')),
+                [{'detection_id': row.id, 'new_expiry': expiry_for(row.created_at, retention_days, default_days)}
+                 for row in batch]
+            )
+            updated += len(batch)
+            last_id = batch[-1].id
+        session.commit()
+        return updated
+
+def _increment(session, table, key_columns, counter_column, rows):
+    """
+    Upsert rows, adding their counter value to any existing row with the same key
+    
+    Uses a single ON CONFLICT DO UPDATE statement on SQLite/PostgreSQL so
+    concurrent writers never lose increments.
+    """
+    dialect = session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={counter_column: table.c[counter_column] + statement.excluded[counter_column]}
+        )
+        session.execute(statement, rows)
+        return
+    
+    # Generic fallback for databases without ON CONFLICT
+    for row in rows:
+        key_filter = [table.c[name] == row[name] for name in key_columns]
+        result = session.execute(
+            table.update().where(*key_filter).values({counter_column: table.c[counter_column] + row[counter_column]})
+        )
+        if result.rowcount == 0:
+            session.execute(table.insert().values(**row))
+
+class StoredFile(db.Model):
+    """Content-addressed upload with the number of detections referencing it"""
+    __tablename__ = 'stored_files'
+    
+    content_hash = db.Column(db.String(64), primary_key=True)
+    path = db.Column(db.String(255), nullable=False)  # relative to UPLOAD_FOLDER
+    ref_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<StoredFile {self.content_hash[:12]}: {self.ref_count} refs>'
+    
+    @classmethod
+    def acquire(cls, session, references):
+        """
+        Add references to stored files, creating their rows on first use
+        
+        Args:
+            session: Session the referencing detections are written in
+            references: Iterable of (content_hash, path, count)
+        """
+        rows = [
+            {'content_hash': content_hash, 'path': path, 'ref_count': count, 'created_at': datetime.utcnow()}
+            for content_hash, path, count in references
+        ]
+        if rows:
+            _increment(session, cls.__table__, ['content_hash'], 'ref_count', rows)
+    
+    @classmethod
+    def release(cls, session, content_hash):
+        """Drop one reference, the caller commits"""
+        table = cls.__table__
+        session.execute(
+            table.update().where(table.c.content_hash == content_hash).values(ref_count=table.c.ref_count - 1)
+        )
+    
+    @classmethod
+    def drop_if_unreferenced(cls, session, content_hash):
+        """Delete the row if nothing references it any more, returns True if deleted"""
+        table = cls.__table__
+        result = session.execute(
+            table.delete().where(table.c.content_hash == content_hash, table.c.ref_count <= 0)
+        )
+        session.commit()
+        return result.rowcount > 0
+
+class ApiKey(db.Model):
+    """Per-user API key for machine clients, only a keyed hash of the key is stored"""
+    __tablename__ = 'api_keys'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    name = db.Column(db.String(80), nullable=False)
+    prefix = db.Column(db.String(8), unique=True, nullable=False, index=True)  # public part of the key
+    key_hash = db.Column(db.String(64), nullable=False)  # HMAC-SHA256 of the full key
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime)  # refreshed when a key is verified, not on cached hits
+    revoked_at = db.Column(db.DateTime)
+    
+    def to_dict(self):
+        """Convert to dictionary, never includes the key or its hash"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'prefix': self.prefix,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None,
+            'revoked_at': self.revoked_at.isoformat() if self.revoked_at else None
+        }
+    
+    def __repr__(self):
+        return f'<ApiKey {self.prefix}>'
+    
+    @classmethod
+    def verify(cls, session, prefix, key_hash):
+        """
+        Find the owner of an active key by its prefix and hash
+
+        Returns:
+            User id, or None if no active key matches
+        """
+        table = cls.__table__
+        row = session.execute(
+            select(table.c.id, table.c.user_id, table.c.key_hash)
+            .where(table.c.prefix == prefix, table.c.revoked_at.is_(None))
+        ).first()
+        if row is None or not hmac.compare_digest(row.key_hash, key_hash):
+            return None
+        session.execute(table.update().where(table.c.id == row.id).values(last_used_at=datetime.utcnow()))
+        session.commit()
+        return row.user_id
+
+class DetectionVersion(db.Model):
+    """Per-user counter bumped whenever the user's detections change, used for ETags"""
+    __tablename__ = 'detection_versions'
+    
+    user_id = db.Column(db.String(36), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DetectionVersion {self.user_id}: {self.version}>'
+    
+    @classmethod
+    def bump(cls, session, user_ids):
+        """Increment the version of every given user once, the caller commits"""
+        rows = [{'user_id': user_id, 'version': 1} for user_id in set(user_ids)]
+        if rows:
+            _increment(session, cls.__table__, ['user_id'], 'version', rows)
+    
+    @classmethod
+    def current(cls, session, user_id):
+        """Current version of a user's detections (0 before the first change)"""
+        table = cls.__table__
+        return session.execute(
+            select(table.c.version).where(table.c.user_id == user_id)
+        ).scalar() or 0
+
+class DetectionRollup(db.Model):
+    """Pre-aggregated detection counts per user, hour/day bucket and histogram bin"""
+    __tablename__ = 'detection_rollups'
+    
+    KEY_COLUMNS = ['user_id', 'granularity', 'bucket_start', 'prediction', 'confidence_bin', 'latency_bin']
+    
+    user_id = db.Column(db.String(36), primary_key=True)
+    granularity = db.Column(db.String(8), primary_key=True)  # 'hour' or 'day'
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    prediction = db.Column(db.String(20), primary_key=True)
+    confidence_bin = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    latency_bin = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DetectionRollup {self.granularity} {self.bucket_start}: {self.count}>'
+    
+    @classmethod
+    def apply(cls, session, increments):
+        """
+        Atomically add counter deltas to the rollup rows
+        
+        Counts never go below zero: a detection stored before rollups existed
+        may be deleted before the backfill counted it.
+        
+        Args:
+            session: SQLAlchemy session the detection rows are written in
+            increments: Counter from analytics.rollup_increments
+        """
+        rows = [dict(zip(cls.KEY_COLUMNS, key), count=delta) for key, delta in increments.items() if delta]
+        added = [row for row in rows if row['count'] > 0]
+        if added:
+            _increment(session, cls.__table__, cls.KEY_COLUMNS, 'count', added)
+        
+        # Decrements only update existing rows, clamped at zero
+        removed = [
+            dict({f'key_{name}': row[name] for name in cls.KEY_COLUMNS}, delta=row['count'])
+            for row in rows if row['count'] < 0
+        ]
+        if removed:
+            table = cls.__table__
+            remaining = table.c.count + bindparam('delta')
+            session.execute(
+                table.update()
+                .where(*[table.c[name] == bindparam(f'key_{name}') for name in cls.KEY_COLUMNS])
+                .values(count=case((remaining < 0, 0), else_=remaining)),
+                removed
+            )
+    
+    @classmethod
+    def backfill(cls, session, batch_size=1000):
+        """
+        Rebuild all rollups from the detections table
+        
+        The rollup table is locked for the whole rebuild, so apply calls of
+        uploads and deletes made meanwhile wait and land on the rebuilt rows
+        instead of being wiped with the old ones.
+        
+        Returns:
+            Number of detections aggregated
+        """
+        if session.get_bind().dialect.name == 'postgresql':
+            session.execute(text(f'LOCK TABLE {cls.__tablename__} IN SHARE ROW EXCLUSIVE MODE'))
+        # Deleting before the scan takes SQLite's write lock the same way
+        session.execute(cls.__table__.delete())
+        
+        increments = Counter()
+        total = 0
+        statement = select(
+            Detection.user_id, Detection.created_at, Detection.prediction,
+            Detection.confidence, Detection.processing_time
+        ).execution_options(yield_per=batch_size)
+        
+        for row in session.execute(statement):
+            increments.update(rollup_increments([row._mapping]))
+            total += 1
+        
+        cls.apply(session, increments)
+        session.commit()
+        return total
+
+def upgrade_schema():
+    """
+    Add columns introduced after a database was created
+    
+    db.create_all() only creates missing tables, so nullable columns added to
+    existing models are appended here with ALTER TABLE.
+    """
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                if column.index:
+                    connection.execute(db.text(
+                        f'CREATE INDEX IF NOT EXISTS ix_{table.name}_{column.name} ON {table.name} ({column.name})'
+                    ))
+                print(f"Added column {table.name}.{column.name}")
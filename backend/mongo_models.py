@@ -1,8 +1,20 @@
-from mongoengine import Document, StringField, EmailField, BooleanField, FloatField, DateTimeField, ReferenceField, CASCADE
-from werkzeug.security import generate_password_hash, check_password_hash
+from mongoengine import Document, StringField, EmailField, BooleanField, FloatField, IntField, DateTimeField, ListField, BinaryField, ReferenceField, CASCADE, signals
+from password_hasher import password_hasher
+from pymongo import UpdateOne
+from user_cache import user_cache
+from analytics import rollup_increments
+from janitor import expiry_for
+from collections import Counter
+from contextlib import contextmanager
 from datetime import datetime
+import hmac
 import uuid
 
+try:
+    import fcntl
+except ImportError:  # Windows: the backfill does not hold off concurrent writers
+    fcntl = None
+
 class MongoUser(Document):
     """MongoDB User model"""
     meta = {
@@ -17,14 +29,23 @@ class MongoUser(Document):
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow, onupdate=datetime.utcnow)
     is_active = BooleanField(default=True)
+    retention_days = IntField()  # upload retention policy, None = UPLOAD_RETENTION_DAYS, 0 = keep forever
     
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set password, raises HasherBusy when hashing is saturated"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Check if password matches hash"""
-        return check_password_hash(self.password_hash, password)
+        """Check if password matches hash, raises HasherBusy when hashing is saturated"""
+        return password_hasher.verify(self.password_hash, password)
+    
+    def rehash_password(self, password):
+        """Upgrade the stored hash of a verified password to the current method, returns True if changed"""
+        new_hash = password_hasher.rehash(self.password_hash, password)
+        if new_hash is None:
+            return False
+        self.password_hash = new_hash
+        return True
     
     def get_id(self):
         """Get user ID for Flask-Login"""
@@ -41,11 +62,24 @@ class MongoUser(Document):
     def __repr__(self):
         return f'<MongoUser {self.username}>'
 
+def _invalidate_cached_user(sender, document, **kwargs):
+    """Drop the cached principal after a password or status change"""
+    user_cache.invalidate(document.id)
+
+signals.post_save.connect(_invalidate_cached_user, sender=MongoUser)
+signals.post_delete.connect(_invalidate_cached_user, sender=MongoUser)
+
+def _class_probabilities(probabilities):
+    """Label a stored probability vector with the detector's class names"""
+    if not probabilities:
+        return None
+    return {label: round(p, 4) for label, p in zip(('REAL', 'DEEPFAKE'), probabilities)}
+
 class MongoDetection(Document):
     """MongoDB Detection model"""
     meta = {
         'collection': 'detections',
-        'indexes': [('user_id', 'created_at'), 'user_id']
+        'indexes': [('user_id', 'created_at'), 'user_id', 'content_hash', 'expires_at']
     }
     
     id = StringField(primary_key=True, default=lambda: str(uuid.uuid4()))
@@ -56,6 +90,12 @@ class MongoDetection(Document):
     confidence = FloatField(required=True)
     processing_time = FloatField()  # in seconds
     created_at = DateTimeField(default=datetime.utcnow, index=True)
+    content_hash = StringField(max_length=64)  # SHA-256 of the stored upload, None for legacy flat files
+    expires_at = DateTimeField()  # when the upload is purged, None = never or already purged
+    purged_at = DateTimeField()  # set once the janitor released the upload
+    probabilities = ListField(FloatField())  # softmax output, one value per class in detector order
+    embedding = BinaryField()  # L2-normalized float16 CLS embedding
+    model_version = StringField(max_length=64)  # registry version of the model that classified it
     
     def __repr__(self):
         return f'<MongoDetection {self.id}: {self.prediction}>'
@@ -68,5 +108,254 @@ class MongoDetection(Document):
             'prediction': self.prediction,
             'confidence': round(self.confidence, 2),
             'processing_time': round(self.processing_time, 2) if self.processing_time else None,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at.isoformat(),
+            'probabilities': _class_probabilities(self.probabilities),
+            'model_version': self.model_version
+        }
+    
+    def to_record(self):
+        """Raw field values, as used by rollups and batch writers"""
+        return {name: getattr(self, name) for name in self._fields}
+    
+    @classmethod
+    def reschedule_expiry(cls, user_id, retention_days, default_days, batch_size=1000):
+        """
+        Recompute expires_at for a user's unpurged uploads after a policy change
+        
+        Returns:
+            Number of detections updated
+        """
+        collection = cls._get_collection()
+        cursor = collection.find({'user_id': user_id, 'purged_at': None}, {'created_at': 1}).batch_size(batch_size)
+        operations = []
+        updated = 0
+        for document in cursor:
+            expires_at = expiry_for(document['created_at'], retention_days, default_days)
+            operations.append(UpdateOne({'_id': document['_id']}, {'$set': {'expires_at': expires_at}}))
+            if len(operations) >= batch_size:
+                updated += collection.bulk_write(operations, ordered=False).modified_count
+                operations = []
+        if operations:
+            updated += collection.bulk_write(operations, ordered=False).modified_count
+        return updated
+
+class MongoStoredFile(Document):
+    """Content-addressed upload with the number of detections referencing it"""
+    meta = {
+        'collection': 'stored_files'
+    }
+    
+    content_hash = StringField(primary_key=True)
+    path = StringField(max_length=255, required=True)  # relative to UPLOAD_FOLDER
+    ref_count = IntField(default=0)
+    created_at = DateTimeField(default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<MongoStoredFile {self.content_hash[:12]}: {self.ref_count} refs>'
+    
+    @classmethod
+    def acquire(cls, references):
+        """
+        Add references to stored files, creating their documents on first use
+        
+        Args:
+            references: Iterable of (content_hash, path, count)
+        """
+        operations = [
+            UpdateOne(
+                {'_id': content_hash},
+                {'$inc': {'ref_count': count},
+                 '$setOnInsert': {'path': path, 'created_at': datetime.utcnow()}},
+                upsert=True
+            )
+            for content_hash, path, count in references
+        ]
+        if operations:
+            cls._get_collection().bulk_write(operations, ordered=False)
+    
+    @classmethod
+    def release(cls, content_hash):
+        """Drop one reference"""
+        cls._get_collection().update_one({'_id': content_hash}, {'$inc': {'ref_count': -1}})
+    
+    @classmethod
+    def drop_if_unreferenced(cls, content_hash):
+        """Delete the document if nothing references it any more, returns True if deleted"""
+        result = cls._get_collection().delete_one({'_id': content_hash, 'ref_count': {'$lte': 0}})
+        return result.deleted_count > 0
+
+class MongoApiKey(Document):
+    """Per-user API key for machine clients, only a keyed hash of the key is stored"""
+    meta = {
+        'collection': 'api_keys',
+        'indexes': ['user_id']
+    }
+    
+    id = StringField(primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = StringField(required=True)
+    name = StringField(max_length=80, required=True)
+    prefix = StringField(max_length=8, unique=True, required=True)  # public part of the key
+    key_hash = StringField(max_length=64, required=True)  # HMAC-SHA256 of the full key
+    created_at = DateTimeField(default=datetime.utcnow)
+    last_used_at = DateTimeField()  # refreshed when a key is verified, not on cached hits
+    revoked_at = DateTimeField()
+    
+    def to_dict(self):
+        """Convert to dictionary, never includes the key or its hash"""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'prefix': self.prefix,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'last_used_at': self.last_used_at.isoformat() if self.last_used_at else None,
+            'revoked_at': self.revoked_at.isoformat() if self.revoked_at else None
         }
+    
+    def __repr__(self):
+        return f'<MongoApiKey {self.prefix}>'
+    
+    @classmethod
+    def verify(cls, prefix, key_hash):
+        """
+        Find the owner of an active key by its prefix and hash
+
+        Returns:
+            User id, or None if no active key matches
+        """
+        document = cls._get_collection().find_one(
+            {'prefix': prefix, 'revoked_at': None}, {'user_id': 1, 'key_hash': 1}
+        )
+        if document is None or not hmac.compare_digest(document['key_hash'], key_hash):
+            return None
+        cls._get_collection().update_one({'_id': document['_id']}, {'$set': {'last_used_at': datetime.utcnow()}})
+        return document['user_id']
+
+class MongoDetectionVersion(Document):
+    """Per-user counter bumped whenever the user's detections change, used for ETags"""
+    meta = {
+        'collection': 'detection_versions'
+    }
+    
+    user_id = StringField(primary_key=True)
+    version = IntField(default=0)
+    
+    def __repr__(self):
+        return f'<MongoDetectionVersion {self.user_id}: {self.version}>'
+    
+    @classmethod
+    def bump(cls, user_ids):
+        """Increment the version of every given user once with upserting $inc operations"""
+        operations = [
+            UpdateOne({'_id': user_id}, {'$inc': {'version': 1}}, upsert=True)
+            for user_id in set(user_ids)
+        ]
+        if operations:
+            cls._get_collection().bulk_write(operations, ordered=False)
+    
+    @classmethod
+    def current(cls, user_id):
+        """Current version of a user's detections (0 before the first change)"""
+        document = cls._get_collection().find_one({'_id': user_id}, {'version': 1})
+        return document['version'] if document else 0
+
+class MongoDetectionRollup(Document):
+    """Pre-aggregated detection counts per user, hour/day bucket and histogram bin"""
+    meta = {
+        'collection': 'detection_rollups',
+        'indexes': [
+            {'fields': ['user_id', 'granularity', 'bucket_start', 'prediction', 'confidence_bin', 'latency_bin'], 'unique': True}
+        ]
+    }
+    
+    KEY_FIELDS = ['user_id', 'granularity', 'bucket_start', 'prediction', 'confidence_bin', 'latency_bin']
+    
+    # flock file shared by the workers and the backfill on a host, set by init_upload_store
+    lock_path = None
+    
+    user_id = StringField(required=True)
+    granularity = StringField(max_length=8, required=True)  # 'hour' or 'day'
+    bucket_start = DateTimeField(required=True)
+    prediction = StringField(max_length=20, required=True)
+    confidence_bin = IntField(required=True)
+    latency_bin = IntField(required=True)
+    count = IntField(default=0)
+    
+    def __repr__(self):
+        return f'<MongoDetectionRollup {self.granularity} {self.bucket_start}: {self.count}>'
+    
+    @classmethod
+    @contextmanager
+    def _backfill_lock(cls, exclusive=False):
+        """Shared for apply calls, exclusive for the backfill, a no-op without a lock path"""
+        if cls.lock_path is None or fcntl is None:
+            yield
+            return
+        with open(cls.lock_path, 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+    
+    @classmethod
+    def apply(cls, increments):
+        """
+        Atomically add counter deltas with upserting $inc operations
+        
+        Decrements only update existing documents and are clamped at zero: a
+        detection stored before rollups existed may be deleted before the
+        backfill counted it. Waits while a backfill rebuilds the rollups.
+        
+        Args:
+            increments: Counter from analytics.rollup_increments
+        """
+        operations = []
+        for key, delta in increments.items():
+            if delta > 0:
+                operations.append(UpdateOne(dict(zip(cls.KEY_FIELDS, key)), {'$inc': {'count': delta}}, upsert=True))
+            elif delta < 0:
+                operations.append(UpdateOne(
+                    dict(zip(cls.KEY_FIELDS, key)),
+                    [{'$set': {'count': {'$max': [0, {'$add': [{'$ifNull': ['$count', 0]}, delta]}]}}}]
+                ))
+        if operations:
+            with cls._backfill_lock():
+                cls._get_collection().bulk_write(operations, ordered=False)
+    
+    @classmethod
+    def backfill(cls, batch_size=1000):
+        """
+        Rebuild all rollups from the detections collection
+        
+        The rollups are built in a staging collection that is then renamed
+        over the live one, so analytics never read a partial rebuild. The
+        backfill lock is held throughout, so apply calls of uploads and
+        deletes made meanwhile wait and land on the rebuilt documents instead
+        of the collection being replaced.
+        
+        Returns:
+            Number of detections aggregated
+        """
+        collection = cls._get_collection()
+        staging = collection.database[f'{collection.name}_staging']
+        projection = {'user_id': 1, 'created_at': 1, 'prediction': 1, 'confidence': 1, 'processing_time': 1}
+        
+        with cls._backfill_lock(exclusive=True):
+            increments = Counter()
+            total = 0
+            for document in MongoDetection._get_collection().find({}, projection).batch_size(batch_size):
+                increments.update(rollup_increments([document]))
+                total += 1
+            
+            staging.drop()
+            staging.create_index([(name, 1) for name in cls.KEY_FIELDS], unique=True)
+            documents = [dict(zip(cls.KEY_FIELDS, key), count=count) for key, count in increments.items() if count > 0]
+            for i in range(0, len(documents), batch_size):
+                staging.insert_many(documents[i:i + batch_size], ordered=False)
+            
+            if documents:
+                staging.rename(collection.name, dropTarget=True)
+            else:
+                staging.drop()
+                collection.delete_many({})
+        return total
@@ -0,0 +1,255 @@
+import math
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: the limit is enforced per process only
+    fcntl = None
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when password hashing is saturated and the caller should retry later"""
+
+    def __init__(self, retry_after: int):
+        super().__init__('Password hashing is busy, retry later')
+        self.retry_after = retry_after
+
+
+def _parse_method(method: str) -> tuple:
+    """(algorithm, parameters) of a werkzeug hash method, with werkzeug's defaults filled in"""
+    name, *args = method.split(':')
+    if name == 'scrypt':
+        return name, tuple(map(int, args)) if args else (2 ** 15, 8, 1)
+    if name == 'pbkdf2':
+        hash_name = args[0] if args else 'sha256'
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return name, (hash_name, iterations)
+    return name, tuple(args)
+
+
+class _HostSlots:
+    """
+    Counting semaphore shared by every process on the host
+
+    Each slot is a lock file under ``directory``; holding an exclusive flock
+    on one holds the slot, and the kernel frees it if the process dies.
+    A caller that finds every slot held blocks on the flock of the slot its
+    lane maps to. Without a directory (or fcntl) slots are counted within
+    the process.
+    """
+
+    def __init__(self, directory: str, name: str, count: int):
+        self.count = max(0, count)
+        if directory and fcntl is not None:
+            os.makedirs(directory, exist_ok=True)
+            self.paths = [os.path.join(directory, f'{name}-{i}.lock') for i in range(self.count)]
+            self._local = None
+        else:
+            self.paths = None
+            self._local = threading.BoundedSemaphore(self.count) if self.count else None
+
+    def try_acquire(self):
+        """Take a free slot without waiting, None if all are held"""
+        if self.paths is None:
+            return True if self._local is not None and self._local.acquire(blocking=False) else None
+        for path in self.paths:
+            handle = open(path, 'a')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return handle
+            except OSError:
+                handle.close()
+        return None
+
+    def lane(self, held) -> int:
+        """Index of a held slot, spreads waiters evenly over another set of slots"""
+        return self.paths.index(held.name) if self.paths is not None else 0
+
+    def acquire(self, timeout: float, lane: int = 0):
+        """Take a slot, waiting up to timeout seconds, None if none came free"""
+        held = self.try_acquire()
+        if held is not None or not self.count:
+            return held
+        if self.paths is None:
+            return True if self._local.acquire(timeout=timeout) else None
+        return self._wait(self.paths[lane % self.count], timeout)
+
+    def _wait(self, path: str, timeout: float):
+        """Blocking flock on one slot, bounded by timeout"""
+        handle = open(path, 'a')
+        acquired = threading.Event()
+        state = threading.Lock()
+        abandoned = []
+
+        def wait():
+            # flock has no timeout, so block on a helper thread the caller waits for
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+            except OSError:
+                handle.close()
+                return
+            with state:
+                if not abandoned:
+                    acquired.set()
+                    return
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+
+        threading.Thread(target=wait, name='hasher-slot-wait', daemon=True).start()
+        acquired.wait(timeout)
+        with state:
+            if acquired.is_set():
+                return handle
+            abandoned.append(True)
+        return None
+
+    def release(self, held):
+        if self.paths is None:
+            self._local.release()
+            return
+        fcntl.flock(held, fcntl.LOCK_UN)
+        held.close()
+
+
+class PasswordHasher:
+    """
+    Host-wide limit on password hashing
+
+    A burst of logins would otherwise occupy every gunicorn worker with
+    PBKDF2. At most ``max_workers`` hashes run at once across all workers on
+    the host and ``queue_size`` more may wait for one of them; anything
+    beyond that is rejected immediately with HasherBusy (503) instead of
+    tying up another worker. Limits are flock'd slot files under
+    ``slot_dir``, so they hold across processes; hashes run on the calling
+    request thread (PBKDF2 releases the GIL).
+    """
+
+    def __init__(self, max_workers: int = 2, queue_size: int = 8,
+                 method: str = 'pbkdf2:sha256:600000', timeout: float = 10.0, slot_dir: str = None):
+        """
+        Initialize the hasher
+
+        Args:
+            max_workers: Hashes computed concurrently on the host
+            queue_size: Hashes allowed to wait for a running slot on the host
+            method: Werkzeug hash method for new hashes (e.g. ``scrypt`` or
+                ``pbkdf2:sha256:600000``)
+            timeout: Seconds a queued caller waits for a running slot before giving up
+            slot_dir: Directory for the slot lock files shared by workers, None
+                to limit within this process only
+        """
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.rejected = 0
+        self.completed = 0
+        self.rehashed = 0
+        self._average = 0.0
+        self.slot_dir = None
+        self.configure(max_workers, queue_size, method, timeout, slot_dir)
+
+    def configure(self, max_workers: int = None, queue_size: int = None, method: str = None,
+                  timeout: float = None, slot_dir: str = None):
+        """Apply settings from the app config"""
+        with self._lock:
+            if max_workers is not None:
+                self.max_workers = max_workers
+            if queue_size is not None:
+                self.queue_size = queue_size
+            if method is not None:
+                self.method = method
+            if timeout is not None:
+                self.timeout = timeout
+            if slot_dir is not None:
+                self.slot_dir = slot_dir
+            # Admission tickets cover running and waiting hashes, running slots only the former
+            self._tickets = _HostSlots(self.slot_dir, 'ticket', self.max_workers + self.queue_size)
+            self._running = _HostSlots(self.slot_dir, 'running', self.max_workers)
+
+    def _retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        backlog = (self.max_workers + self.queue_size) / max(self.max_workers, 1)
+        return max(1, math.ceil(self._average * backlog))
+
+    def _run(self, fn, *args):
+        tickets, running = self._tickets, self._running
+        ticket = tickets.try_acquire()
+        if ticket is None:
+            with self._lock:
+                self.rejected += 1
+            raise HasherBusy(self._retry_after())
+        with self._lock:
+            self._in_flight += 1
+
+        try:
+            slot = running.acquire(self.timeout, tickets.lane(ticket))
+            if slot is None:
+                with self._lock:
+                    self.rejected += 1
+                raise HasherBusy(self._retry_after())
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                running.release(slot)
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.completed += 1
+                    self._average = elapsed if self.completed == 1 else 0.9 * self._average + 0.1 * elapsed
+        finally:
+            tickets.release(ticket)
+            with self._lock:
+                self._in_flight -= 1
+
+    def hash(self, password: str) -> str:
+        """Hash a password with the configured method"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, pwhash: str, password: str) -> bool:
+        """Check a password against a stored hash of any supported method"""
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash: str) -> bool:
+        """Whether a stored hash was made with a different method or work factor"""
+        try:
+            return _parse_method(pwhash.split('$', 1)[0]) != _parse_method(self.method)
+        except ValueError:
+            return True
+
+    def rehash(self, pwhash: str, password: str):
+        """
+        New hash for a verified password stored with an outdated method
+
+        Best effort: returns None when the hash is current or hashing is
+        saturated, in which case the next login tries again.
+        """
+        if not self.needs_rehash(pwhash):
+            return None
+        try:
+            new_hash = self.hash(password)
+        except HasherBusy:
+            return None
+        with self._lock:
+            self.rehashed += 1
+        return new_hash
+
+    def stats(self) -> dict:
+        """Counters for the metrics endpoint"""
+        with self._lock:
+            return {
+                'max_workers': self.max_workers,
+                'queue_size': self.queue_size,
+                'host_wide': self._running.paths is not None,
+                'in_flight': self._in_flight,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+                'average_ms': round(self._average * 1000, 1)
+            }
+
+
+# Shared per-process hasher, configured by create_app
+password_hasher = PasswordHasher()
@@ -0,0 +1,211 @@
+import io
+import logging
+import os
+import threading
+import uuid
+
+import numpy as np
+from PIL import Image
+
+from image_io import load_image
+
+try:
+    import fcntl
+except ImportError:  # Windows: every worker runs the backfill
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def encode_thumbnail(image, size: int, quality: int = 80) -> bytes:
+    """
+    Encode a WebP thumbnail no larger than size x size
+
+    Args:
+        image: Decoded RGB array or PIL image
+        size: Maximum width and height in pixels
+        quality: WebP quality (0-100)
+
+    Returns:
+        WebP bytes
+    """
+    if isinstance(image, np.ndarray):
+        image = Image.fromarray(image)
+    image = image.copy()
+    image.thumbnail((size, size), Image.BILINEAR)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='WEBP', quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def write_thumbnail(store, relpath: str, image, size: int, quality: int = 80) -> str:
+    """
+    Cache the thumbnail of an upload next to it, unless it already exists
+
+    Args:
+        store: UploadStore holding the upload
+        relpath: Relative path of the upload
+        image: Decoded RGB array or PIL image of the upload
+        size: Maximum width and height in pixels
+        quality: WebP quality (0-100)
+
+    Returns:
+        Absolute path of the thumbnail
+    """
+    path = store.abspath(store.rendition_path(relpath))
+    if os.path.exists(path):
+        return path
+    return save_thumbnail(store, relpath, encode_thumbnail(image, size, quality))
+
+
+def save_thumbnail(store, relpath: str, data: bytes) -> str:
+    """
+    Cache an already encoded thumbnail next to its upload
+
+    Returns:
+        Absolute path of the thumbnail
+    """
+    path = store.abspath(store.rendition_path(relpath))
+    temp_path = os.path.join(store.temp_dir, f'{uuid.uuid4()}.webp')
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+    # The upload was released while we were encoding, do not leave an orphan
+    if not os.path.exists(store.abspath(relpath)):
+        store.remove_renditions(relpath)
+    return path
+
+
+def ensure_thumbnail(store, relpath: str, size: int, quality: int = 80):
+    """
+    Return the cached thumbnail of an upload, rendering it from the original on a miss
+
+    Returns:
+        Absolute path of the thumbnail, or None if the upload is gone
+    """
+    path = store.abspath(store.rendition_path(relpath))
+    if os.path.exists(path):
+        return path
+
+    original = store.abspath(relpath)
+    if not os.path.exists(original):
+        return None
+    try:
+        # Reduced-resolution JPEG decode is plenty for a thumbnail
+        image, _ = load_image(original, min_size=size)
+    except (ValueError, FileNotFoundError):
+        return None
+    return write_thumbnail(store, relpath, image, size, quality)
+
+
+class RenditionBackfill:
+    """
+    Background thread rendering missing thumbnails for existing uploads
+
+    Uploads come from the database (unpurged detections, in keyset batches
+    by id) rather than a walk of the upload folder. Only the worker holding
+    the backfill lock file runs it, the others return at once.
+    """
+
+    def __init__(self, store, fetch_batch, size: int, quality: int = 80, pause: float = 0.05,
+                 batch_size: int = 500, lock_path: str = None):
+        """
+        Initialize the backfill
+
+        Args:
+            store: UploadStore holding the uploads
+            fetch_batch: Callable(after_id, limit) returning up to limit (id, relpath)
+                pairs of unpurged detections with an id above after_id, ordered by id
+            size: Thumbnail size in pixels
+            quality: WebP quality (0-100)
+            pause: Seconds to sleep between uploads to leave CPU to requests
+            batch_size: Detections fetched per query
+            lock_path: Lock file shared by the workers on a host, None to always run
+        """
+        self.store = store
+        self.fetch_batch = fetch_batch
+        self.size = size
+        self.quality = quality
+        self.pause = pause
+        self.batch_size = batch_size
+        self.lock_path = lock_path
+        self.rendered = 0
+        self._lock_file = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='rendition-backfill', daemon=True)
+
+    def start(self):
+        """Start the backfill thread"""
+        self._thread.start()
+
+    def stop(self):
+        """Stop the backfill thread"""
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def pending(self):
+        """Yield relative paths of unpurged uploads without a cached thumbnail"""
+        after_id = ''
+        while not self._stop.is_set():
+            batch = self.fetch_batch(after_id, self.batch_size)
+            # Deduplicated uploads are shared by several detections; a repeat in a
+            # later batch was rendered by then and fails the existence check
+            seen = set()
+            for _, relpath in batch:
+                if relpath in seen:
+                    continue
+                seen.add(relpath)
+                if not os.path.exists(self.store.abspath(self.store.rendition_path(relpath))):
+                    yield relpath
+            if len(batch) < self.batch_size:
+                return
+            after_id = batch[-1][0]
+
+    def claim(self) -> bool:
+        """Take the backfill lock, False if another worker holds it"""
+        if self.lock_path is None or fcntl is None:
+            return True
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def release(self):
+        """Give up the backfill lock"""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    def run_once(self) -> int:
+        """Render every missing thumbnail, returns how many were rendered"""
+        rendered = 0
+        for relpath in self.pending():
+            if self._stop.is_set():
+                break
+            try:
+                if ensure_thumbnail(self.store, relpath, self.size, self.quality):
+                    rendered += 1
+            except Exception as e:
+                logger.warning(f"Thumbnail backfill failed for {relpath}: {e}")
+            self._stop.wait(self.pause)
+        self.rendered += rendered
+        return rendered
+
+    def _run(self):
+        if not self.claim():
+            logger.info("Thumbnail backfill is running in another worker")
+            return
+        try:
+            rendered = self.run_once()
+            if rendered:
+                logger.info(f"Rendered {rendered} missing thumbnails")
+        except Exception as e:
+            logger.error(f"Thumbnail backfill failed: {e}", exc_info=True)
+        finally:
+            self.release()
@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from api_keys import is_api_key_request
+
+# Priority classes and their default share of inference slots
+INTERACTIVE = 'interactive'
+BULK = 'bulk'
+DEFAULT_CLASS_WEIGHTS = {INTERACTIVE: 4, BULK: 1}
+
+
+def request_priority() -> str:
+    """Priority class of the current request: API-key clients are bulk traffic"""
+    return BULK if is_api_key_request() else INTERACTIVE
+
+
+class _Ticket:
+    """One request waiting for an inference slot"""
+
+    def __init__(self, user_id: str, priority: str):
+        self.user_id = user_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.granted = threading.Event()
+
+
+class _DeficitRoundRobin:
+    """
+    Deficit round robin over keyed flows
+
+    Every job costs 1, so a flow is served up to its quantum in a row before
+    the next flow gets its turn. Flows are FIFO queues or nested schedulers
+    (for users inside a priority class). Flows without waiting jobs leave the
+    ring and lose their deficit, so idle flows cannot bank credit.
+    """
+
+    def __init__(self, quantum, make_flow=deque):
+        """
+        Args:
+            quantum: Callable(key) returning the flow's share per round
+            make_flow: Factory for new flows
+        """
+        self.quantum = quantum
+        self.make_flow = make_flow
+        self.flows = {}
+        self.deficits = {}
+        self.ring = deque()
+
+    def __len__(self):
+        return len(self.ring)
+
+    def push(self, keys: tuple, item):
+        """Queue an item under a key path, e.g. (priority, user_id)"""
+        key = keys[0]
+        flow = self.flows.get(key)
+        if flow is None:
+            flow = self.flows[key] = self.make_flow()
+            self.deficits[key] = 0.0
+            self.ring.append(key)
+        if isinstance(flow, _DeficitRoundRobin):
+            flow.push(keys[1:], item)
+        else:
+            flow.append(item)
+
+    def popleft(self):
+        """Remove and return the next item in fair order"""
+        while True:
+            key = self.ring[0]
+            if self.deficits[key] >= 1:
+                self.deficits[key] -= 1
+                flow = self.flows[key]
+                item = flow.popleft()
+                if not flow:
+                    self.ring.popleft()
+                    del self.flows[key]
+                    del self.deficits[key]
+                return item
+            # Turn over: credit this flow for its next turn and move on
+            self.ring.rotate(-1)
+            self.deficits[key] += self.quantum(key)
+
+
+class FairScheduler:
+    """
+    Per-user fair-share scheduling of inference slots
+
+    Requests ask for one of ``concurrency`` slots before running the model.
+    Waiting requests are queued per user inside a priority class; classes
+    share slots by deficit round robin weighted by ``class_weights`` and,
+    within a class, users share them equally, so one bulk user's backlog
+    delays everyone else by at most one inference per round. Queue waits are
+    recorded per user for the metrics endpoint.
+    """
+
+    def __init__(self, concurrency: int = 1, class_weights: dict = None, max_tracked_users: int = 1024):
+        """
+        Initialize the scheduler
+
+        Args:
+            concurrency: Inferences allowed to run at once in this process
+            class_weights: Relative share of slots per priority class
+            max_tracked_users: Users whose wait statistics are kept (least recent dropped)
+        """
+        self._lock = threading.Lock()
+        # Priority classes weighted by class_weights, users equal within a class
+        self._queue = _DeficitRoundRobin(
+            lambda priority: self.class_weights.get(priority, 1),
+            lambda: _DeficitRoundRobin(lambda user_id: 1)
+        )
+        self._running = 0
+        self._waiting = 0
+        self._waits = OrderedDict()
+        self.dispatched = {}
+        self.configure(concurrency, class_weights, max_tracked_users)
+
+    def configure(self, concurrency: int = None, class_weights: dict = None, max_tracked_users: int = None):
+        """Apply settings from the app config"""
+        with self._lock:
+            if concurrency is not None:
+                self.concurrency = max(1, concurrency)
+            if class_weights is not None:
+                self.class_weights = dict(class_weights)
+            elif not hasattr(self, 'class_weights'):
+                self.class_weights = dict(DEFAULT_CLASS_WEIGHTS)
+            if max_tracked_users is not None:
+                self.max_tracked_users = max_tracked_users
+
+    def _record_wait(self, ticket: _Ticket) -> float:
+        waited = time.monotonic() - ticket.enqueued_at
+        stats = self._waits.pop(ticket.user_id, None) or [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += waited
+        stats[2] = max(stats[2], waited)
+        self._waits[ticket.user_id] = stats
+        while len(self._waits) > self.max_tracked_users:
+            self._waits.popitem(last=False)
+        self.dispatched[ticket.priority] = self.dispatched.get(ticket.priority, 0) + 1
+        return waited
+
+    @contextmanager
+    def slot(self, user_id: str, priority: str = INTERACTIVE):
+        """
+        Hold an inference slot for the duration of the block
+
+        Blocks until the scheduler grants the slot. Yields the seconds spent
+        waiting in the queue.
+        """
+        ticket = _Ticket(str(user_id), priority)
+        with self._lock:
+            if self._running < self.concurrency and not self._waiting:
+                self._running += 1
+                ticket.granted.set()
+            else:
+                self._queue.push((priority, ticket.user_id), ticket)
+                self._waiting += 1
+
+        ticket.granted.wait()
+        with self._lock:
+            waited = self._record_wait(ticket)
+        try:
+            yield waited
+        finally:
+            self._release()
+
+    def _release(self):
+        """Hand the slot to the next ticket, or free it"""
+        with self._lock:
+            if not self._waiting:
+                self._running -= 1
+                return
+            ticket = self._queue.popleft()
+            self._waiting -= 1
+        ticket.granted.set()
+
+    def stats(self, top: int = 20) -> dict:
+        """Slot usage and the users with the longest average queue wait"""
+        with self._lock:
+            users = sorted(self._waits.items(), key=lambda item: item[1][1] / item[1][0], reverse=True)[:top]
+            return {
+                'concurrency': self.concurrency,
+                'running': self._running,
+                'waiting': self._waiting,
+                'dispatched': dict(self.dispatched),
+                'users': {
+                    user_id: {
+                        'requests': count,
+                        'avg_wait_ms': round(total / count * 1000, 1),
+                        'max_wait_ms': round(longest * 1000, 1)
+                    }
+                    for user_id, (count, total, longest) in users
+                }
+            }
+
+
+# Shared per-process scheduler, configured by create_app
+scheduler = FairScheduler()
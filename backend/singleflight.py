@@ -0,0 +1,259 @@
+import json
+import logging
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: coalescing stays within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def _open_locked(path: str, operation: int):
+    """
+    Open and flock a lock file
+
+    sweep() may unlink a lock file between our open and flock, in which case
+    we would lock an orphaned inode; retry until the locked file is the one
+    at the path.
+    """
+    while True:
+        handle = open(path, 'a')
+        try:
+            fcntl.flock(handle, operation)
+            if os.fstat(handle.fileno()).st_ino == os.stat(path).st_ino:
+                return handle
+        except FileNotFoundError:
+            pass
+        except BaseException:
+            handle.close()
+            raise
+        handle.close()
+
+
+def _remove(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class _Flight:
+    """One in-process computation that concurrent callers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent identical computations
+
+    Callers with the same key while a computation is running wait for it and
+    share its result. Within a process this is a dict of in-flight events.
+    Across workers on one host the leader holds an exclusive ``flock`` on
+    ``<lock_dir>/<key>.lock``. A worker finding it held registers itself
+    with a ``<key>.waiting`` marker and blocks on a shared lock; the leader
+    writes the result (JSON, numpy arrays become lists) only if someone is
+    waiting, and the last waiter to read it deletes it. Every leader deletes
+    a leftover result before computing, so a result is only ever served to
+    calls that overlapped its computation - this is not a result cache.
+    Files left behind by crashed workers are swept after ``result_ttl``.
+    """
+
+    def __init__(self, lock_dir: str = None, result_ttl: float = 30.0, enabled: bool = True):
+        """
+        Initialize the coalescer
+
+        Args:
+            lock_dir: Directory for cross-worker lock and result files, None for in-process only
+            result_ttl: Age after which abandoned lock and result files are swept
+            enabled: Run every computation directly when False
+        """
+        self._lock = threading.Lock()
+        self._flights = {}
+        self._waiting = 0
+        self.leaders = 0
+        self.shared = 0
+        self.shared_across_workers = 0
+        self._led = 0
+        self.configure(lock_dir, result_ttl, enabled)
+
+    def configure(self, lock_dir: str = None, result_ttl: float = None, enabled: bool = None):
+        """Apply settings from the app config"""
+        if lock_dir is not None:
+            os.makedirs(lock_dir, exist_ok=True)
+        with self._lock:
+            self.lock_dir = lock_dir
+            if result_ttl is not None:
+                self.result_ttl = result_ttl
+            if enabled is not None:
+                self.enabled = enabled
+
+    def do(self, key: str, fn):
+        """
+        Run fn once for all concurrent callers with the same key
+
+        If the leading call fails, waiting callers run fn themselves rather
+        than share the error.
+
+        Args:
+            key: Identity of the computation, e.g. an upload's content hash
+            fn: Callable computing the result
+
+        Returns:
+            Tuple of (result, shared) where shared is True if another call computed it
+        """
+        if not self.enabled:
+            return fn(), False
+
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.leaders += 1
+            else:
+                self._waiting += 1
+
+        if not leader:
+            flight.done.wait()
+            with self._lock:
+                self._waiting -= 1
+                if not flight.failed:
+                    self.shared += 1
+            if flight.failed:
+                return fn(), False
+            return flight.result, True
+
+        try:
+            flight.result, shared = self._across_workers(key, fn)
+            return flight.result, shared
+        except BaseException:
+            flight.failed = True
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _across_workers(self, key: str, fn):
+        lock_dir = self.lock_dir
+        if lock_dir is None or fcntl is None:
+            return fn(), False
+
+        base = os.path.join(lock_dir, key)
+        try:
+            handle = _open_locked(f'{base}.lock', fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return self._follow(base, fn)
+        return self._lead(handle, base, fn), False
+
+    def _lead(self, handle, base: str, fn):
+        try:
+            # Mark the lock as in use for sweep(), and never serve an earlier flight's result
+            os.utime(f'{base}.lock')
+            _remove(f'{base}.json')
+            result = fn()
+            if os.path.exists(f'{base}.waiting'):
+                self._write_result(f'{base}.json', result)
+            return result
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            handle.close()
+            with self._lock:
+                self._led += 1
+                sweep = self._led % 100 == 0
+            if sweep:
+                self.sweep()
+
+    def _follow(self, base: str, fn):
+        """Wait for the leader in another worker and read its result"""
+        with open(f'{base}.waiting', 'a'):
+            pass
+        # Blocks until the leader released its exclusive lock
+        handle = _open_locked(f'{base}.lock', fcntl.LOCK_SH)
+        try:
+            result = self._read_result(f'{base}.json')
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+            try:
+                # Only the last reader of this flight (and no new leader) gets the lock exclusively
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                _remove(f'{base}.json', f'{base}.waiting')
+            except BlockingIOError:
+                pass
+            handle.close()
+
+        if result is None:
+            # The leader failed or finished before we registered
+            return fn(), False
+        with self._lock:
+            self.shared_across_workers += 1
+        return result, True
+
+    def _read_result(self, path: str):
+        try:
+            if time.time() - os.path.getmtime(path) > self.result_ttl:
+                return None
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_result(self, path: str, result):
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(temp_path, 'w') as f:
+                json.dump(result, f, default=lambda value: value.tolist())
+            os.replace(temp_path, path)
+        except (OSError, TypeError, AttributeError) as e:
+            logger.warning(f"Could not share result across workers: {e}")
+            _remove(temp_path)
+
+    def sweep(self):
+        """Remove files of keys whose lock is not held and was last used over result_ttl ago"""
+        if self.lock_dir is None or fcntl is None:
+            return
+        cutoff = time.time() - self.result_ttl
+        for entry in os.scandir(self.lock_dir):
+            try:
+                if entry.stat().st_mtime >= cutoff:
+                    continue
+                if not entry.name.endswith('.lock'):
+                    if entry.name.endswith('.tmp'):
+                        os.remove(entry.path)
+                    continue
+                with open(entry.path, 'a') as handle:
+                    try:
+                        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        # A leader or waiters hold it
+                        continue
+                    base = entry.path[:-len('.lock')]
+                    _remove(f'{base}.json', f'{base}.waiting', entry.path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """Counters for the metrics endpoint"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'cross_worker': self.lock_dir is not None and fcntl is not None,
+                'in_flight': len(self._flights),
+                'waiting': self._waiting,
+                'leaders': self.leaders,
+                'shared': self.shared,
+                'shared_across_workers': self.shared_across_workers
+            }
+
+
+# Shared per-process coalescer, configured by create_app
+singleflight = SingleFlight()
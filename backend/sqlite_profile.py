@@ -0,0 +1,155 @@
+import os
+import logging
+import threading
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+
+def is_file_sqlite(uri: str) -> bool:
+    """Check whether a database URI points at an on-disk SQLite file"""
+    url = make_url(uri)
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def sqlite_engine_options(app) -> dict:
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS for the managed SQLite profile
+
+    Args:
+        app: Flask application with SQLITE_* settings in its config
+
+    Returns:
+        Engine options to merge into the app config before db.init_app
+    """
+    return {
+        'pool_size': app.config['SQLITE_POOL_SIZE'],
+        'max_overflow': app.config['SQLITE_POOL_MAX_OVERFLOW'],
+        'pool_pre_ping': True,
+        'connect_args': {
+            # Pool connections are handed between request and background threads
+            'check_same_thread': False,
+            'timeout': app.config['SQLITE_BUSY_TIMEOUT_MS'] / 1000.0,
+        },
+    }
+
+
+def apply_pragmas(dbapi_connection, settings: dict):
+    """Apply the connection-level pragmas of the managed profile"""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute(f"PRAGMA synchronous={settings['SQLITE_SYNCHRONOUS']}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings['SQLITE_BUSY_TIMEOUT_MS'])}")
+        cursor.execute(f"PRAGMA cache_size={int(settings['SQLITE_CACHE_SIZE'])}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings['SQLITE_MMAP_SIZE'])}")
+        cursor.execute(f"PRAGMA wal_autocheckpoint={int(settings['SQLITE_WAL_AUTOCHECKPOINT'])}")
+    finally:
+        cursor.close()
+
+
+class WalCheckpointer:
+    """Background thread that keeps the WAL file from growing without bound"""
+
+    def __init__(self, engine, interval: float = 60.0, truncate_bytes: int = 64 * 1024 * 1024):
+        """
+        Initialize the checkpointer
+
+        Args:
+            engine: SQLAlchemy engine bound to the SQLite file
+            interval: Seconds between checkpoints
+            truncate_bytes: WAL size above which a TRUNCATE checkpoint is used
+        """
+        self.engine = engine
+        self.interval = interval
+        self.truncate_bytes = truncate_bytes
+        self.wal_path = f"{engine.url.database}-wal"
+        self.checkpoints = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start the checkpoint loop"""
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='sqlite-wal-checkpointer', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the checkpoint loop"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def checkpoint(self):
+        """
+        Run one checkpoint
+
+        PASSIVE never blocks readers or writers. Once the WAL has grown past
+        truncate_bytes a TRUNCATE checkpoint resets it, which waits briefly
+        for readers but keeps later reads from scanning a huge WAL.
+        """
+        mode = 'PASSIVE'
+        if os.path.exists(self.wal_path) and os.path.getsize(self.wal_path) > self.truncate_bytes:
+            mode = 'TRUNCATE'
+
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute(f'PRAGMA wal_checkpoint({mode})')
+            busy, log_frames, checkpointed = cursor.fetchone()
+            cursor.close()
+        finally:
+            connection.close()
+
+        self.checkpoints += 1
+        return mode, busy, log_frames, checkpointed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                logger.warning(f"WAL checkpoint failed: {e}")
+
+
+def init_sqlite_profile(app, db):
+    """
+    Enable the managed SQLite profile on an initialized Flask-SQLAlchemy app
+
+    Args:
+        app: Flask application
+        db: Flask-SQLAlchemy extension already bound to the app
+
+    Returns:
+        The running WalCheckpointer, or None if the profile does not apply
+    """
+    if not app.config.get('SQLITE_MANAGED') or not is_file_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        return None
+
+    with app.app_context():
+        engine = db.engine
+
+    settings = {key: value for key, value in app.config.items() if key.startswith('SQLITE_')}
+
+    @event.listens_for(engine, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        apply_pragmas(dbapi_connection, settings)
+
+    checkpointer = WalCheckpointer(
+        engine,
+        interval=app.config['SQLITE_CHECKPOINT_INTERVAL'],
+        truncate_bytes=app.config['SQLITE_CHECKPOINT_TRUNCATE_BYTES']
+    )
+    checkpointer.start()
+
+    def after_fork():
+        # Forked workers must not share pooled connections with the parent
+        engine.dispose(close=False)
+        checkpointer.start()
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=after_fork)
+
+    print(f"SQLite managed profile enabled: WAL, synchronous={settings['SQLITE_SYNCHRONOUS']}")
+    return checkpointer
@@ -0,0 +1,273 @@
+import os
+import hashlib
+import logging
+import uuid
+from collections import Counter
+
+from image_io import SUPPORTED_FORMATS, sniff_image
+
+logger = logging.getLogger(__name__)
+
+# Bytes read per chunk while hashing and copying uploads
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_references(records):
+    """
+    Count stored-file references made by a batch of detection records
+
+    Returns:
+        List of (content_hash, path, count); legacy records without a hash are skipped
+    """
+    counts = Counter(
+        (record['content_hash'], record['filename'])
+        for record in records if record.get('content_hash')
+    )
+    return [(content_hash, path, count) for (content_hash, path), count in counts.items()]
+
+
+class HashingFile:
+    """
+    Writable temp file that hashes bytes as they are written
+
+    Used as the target of the multipart parser so an upload is hashed and
+    written to the store's temp area while the request body is received.
+    The file is removed on close unless ``UploadStore.stage`` claimed it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.claimed = False
+        self._file = open(path, 'w+b')
+
+    def write(self, data) -> int:
+        self.digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def close(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self.claimed and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # seek/read/tell/... for FileStorage
+        return getattr(self._file, name)
+
+
+def streaming_request_class(store):
+    """
+    Build a Flask request class that streams file parts straight into ``store``
+
+    Werkzeug otherwise spools each file part into its own temp file (or
+    memory) which then has to be copied and hashed again.
+    """
+    from flask import Request
+
+    class StreamingUploadRequest(Request):
+        def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+            return store.open_staging()
+
+    return StreamingUploadRequest
+
+
+class StagedUpload:
+    """An upload written to the store's temp area and hashed, not yet committed"""
+
+    def __init__(self, content_hash: str, temp_path: str, size: int, relpath: str):
+        self.content_hash = content_hash
+        self.temp_path = temp_path
+        self.size = size
+        self.relpath = relpath
+
+    def __repr__(self):
+        return f'<StagedUpload {self.content_hash[:12]} {self.size} bytes>'
+
+
+class UploadStore:
+    """
+    Content-addressed upload storage
+
+    Files are stored once per SHA-256 digest under a two-level sharded layout
+    (``ab/cd/abcd....png``) below the upload folder. Reference counting lives
+    in the database; the store only moves bytes in and out of place.
+    """
+
+    def __init__(self, root: str):
+        """
+        Initialize the store
+
+        Args:
+            root: Upload folder holding the shard directories
+        """
+        self.root = root
+        self.temp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.temp_dir, exist_ok=True)
+
+    @staticmethod
+    def path_for(content_hash: str, ext: str) -> str:
+        """Relative sharded path for a digest"""
+        return os.path.join(content_hash[:2], content_hash[2:4], f'{content_hash}.{ext}')
+
+    def abspath(self, relpath: str) -> str:
+        """Absolute path of a stored (or legacy flat) upload"""
+        return os.path.join(self.root, relpath)
+
+    @staticmethod
+    def rendition_path(relpath: str, name: str = 'thumb') -> str:
+        """Relative path of a cached rendition, kept next to its upload"""
+        return f'{os.path.splitext(relpath)[0]}.{name}.webp'
+
+    def remove_renditions(self, relpath: str):
+        """Delete cached renditions of an upload"""
+        path = self.abspath(self.rendition_path(relpath))
+        if os.path.exists(path):
+            os.remove(path)
+
+    def remove(self, relpath: str):
+        """Delete a legacy upload owned by a single detection, with its renditions"""
+        path = self.abspath(relpath)
+        if os.path.exists(path):
+            os.remove(path)
+        self.remove_renditions(relpath)
+
+    def open_staging(self) -> HashingFile:
+        """Open a hashing temp file to receive an upload into"""
+        return HashingFile(os.path.join(self.temp_dir, f'{uuid.uuid4()}.part'))
+
+    def stage(self, stream, ext: str = None) -> StagedUpload:
+        """
+        Stage an upload in the temp area and hash it
+
+        Streams received through ``open_staging`` are already hashed and in
+        place, so they are claimed without another copy. Other streams are
+        copied into the temp area while hashing.
+
+        Args:
+            stream: Readable binary file object
+            ext: Lower-case file extension without the dot, None to use the
+                canonical extension of the sniffed image format. Uploads pass
+                None, so identical bytes map to one path whatever the client
+                named them.
+
+        Returns:
+            StagedUpload to commit once the detection is persisted
+
+        Raises:
+            ValueError: ext is None and the upload is not a supported image
+        """
+        if isinstance(stream, HashingFile) and os.path.dirname(stream.path) == self.temp_dir:
+            stream.flush()
+            # Unclaimed on error, so the request teardown removes it
+            ext = ext or self._sniff_extension(stream.path)
+            stream.claimed = True
+            content_hash = stream.digest.hexdigest()
+            return StagedUpload(content_hash, stream.path, stream.size, self._relpath(content_hash, ext))
+
+        temp_path = os.path.join(self.temp_dir, f'{uuid.uuid4()}.part')
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(temp_path, 'wb') as out:
+                while True:
+                    chunk = stream.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+                    size += len(chunk)
+            ext = ext or self._sniff_extension(temp_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        content_hash = digest.hexdigest()
+        return StagedUpload(content_hash, temp_path, size, self._relpath(content_hash, ext))
+
+    def _relpath(self, content_hash: str, ext: str) -> str:
+        """Path for a digest, reusing a copy stored under another extension by older versions"""
+        shard = os.path.dirname(self.path_for(content_hash, ext))
+        try:
+            names = os.listdir(os.path.join(self.root, shard))
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            stem, _, suffix = name.partition('.')
+            # Renditions are <hash>.<name>.webp
+            if stem == content_hash and suffix and '.' not in suffix:
+                return os.path.join(shard, name)
+        return self.path_for(content_hash, ext)
+
+    @staticmethod
+    def _sniff_extension(path: str) -> str:
+        return SUPPORTED_FORMATS[sniff_image(path).format]
+
+    def commit(self, staged: StagedUpload) -> str:
+        """
+        Move a staged upload into place, or drop it if the bytes are already stored
+
+        Call after the reference has been committed to the database.
+
+        Returns:
+            Absolute path of the stored file
+        """
+        final_path = self.abspath(staged.relpath)
+        if os.path.exists(final_path):
+            os.remove(staged.temp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(staged.temp_path, final_path)
+        return final_path
+
+    def discard(self, staged: StagedUpload):
+        """Remove a staged upload that will not be committed"""
+        if staged is not None and os.path.exists(staged.temp_path):
+            os.remove(staged.temp_path)
+
+    def release(self, relpath: str, drop_reference) -> bool:
+        """
+        Unlink a stored file once its last reference is gone
+
+        The file is first renamed to a tombstone so that an upload of the same
+        bytes racing with this call either sees it missing (and writes its own
+        copy) or has its new reference seen by ``drop_reference``.
+
+        Args:
+            relpath: Relative path of the stored file
+            drop_reference: Callable that deletes the reference record if its
+                count is zero and returns True when it did
+
+        Returns:
+            True if the file was unlinked
+        """
+        final_path = self.abspath(relpath)
+        tombstone = os.path.join(self.temp_dir, f'{uuid.uuid4()}.deleted')
+
+        try:
+            os.replace(final_path, tombstone)
+        except FileNotFoundError:
+            drop_reference()
+            return False
+
+        try:
+            dropped = drop_reference()
+        except Exception:
+            os.replace(tombstone, final_path)
+            raise
+
+        if dropped:
+            os.remove(tombstone)
+            self.remove_renditions(relpath)
+            return True
+
+        # Re-referenced meanwhile, put the bytes back
+        if os.path.exists(final_path):
+            os.remove(tombstone)
+        else:
+            os.replace(tombstone, final_path)
+        return False
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class UserCache:
+    """Per-worker TTL cache of user principals for the Flask-Login user_loader"""
+
+    def __init__(self, ttl: float = 60.0, max_size: int = 10000):
+        """
+        Initialize the cache
+
+        Args:
+            ttl: Seconds a cached user stays valid, 0 disables caching
+            max_size: Maximum number of cached users (least recently used evicted)
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def configure(self, ttl: float = None, max_size: int = None):
+        """Apply settings from the app config and drop cached entries"""
+        if ttl is not None:
+            self.ttl = ttl
+        if max_size is not None:
+            self.max_size = max_size
+        self.clear()
+
+    def get(self, user_id, loader):
+        """
+        Get a cached user or load it
+
+        Args:
+            user_id: User identifier from the session
+            loader: Callable returning the user (or None) on a cache miss
+
+        Returns:
+            Cached or freshly loaded value, None if the user does not exist
+        """
+        key = str(user_id)
+        now = time.monotonic()
+
+        if self.ttl > 0:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+
+        value = loader()
+
+        with self._lock:
+            self.misses += 1
+            # Unknown users are not cached so a new account is visible immediately
+            if value is not None and self.ttl > 0:
+                self._entries[key] = (now + self.ttl, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+
+        return value
+
+    def invalidate(self, user_id):
+        """Drop one user, e.g. after a password change or account disable"""
+        with self._lock:
+            if self._entries.pop(str(user_id), None) is not None:
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop all cached users"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Hit-rate metrics for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+# Shared per-process cache used by the user loaders
+user_cache = UserCache()
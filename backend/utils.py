@@ -4,7 +4,7 @@ import os
 import hashlib
 from datetime import datetime, timedelta
 from functools import wraps
-import time
+from image_io import sniff_image
 
 def secure_filename(filename):
     """Secure a filename to prevent directory traversal"""
@@ -19,20 +19,6 @@ def get_file_size_mb(filepath):
         return os.path.getsize(filepath) / (1024 * 1024)
     return 0
 
-def delete_old_uploads(upload_folder, days=7):
-    """Delete uploads older than specified days"""
-    cutoff_time = time.time() - (days * 24 * 60 * 60)
-    
-    for filename in os.listdir(upload_folder):
-        filepath = os.path.join(upload_folder, filename)
-        if os.path.isfile(filepath):
-            if os.path.getctime(filepath) < cutoff_time:
-                try:
-                    os.remove(filepath)
-                    print(f"Deleted old file: {filename}")
-                except Exception as e:
-                    print(f"Error deleting {filename}: {e}")
-
 def format_size(size_bytes):
     """Format bytes to human readable size"""
     for unit in ['B', 'KB', 'MB', 'GB']:
@@ -59,30 +45,20 @@ def time_ago(dt):
     else:
         return "just now"
 
-def validate_image_file(filepath):
-    """Validate if file is a proper image"""
+def validate_image_file(filepath, max_pixels=None):
+    """Validate if file is a supported image within the pixel budget (header only)"""
     try:
-        from PIL import Image
-        image = Image.open(filepath)
-        image.verify()
+        sniff_image(filepath, max_pixels)
         return True
-    except Exception as e:
+    except ValueError as e:
         print(f"Image validation error: {e}")
         return False
 
 def get_image_info(filepath):
-    """Get image information"""
+    """Get image information from the header"""
     try:
-        from PIL import Image
-        image = Image.open(filepath)
-        return {
-            'format': image.format,
-            'size': image.size,
-            'mode': image.mode,
-            'width': image.width,
-            'height': image.height
-        }
-    except Exception as e:
+        return sniff_image(filepath).to_dict()
+    except ValueError as e:
         print(f"Error getting image info: {e}")
         return None
 
@@ -0,0 +1,226 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Stored embeddings are L2-normalized float16
+EMBEDDING_DTYPE = np.float16
+
+
+def pack_embedding(embedding) -> bytes:
+    """Serialize an embedding for storage, None stays None"""
+    if embedding is None:
+        return None
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE).tobytes()
+
+
+def unpack_embedding(data: bytes) -> np.ndarray:
+    """Deserialize a stored embedding"""
+    return np.frombuffer(data, dtype=EMBEDDING_DTYPE)
+
+
+class _Group:
+    """Embeddings of one model version, rows past size are spare capacity for appends"""
+
+    def __init__(self, ids: list, matrix: np.ndarray):
+        self.ids = ids
+        self.matrix = matrix
+        self.size = len(ids)
+
+    def append(self, detection_id: str, vector: np.ndarray) -> int:
+        """Append a row in place, growing the buffer geometrically, returns its position"""
+        if self.size == len(self.matrix):
+            grown = np.empty((max(2 * self.size, 8), self.matrix.shape[1]), dtype=np.float32)
+            grown[:self.size] = self.matrix[:self.size]
+            # Searches already running keep the old buffer
+            self.matrix = grown
+        self.matrix[self.size] = vector
+        self.ids.append(detection_id)
+        self.size += 1
+        return self.size - 1
+
+
+class _UserVectors:
+    """Embedding matrices of one user's detections at a data version, one per model version"""
+
+    def __init__(self, version: int, groups: dict):
+        self.version = version
+        # model version -> _Group
+        self.groups = groups
+        self.positions = {}
+        for model_version in groups:
+            self._index(model_version)
+
+    def _index(self, model_version):
+        for i, detection_id in enumerate(self.groups[model_version].ids):
+            self.positions[detection_id] = (model_version, i)
+
+
+class VectorIndex:
+    """
+    In-process cosine similarity index over detection embeddings
+
+    Vectors are partitioned by user (searches never cross users) and each
+    partition is searched by brute force with one matrix-vector product.
+    Partitions are loaded on demand and tagged with the user's detection
+    version. Writes made by this worker are applied to the cached partition
+    with add() and remove(), which advance its version when it was current;
+    a version moved by any other worker reloads the user's vectors on the
+    next search. The least recently used partitions are evicted.
+    Embeddings from different model versions live in different spaces (and
+    may differ in size), so a query is only compared with detections made
+    by the same model version.
+    """
+
+    def __init__(self, loader, max_users: int = 256):
+        """
+        Initialize the index
+
+        Args:
+            loader: Callable(user_id) returning (ids, iterable of embedding bytes) and
+                optionally the model version of each embedding
+            max_users: Partitions kept in memory
+        """
+        self.loader = loader
+        self.max_users = max_users
+        self._partitions = OrderedDict()
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _partition(self, user_id: str, version: int) -> _UserVectors:
+        with self._lock:
+            partition = self._partitions.get(user_id)
+            if partition is not None and partition.version == version:
+                self._partitions.move_to_end(user_id)
+                return partition
+
+        loaded = self.loader(user_id)
+        ids, embeddings = loaded[0], loaded[1]
+        model_versions = loaded[2] if len(loaded) > 2 else [None] * len(ids)
+        grouped = {}
+        for detection_id, data, model_version in zip(ids, embeddings, model_versions):
+            group_ids, vectors = grouped.setdefault(model_version, ([], []))
+            group_ids.append(detection_id)
+            vectors.append(unpack_embedding(data))
+        # float32 in memory so the product runs through BLAS
+        partition = _UserVectors(version, {
+            model_version: _Group(group_ids, np.vstack(vectors).astype(np.float32))
+            for model_version, (group_ids, vectors) in grouped.items()
+        })
+
+        with self._lock:
+            self.loads += 1
+            self._partitions[user_id] = partition
+            self._partitions.move_to_end(user_id)
+            while len(self._partitions) > self.max_users:
+                self._partitions.popitem(last=False)
+        return partition
+
+    def _current(self, user_id: str, version: int):
+        """Cached partition the one write behind version is applied to, None if it is not cached or stale"""
+        partition = self._partitions.get(user_id)
+        if partition is None or partition.version != version - 1:
+            # A stale partition is reloaded by the next search anyway
+            return None
+        return partition
+
+    def is_cached(self, user_id: str) -> bool:
+        """Whether a partition of the user is in memory"""
+        with self._lock:
+            return user_id in self._partitions
+
+    def add(self, user_id: str, version: int, ids, embeddings, model_versions=None):
+        """
+        Append new detections to a cached partition instead of reloading it
+
+        Args:
+            user_id: Owner of the detections
+            version: Detection version of the user after the insert was committed
+            ids: Ids of the inserted detections
+            embeddings: Stored embedding bytes of each detection, None is skipped
+            model_versions: Model version of each embedding
+        """
+        if model_versions is None:
+            model_versions = [None] * len(ids)
+        with self._lock:
+            partition = self._current(user_id, version)
+            if partition is None:
+                return
+            for detection_id, data, model_version in zip(ids, embeddings, model_versions):
+                # A load racing the insert may already have read the row
+                if data is None or detection_id in partition.positions:
+                    continue
+                vector = unpack_embedding(data).astype(np.float32)
+                group = partition.groups.get(model_version)
+                if group is None:
+                    group = partition.groups[model_version] = _Group([], np.empty((0, len(vector)), dtype=np.float32))
+                partition.positions[detection_id] = (model_version, group.append(detection_id, vector))
+            partition.version = version
+
+    def remove(self, user_id: str, version: int, detection_id: str):
+        """
+        Drop a deleted detection from a cached partition instead of reloading it
+
+        The detection's model version group is rebuilt without its row, so
+        searches already running keep a consistent copy.
+
+        Args:
+            user_id: Owner of the detection
+            version: Detection version of the user after the delete was committed
+            detection_id: Deleted detection
+        """
+        with self._lock:
+            partition = self._current(user_id, version)
+            if partition is None:
+                return
+            located = partition.positions.pop(detection_id, None)
+            if located is not None:
+                model_version, position = located
+                group = partition.groups[model_version]
+                ids = group.ids[:position] + group.ids[position + 1:group.size]
+                if ids:
+                    partition.groups[model_version] = _Group(ids, np.delete(group.matrix[:group.size], position, axis=0))
+                    partition._index(model_version)
+                else:
+                    del partition.groups[model_version]
+            partition.version = version
+
+    def search(self, user_id: str, version: int, detection_id: str, k: int = 10):
+        """
+        Find the user's detections most similar to one of their detections
+
+        Args:
+            user_id: Owner of the detections
+            version: Current detection version of the user
+            detection_id: Detection whose embedding is the query
+            k: Number of results
+
+        Returns:
+            List of (detection_id, cosine similarity) best first, or None if
+            the detection has no stored embedding
+        """
+        partition = self._partition(user_id, version)
+        with self._lock:
+            located = partition.positions.get(detection_id)
+            if located is None:
+                return None
+            model_version, position = located
+            group = partition.groups[model_version]
+            # Appends only write past size, so this view stays stable without the lock
+            ids, matrix = group.ids, group.matrix[:group.size]
+
+        # Stored vectors are unit length, so the dot product is the cosine similarity
+        scores = matrix @ matrix[position]
+        scores[position] = -np.inf
+
+        k = min(k, len(scores) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(ids[i], float(scores[i])) for i in top]
+
+    def invalidate(self, user_id: str):
+        """Drop a user's partition"""
+        with self._lock:
+            self._partitions.pop(user_id, None)
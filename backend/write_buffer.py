@@ -0,0 +1,124 @@
+import atexit
+import logging
+import threading
+import time
+import uuid
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionWriteBuffer:
+    """Write-behind buffer that group-commits detection records"""
+
+    def __init__(self, flush_fn, max_batch: int = 50, flush_interval_ms: int = 200):
+        """
+        Initialize the write buffer
+
+        Args:
+            flush_fn: Callable receiving a list of record dicts to persist in one batch,
+                returning the ids of records it had to drop (None if all were stored)
+            max_batch: Flush as soon as this many records are pending
+            flush_interval_ms: Flush pending records at least this often
+        """
+        self.flush_fn = flush_fn
+        self.max_batch = max(1, int(max_batch))
+        self.flush_interval = max(1, int(flush_interval_ms)) / 1000.0
+
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._closed = False
+
+        self.flushed_records = 0
+        self.flushed_batches = 0
+        self.failed_records = 0
+
+        self._thread = threading.Thread(target=self._run, name='detection-write-buffer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record: dict, on_flushed=None) -> str:
+        """
+        Queue a record for persistence
+
+        Args:
+            record: Column values for one detection
+            on_flushed: Callable(stored) run after the record's flush, stored is
+                False if the record was dropped
+
+        Returns:
+            The detection id, assigned before the record is committed
+        """
+        record = dict(record)
+        record.setdefault('id', str(uuid.uuid4()))
+        record.setdefault('created_at', datetime.utcnow())
+
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('Write buffer is closed')
+            self._pending.append((record, on_flushed))
+            if len(self._pending) >= self.max_batch:
+                self._wakeup.notify()
+
+        return record['id']
+
+    def pending_count(self) -> int:
+        """Number of records waiting to be flushed"""
+        with self._lock:
+            return len(self._pending)
+
+    def flush(self):
+        """Persist everything that is currently pending"""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+
+            records = [record for record, _ in batch]
+            try:
+                dropped = set(self.flush_fn(records) or ())
+                self.flushed_records += len(records) - len(dropped)
+                self.failed_records += len(dropped)
+                self.flushed_batches += 1
+            except Exception as e:
+                dropped = {record['id'] for record in records}
+                self.failed_records += len(records)
+                logger.error(f"Write-behind flush of {len(records)} detections failed: {e}", exc_info=True)
+
+            for record, on_flushed in batch:
+                if on_flushed is None:
+                    continue
+                try:
+                    on_flushed(record['id'] not in dropped)
+                except Exception as e:
+                    logger.error(f"Completing detection {record['id']} after flush failed: {e}", exc_info=True)
+
+    def close(self):
+        """Stop the background thread and flush remaining records"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wakeup.notify()
+
+        self._thread.join(timeout=max(5.0, self.flush_interval * 2))
+        self.flush()
+
+    def _run(self):
+        """Background loop flushing on size or interval"""
+        while True:
+            with self._lock:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._closed and len(self._pending) < self.max_batch:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._wakeup.wait(remaining)
+                closed = self._closed
+
+            if closed:
+                return
+            self.flush()
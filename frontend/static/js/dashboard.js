@@ -188,11 +188,38 @@ function showError(message) {
     uploadStatus.textContent = message;
 }
 
+// Conditional GET: responses are kept per URL with their ETag and revalidated
+// with If-None-Match, so unchanged data comes back as an empty 304
+const conditionalCache = new Map();
+
+async function fetchConditional(url) {
+    const cached = conditionalCache.get(url);
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+    
+    // no-store: we handle revalidation ourselves and want to see the 304
+    const response = await fetch(url, { headers, cache: 'no-store', credentials: 'include' });
+    
+    if (response.status === 304 && cached) {
+        return { data: cached.data, changed: false };
+    }
+    
+    const data = await response.json();
+    const etag = response.headers.get('ETag');
+    if (response.ok && etag) {
+        conditionalCache.set(url, { etag, data });
+    } else {
+        conditionalCache.delete(url);
+    }
+    return { data, changed: true };
+}
+
 // Load detection history
 async function loadDetectionHistory() {
     try {
-        const response = await fetch('/api/detection/history?page=1&limit=20');
-        const data = await response.json();
+        const { data, changed } = await fetchConditional('/api/detection/history?page=1&limit=20');
+        if (!changed) {
+            return;  // Nothing new, keep the rendered list
+        }
         
         const historyContainer = document.getElementById('historyContainer');
         const emptyState = document.getElementById('historyEmpty');
@@ -221,6 +248,8 @@ function createHistoryItem(detection) {
     
     div.className = `history-item ${className}`;
     div.innerHTML = `
+        <img class="history-thumb" src="/api/detection/thumbnail/${detection.id}" alt="" loading="lazy" decoding="async"
+             onerror="this.remove()">
         <div class="history-header">
             <div class="history-filename">${icon} ${detection.filename}</div>
             <button class="history-delete" onclick="deleteDetection('${detection.id}')">🗑</button>
@@ -259,8 +288,10 @@ async function deleteDetection(detectionId) {
 // Load statistics
 async function loadStatistics() {
     try {
-        const response = await fetch('/api/detection/stats');
-        const data = await response.json();
+        const { data, changed } = await fetchConditional('/api/detection/stats');
+        if (!changed) {
+            return;
+        }
         
         document.getElementById('totalDetections').textContent = data.total_detections;
         document.getElementById('realCount').textContent = data.real_images;
@@ -0,0 +1,26 @@
+"""
+Gunicorn settings loaded automatically from the working directory
+
+Runs threaded workers and gives every worker a stable index (reused when a
+worker is replaced) so the app can plan its share of the CPU, see
+backend/cpu_topology.py.
+"""
+
+import os
+
+# Sync workers hold one request per process, so the fair-share scheduler and
+# admission control would never see more than one waiting request to order or shed
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+
+def pre_fork(server, worker):
+    """Assign the lowest index not held by a live worker"""
+    used = {getattr(live, 'worker_index', None) for live in server.WORKERS.values()}
+    worker.worker_index = next(index for index in range(len(used) + 1) if index not in used)
+
+
+def post_fork(server, worker):
+    """Export the index and worker count before the app is loaded in the worker"""
+    os.environ['WORKER_INDEX'] = str(worker.worker_index)
+    os.environ['WORKER_COUNT'] = str(server.num_workers)
@@ -5,14 +5,269 @@ Migrates user accounts and detection history from SQLite to MongoDB
 
 import os
 import sys
+import json
+import time
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from werkzeug.security import generate_password_hash
 
+# Backend modules use flat imports
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
 # Load environment variables
 load_dotenv()
 
-def migrate_to_mongodb():
-    """Migrate data from SQLite to MongoDB"""
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_WORKERS = 4
+DEFAULT_CHECKPOINT = 'migration_checkpoint.json'
+
+class MigrationCheckpoint:
+    """Persists migration progress so an interrupted run can resume"""
+    
+    def __init__(self, path):
+        self.path = path
+        self.state = {'last_detection_id': None}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.state.update(json.load(f))
+    
+    def save(self, **changes):
+        """Update and atomically write the checkpoint file"""
+        self.state.update(changes)
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.state, f)
+        os.replace(tmp_path, self.path)
+    
+    def clear(self):
+        """Remove the checkpoint after a completed migration"""
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+class ProgressReporter:
+    """Thread-safe row counters with periodic rows/second output"""
+    
+    def __init__(self, label, total, interval=5.0):
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.inserted = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started = time.time()
+        self._last_report = self.started
+        self._lock = threading.Lock()
+    
+    def add(self, inserted=0, skipped=0, failed=0):
+        with self._lock:
+            self.inserted += inserted
+            self.skipped += skipped
+            self.failed += failed
+            now = time.time()
+            if now - self._last_report >= self.interval:
+                self._last_report = now
+                self._print(now)
+    
+    def rate(self):
+        elapsed = max(time.time() - self.started, 1e-6)
+        return (self.inserted + self.skipped + self.failed) / elapsed
+    
+    def _print(self, now):
+        done = self.inserted + self.skipped + self.failed
+        print(f"   ✓ {self.label}: {done}/{self.total} processed "
+              f"({self.inserted} inserted, {self.skipped} skipped, {self.failed} failed) "
+              f"- {self.rate():.0f} rows/s")
+    
+    def finish(self):
+        self._print(time.time())
+
+def write_detection_batch(collection, documents):
+    """
+    Insert one batch of detection documents
+    
+    Args:
+        collection: pymongo collection for detections
+        documents: Documents with preassigned _id values
+        
+    Returns:
+        Tuple of (inserted, skipped, failed); duplicate ids from an earlier
+        run count as skipped, which keeps resumed migrations idempotent
+    """
+    from pymongo.errors import BulkWriteError
+    
+    if not documents:
+        return 0, 0, 0
+    
+    try:
+        result = collection.insert_many(documents, ordered=False)
+        return len(result.inserted_ids), 0, 0
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        duplicates = sum(1 for error in errors if error.get('code') == 11000)
+        failed = len(errors) - duplicates
+        for error in errors:
+            if error.get('code') != 11000:
+                print(f"   ✗ Error migrating detection {documents[error['index']]['_id']}: {error.get('errmsg')}")
+        return e.details.get('nInserted', 0), duplicates, failed
+
+def migrate_users(User, user_collection, batch_size):
+    """
+    Bulk upsert users and build the SQLite → MongoDB user id map
+    
+    Users keep their SQLite id. A username that already exists in MongoDB
+    (e.g. from an earlier migration) is mapped onto the existing document.
+    """
+    from pymongo import UpdateOne
+    
+    existing = {doc['username']: doc['_id'] for doc in user_collection.find({}, {'username': 1})}
+    user_map = {}
+    operations = []
+    migrated_users = 0
+    
+    def flush():
+        nonlocal migrated_users
+        if operations:
+            result = user_collection.bulk_write(operations, ordered=False)
+            migrated_users += result.upserted_count
+            operations.clear()
+    
+    query = User.query.order_by(User.id).yield_per(batch_size)
+    for user in query:
+        if user.username in existing:
+            user_map[user.id] = existing[user.username]
+            continue
+        
+        user_map[user.id] = user.id
+        operations.append(UpdateOne(
+            {'_id': user.id},
+            {'$setOnInsert': {
+                'username': user.username,
+                'email': user.email,
+                'password_hash': user.password_hash,
+                'created_at': user.created_at,
+                'updated_at': user.updated_at,
+                'is_active': user.is_active if user.is_active is not None else True
+            }},
+            upsert=True
+        ))
+        if len(operations) >= batch_size:
+            flush()
+    flush()
+    
+    return user_map, migrated_users
+
+def migrate_stored_files(StoredFile, collection, batch_size):
+    """Copy stored-file reference counts, overwriting counts from an earlier run"""
+    from pymongo import UpdateOne
+    
+    operations = []
+    migrated = 0
+    for stored in StoredFile.query.yield_per(batch_size):
+        operations.append(UpdateOne(
+            {'_id': stored.content_hash},
+            {'$set': {'path': stored.path, 'ref_count': stored.ref_count, 'created_at': stored.created_at}},
+            upsert=True
+        ))
+        if len(operations) >= batch_size:
+            collection.bulk_write(operations, ordered=False)
+            migrated += len(operations)
+            operations = []
+    if operations:
+        collection.bulk_write(operations, ordered=False)
+        migrated += len(operations)
+    return migrated
+
+def migrate_detections(db, Detection, collection, user_map, checkpoint, batch_size, workers, reporter):
+    """
+    Stream detections by primary key and insert them in parallel batches
+    
+    Rows are read with yield_per in id order, so memory stays bounded by
+    batch_size * workers. The checkpoint only advances past a batch once
+    it and every earlier batch have been written without failures; after
+    the first failed batch it stays put, so a rerun retries that batch and
+    skips the later ones as duplicates.
+    """
+    from sqlalchemy import select
+    
+    table = Detection.__table__
+    statement = select(table).order_by(table.c.id)
+    last_id = checkpoint.state.get('last_detection_id')
+    if last_id:
+        statement = statement.where(table.c.id > last_id)
+        print(f"   ↻ Resuming after detection {last_id}")
+    
+    in_flight = deque()
+    slots = threading.BoundedSemaphore(workers * 2)
+    stalled = False
+    
+    def advance_checkpoint():
+        nonlocal stalled
+        while in_flight and in_flight[0][2].done():
+            batch_last_id, unmapped, future = in_flight.popleft()
+            inserted, skipped, failed = future.result()
+            reporter.add(inserted, skipped, failed)
+            if failed or unmapped:
+                stalled = True
+            if not stalled:
+                checkpoint.save(last_detection_id=batch_last_id)
+    
+    def submit(executor, documents, batch_last_id, unmapped):
+        slots.acquire()
+        future = executor.submit(write_detection_batch, collection, documents)
+        future.add_done_callback(lambda _: slots.release())
+        in_flight.append((batch_last_id, unmapped, future))
+        advance_checkpoint()
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        documents = []
+        unmapped = 0
+        batch_last_id = None
+        result = db.session.execute(statement.execution_options(yield_per=batch_size))
+        for row in result:
+            document = dict(row._mapping)
+            document['_id'] = document.pop('id')
+            batch_last_id = document['_id']
+            
+            user_id = user_map.get(document['user_id'])
+            if user_id is None:
+                print(f"   ✗ Error migrating detection {document['_id']}: unknown user {document['user_id']}")
+                reporter.add(failed=1)
+                unmapped += 1
+                continue
+            document['user_id'] = user_id
+            
+            if document.get('original_filename') is None:
+                document['original_filename'] = document['filename']
+            documents.append(document)
+            
+            if len(documents) >= batch_size:
+                submit(executor, documents, batch_last_id, unmapped)
+                documents, unmapped = [], 0
+        
+        if documents or unmapped:
+            submit(executor, documents, batch_last_id, unmapped)
+        
+        # Wait for the remaining writers in order
+        while in_flight:
+            in_flight[0][2].result()
+            advance_checkpoint()
+
+def migrate_to_mongodb(batch_size=DEFAULT_BATCH_SIZE, workers=DEFAULT_WORKERS,
+                       checkpoint_path=DEFAULT_CHECKPOINT, restart=False):
+    """
+    Migrate data from SQLite to MongoDB
+    
+    Args:
+        batch_size: Rows read per yield_per chunk and written per insert_many
+        workers: Number of parallel MongoDB writer threads
+        checkpoint_path: File used to record progress for resuming
+        restart: Ignore an existing checkpoint and start from the beginning
+    """
     
     print("=" * 60)
     print("SQLite to MongoDB Migration Tool")
@@ -23,18 +278,18 @@ def migrate_to_mongodb():
     os.environ['FLASK_APP'] = 'backend/app.py'
     
     from flask import Flask
-    from flask_sqlalchemy import SQLAlchemy
     from config import config
+    from models import db, User, Detection, StoredFile
     
     # Create Flask app for reading from SQLite
     app = Flask(__name__)
     app.config.from_object(config['development'])
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///backend/users.db')
+    db.init_app(app)
     
-    db = SQLAlchemy(app)
-    
-    # Import SQLAlchemy models
-    from models import User, Detection
+    if restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = MigrationCheckpoint(checkpoint_path)
     
     print("\n1. Reading from SQLite database...")
     
@@ -51,10 +306,6 @@ def migrate_to_mongodb():
                 print("\n   ✓ No data to migrate")
                 return
             
-            # Get all data
-            users = User.query.all()
-            detections = Detection.query.all()
-            
         except Exception as e:
             print(f"   ✗ Error reading SQLite: {e}")
             return
@@ -65,13 +316,14 @@ def migrate_to_mongodb():
     os.environ['DB_TYPE'] = 'mongodb'
     
     from mongoengine import connect, ConnectionError
-    from mongo_models import MongoUser, MongoDetection
+    from mongo_models import MongoUser, MongoDetection, MongoDetectionRollup, MongoDetectionVersion, MongoStoredFile
     
     try:
         connect(
             db=os.getenv('MONGODB_DB', 'deepfake_detector'),
             host=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/deepfake_detector'),
-            connect=False
+            connect=False,
+            maxPoolSize=max(workers * 2, 10)
         )
         print(f"   ✓ Connected to MongoDB: {os.getenv('MONGODB_URI')}")
     except ConnectionError as e:
@@ -81,80 +333,53 @@ def migrate_to_mongodb():
         print("   Linux/Mac: sudo systemctl start mongod")
         return
     
-    # Migrate users
-    print("\n3. Migrating users...")
+    user_collection = MongoUser._get_collection()
+    detection_collection = MongoDetection._get_collection()
     
-    migrated_users = 0
-    for user in users:
+    with app.app_context():
+        # Migrate users
+        print("\n3. Migrating users...")
+        
+        started = time.time()
+        # Always runs, upserts are idempotent and the detections need the id map
+        user_map, migrated_users = migrate_users(User, user_collection, batch_size)
+        
+        elapsed = max(time.time() - started, 1e-6)
+        print(f"\n   Total users migrated: {migrated_users}/{user_count} ({user_count / elapsed:.0f} rows/s)")
+        
+        # Migrate detections
+        print(f"\n4. Migrating detection records ({workers} writers, batch size {batch_size})...")
+        
+        reporter = ProgressReporter('Detections', detection_count)
         try:
-            existing = MongoUser.objects(username=user.username).first()
-            if existing:
-                print(f"   ⊗ User '{user.username}' already exists - skipping")
-                continue
-            
-            mongo_user = MongoUser(
-                username=user.username,
-                email=user.email,
-                password_hash=user.password_hash
-            )
-            mongo_user.save()
-            migrated_users += 1
-            print(f"   ✓ Migrated user: {user.username}")
-            
-        except Exception as e:
-            print(f"   ✗ Error migrating user '{user.username}': {e}")
-    
-    print(f"\n   Total users migrated: {migrated_users}/{user_count}")
+            migrate_detections(db, Detection, detection_collection, user_map, checkpoint,
+                               batch_size, workers, reporter)
+        except KeyboardInterrupt:
+            reporter.finish()
+            print(f"\n   ⊗ Interrupted - rerun to resume from {checkpoint.path}")
+            return
+        reporter.finish()
+        
+        # Stored upload reference counts
+        print("\n5. Migrating stored file references...")
+        migrated_files = migrate_stored_files(StoredFile, MongoStoredFile._get_collection(), batch_size)
+        print(f"   ✓ Migrated {migrated_files} stored files")
     
-    # Migrate detections
-    print("\n4. Migrating detection records...")
+    # Analytics rollups are derived data, rebuild them from the migrated history
+    print("\n6. Rebuilding analytics rollups...")
+    MongoDetectionRollup.ensure_indexes()
+    print(f"   ✓ Rollups rebuilt from {MongoDetectionRollup.backfill(batch_size)} detections")
     
-    migrated_detections = 0
-    failed_detections = 0
+    # Invalidate history/stats ETags browsers may hold from before the migration
+    MongoDetectionVersion.bump(MongoDetection.objects.distinct('user_id'))
     
-    for detection in detections:
-        try:
-            # Get corresponding MongoDB user
-            mongo_user = MongoUser.objects(id=str(detection.user_id)).first()
-            
-            if not mongo_user:
-                # Try to find by username
-                sqlite_user = User.query.get(detection.user_id)
-                if sqlite_user:
-                    mongo_user = MongoUser.objects(username=sqlite_user.username).first()
-            
-            if not mongo_user:
-                print(f"   ⊗ User not found for detection {detection.id} - skipping")
-                failed_detections += 1
-                continue
-            
-            # Check if detection already exists
-            existing = MongoDetection.objects(id=detection.id).first()
-            if existing:
-                print(f"   ⊗ Detection {detection.id} already exists - skipping")
-                continue
-            
-            mongo_detection = MongoDetection(
-                user_id=mongo_user.id,
-                filename=detection.filename,
-                original_filename=detection.original_filename if hasattr(detection, 'original_filename') else detection.filename,
-                prediction=detection.prediction,
-                confidence=detection.confidence,
-                processing_time=detection.processing_time,
-                created_at=detection.created_at if hasattr(detection, 'created_at') else None
-            )
-            mongo_detection.save()
-            migrated_detections += 1
-            
-            if migrated_detections % 10 == 0:
-                print(f"   ✓ Migrated {migrated_detections} detections...")
-            
-        except Exception as e:
-            print(f"   ✗ Error migrating detection {detection.id}: {e}")
-            failed_detections += 1
+    migrated_detections = reporter.inserted
+    failed_detections = reporter.failed
     
     print(f"\n   Total detections migrated: {migrated_detections}/{detection_count}")
+    print(f"   Already present (skipped): {reporter.skipped}")
     print(f"   Failed migrations: {failed_detections}")
+    print(f"   Throughput: {reporter.rate():.0f} rows/s")
     
     # Summary
     print("\n" + "=" * 60)
@@ -165,6 +390,7 @@ def migrate_to_mongodb():
     print(f"Failed records:      {failed_detections}")
     
     if failed_detections == 0:
+        checkpoint.clear()
         print("\n✓ Migration completed successfully!")
         print("\nNext steps:")
         print("1. Update .env: Set DB_TYPE=mongodb")
@@ -286,6 +512,17 @@ def reverse_migration():
 
 if __name__ == '__main__':
     
+    parser = argparse.ArgumentParser(description='Migrate data between SQLite and MongoDB')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help='rows per read chunk and per bulk insert')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help='parallel MongoDB writer threads')
+    parser.add_argument('--checkpoint', default=DEFAULT_CHECKPOINT,
+                        help='progress file used to resume an interrupted migration')
+    parser.add_argument('--restart', action='store_true',
+                        help='ignore an existing checkpoint and start over')
+    args = parser.parse_args()
+    
     print("\nMigration Tool Options:")
     print("1. SQLite → MongoDB (migrate production data)")
     print("2. MongoDB → SQLite (create backup)")
@@ -296,7 +533,12 @@ if __name__ == '__main__':
     if choice == '1':
         confirm = input("\nThis will migrate all data to MongoDB. Continue? (yes/no): ").strip().lower()
         if confirm == 'yes':
-            migrate_to_mongodb()
+            migrate_to_mongodb(
+                batch_size=args.batch_size,
+                workers=args.workers,
+                checkpoint_path=args.checkpoint,
+                restart=args.restart
+            )
         else:
             print("Migration cancelled")
     
@@ -0,0 +1,96 @@
+import unittest
+import os
+import sys
+
+from flask import Flask
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from admission import AdmissionController, Overloaded, admission, admission_controlled, queued_seconds, record_service_time
+
+class AdmissionControllerTestCase(unittest.TestCase):
+    """Test admission control and load shedding"""
+
+    def test_rejects_when_predicted_latency_exceeds_budget(self):
+        """Test that work ahead in the process counts against the budget"""
+        controller = AdmissionController(latency_budget=2.5, concurrency=1, initial_service_time=1.0)
+        controller.admit()
+        controller.admit()
+
+        with self.assertRaises(Overloaded) as context:
+            controller.admit()
+        self.assertEqual(context.exception.reason, 'latency_budget')
+        self.assertEqual(controller.stats()['rejected']['latency_budget'], 1)
+
+        controller.release(1.0)
+        controller.admit()
+
+    def test_queue_time_and_hard_cap(self):
+        """Test that time queued before the worker and the in-flight cap are honoured"""
+        controller = AdmissionController(latency_budget=10, max_in_flight=1, initial_service_time=1.0)
+        with self.assertRaises(Overloaded) as context:
+            controller.admit(queued=9.5)
+        self.assertGreaterEqual(context.exception.retry_after, 1)
+
+        controller.admit()
+        with self.assertRaises(Overloaded) as context:
+            controller.admit()
+        self.assertEqual(context.exception.reason, 'max_in_flight')
+
+    def test_queued_seconds(self):
+        """Test parsing of nginx's request start header"""
+        now = 1700000002.0
+        self.assertAlmostEqual(queued_seconds('t=1700000000.250', now=now), 1.75)
+        self.assertAlmostEqual(queued_seconds('1700000000250', now=now), 1.75)
+        self.assertEqual(queued_seconds('t=1700000010', now=now), 0.0)
+        self.assertEqual(queued_seconds('garbage'), 0.0)
+        self.assertEqual(queued_seconds(None), 0.0)
+
+    def test_decorator_answers_429(self):
+        """Test that shed requests get 429 with Retry-After and admitted ones are released"""
+        app = Flask(__name__)
+
+        @app.route('/work', methods=['POST'])
+        @admission_controlled
+        def work():
+            return {'ok': True}
+
+        admission.configure(latency_budget=5, concurrency=1, max_in_flight=0, initial_service_time=1.0, enabled=True)
+        client = app.test_client()
+        self.assertEqual(client.post('/work').status_code, 200)
+
+        response = client.post('/work', headers={'X-Request-Start': 't=1'})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+        self.assertEqual(admission.stats()['in_flight'], 0)
+
+    def test_only_reported_service_time_is_averaged(self):
+        """Test that time around the model call feeds the average, not the whole request"""
+        app = Flask(__name__)
+
+        @app.route('/work', methods=['POST'])
+        @admission_controlled
+        def work():
+            # e.g. 10 seconds queued for a scheduler slot, then 2 seconds of inference
+            record_service_time(2.0)
+            return {'ok': True}
+
+        @app.route('/shared', methods=['POST'])
+        @admission_controlled
+        def shared():
+            return {'ok': True}
+
+        admission.configure(latency_budget=60, concurrency=1, max_in_flight=0, initial_service_time=1.0,
+                            smoothing=0.5, enabled=True)
+        client = app.test_client()
+        client.post('/work')
+        self.assertEqual(admission.stats()['service_time_ms'], 1500.0)
+        client.post('/shared')
+        self.assertEqual(admission.stats()['service_time_ms'], 1500.0)
+        admission.configure(smoothing=0.2)
+
+if __name__ == '__main__':
+    unittest.main()
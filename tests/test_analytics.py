@@ -0,0 +1,125 @@
+import unittest
+import os
+import sys
+from datetime import datetime
+
+from flask import Flask
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from backend.analytics import (
+    rollup_increments, build_analytics, parse_analytics_args, confidence_bin, latency_bin
+)
+from models import db, User, Detection, DetectionRollup
+
+class AnalyticsTestCase(unittest.TestCase):
+    """Test detection rollup aggregation"""
+
+    def test_rollup_increments_hour_and_day(self):
+        """Test that each detection increments one hour and one day bucket"""
+        created = datetime(2024, 5, 1, 13, 45)
+        increments = rollup_increments([{
+            'user_id': 'u1', 'created_at': created, 'prediction': 'REAL',
+            'confidence': 0.93, 'processing_time': 0.4
+        }])
+
+        self.assertEqual(len(increments), 2)
+        self.assertIn(('u1', 'hour', datetime(2024, 5, 1, 13), 'REAL', 9, latency_bin(0.4)), increments)
+        self.assertIn(('u1', 'day', datetime(2024, 5, 1), 'REAL', 9, latency_bin(0.4)), increments)
+
+    def test_delete_cancels_insert(self):
+        """Test that a negative delta offsets an earlier insert"""
+        record = {'user_id': 'u1', 'created_at': datetime(2024, 5, 1), 'prediction': 'DEEPFAKE',
+                  'confidence': 0.7, 'processing_time': None}
+        total = rollup_increments([record]) + rollup_increments([record], sign=-1)
+
+        self.assertEqual(sum(total.values()), 0)
+
+    def test_bins(self):
+        """Test histogram bin boundaries"""
+        self.assertEqual(confidence_bin(1.0), 9)
+        self.assertEqual(confidence_bin(0.0), 0)
+        self.assertEqual(latency_bin(None), -1)
+        self.assertEqual(latency_bin(100.0), 12)
+
+    def test_build_analytics_fills_buckets(self):
+        """Test series, histogram and percentile assembly"""
+        granularity, start, end = parse_analytics_args({
+            'granularity': 'day', 'start': '2024-05-01', 'end': '2024-05-03'
+        })
+        rows = [
+            (datetime(2024, 5, 1), 'REAL', 9, 3, 3),
+            (datetime(2024, 5, 3), 'DEEPFAKE', 5, 6, 1),
+        ]
+        result = build_analytics(rows, granularity, start, end)
+
+        self.assertEqual([point['total'] for point in result['series']], [3, 0, 1])
+        self.assertEqual(result['confidence_histogram']['REAL'][9], 3)
+        self.assertEqual(result['processing_time_percentiles']['p50'], 0.3)
+        self.assertEqual(result['processing_time_percentiles']['p99'], 1.0)
+
+    def test_aware_range_normalized_to_utc(self):
+        """Test that start/end with an offset select the UTC buckets"""
+        _, start, end = parse_analytics_args({
+            'granularity': 'hour', 'start': '2024-05-01T10:30:00Z', 'end': '2024-05-01T13:30:00+02:00'
+        })
+
+        self.assertEqual(start, datetime(2024, 5, 1, 10))
+        self.assertEqual(end, datetime(2024, 5, 1, 12))
+
+    def test_invalid_granularity(self):
+        """Test that unknown granularities are rejected"""
+        with self.assertRaises(ValueError):
+            parse_analytics_args({'granularity': 'week'})
+
+class DetectionRollupTestCase(unittest.TestCase):
+    """Test applying and rebuilding the SQL rollup rows"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+        db.session.add(User(id='u1', username='alice', email='alice@example.com', password_hash='x'))
+        db.session.commit()
+
+        self.record = {'user_id': 'u1', 'created_at': datetime(2024, 5, 1, 13), 'prediction': 'REAL',
+                       'confidence': 0.9, 'processing_time': 0.2}
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def counts(self):
+        return sorted((row.granularity, row.count) for row in DetectionRollup.query.all())
+
+    def test_decrement_clamped_at_zero(self):
+        """Test that deleting a detection the rollups never counted leaves no negative count"""
+        DetectionRollup.apply(db.session, rollup_increments([self.record], sign=-1))
+        db.session.commit()
+        self.assertEqual(self.counts(), [])
+
+        DetectionRollup.apply(db.session, rollup_increments([self.record]))
+        DetectionRollup.apply(db.session, rollup_increments([self.record, self.record], sign=-1))
+        db.session.commit()
+        self.assertEqual(self.counts(), [('day', 0), ('hour', 0)])
+
+    def test_backfill_rebuilds_from_detections(self):
+        """Test that the backfill replaces the rollups with counts of the stored detections"""
+        db.session.add_all(
+            Detection(id=f'd{i}', filename=f'{i}.png', original_filename=f'{i}.png', **self.record)
+            for i in range(3)
+        )
+        DetectionRollup.apply(db.session, rollup_increments([self.record]))
+        db.session.commit()
+
+        self.assertEqual(DetectionRollup.backfill(db.session), 3)
+        self.assertEqual(self.counts(), [('day', 3), ('hour', 3)])
+
+if __name__ == '__main__':
+    unittest.main()
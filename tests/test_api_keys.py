@@ -0,0 +1,72 @@
+import unittest
+import os
+import sys
+
+from flask import Flask
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from api_keys import generate_api_key, hash_api_key, parse_authorization, authenticate, api_key_cache
+from models import db, User, ApiKey
+
+SECRET = 'test-secret'
+
+class ApiKeyTestCase(unittest.TestCase):
+    """Test API key parsing, verification and caching"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        api_key_cache.configure(ttl=300, max_size=100)
+
+        self.key, prefix = generate_api_key()
+        with self.app.app_context():
+            db.create_all()
+            user = User(username='bot', email='bot@example.com', password_hash='x')
+            db.session.add(user)
+            db.session.flush()
+            self.user_id = user.id
+            db.session.add(ApiKey(user_id=user.id, name='ingest', prefix=prefix,
+                                  key_hash=hash_api_key(self.key, SECRET)))
+            db.session.commit()
+
+        self.lookups = 0
+
+    def lookup(self, prefix, key_hash):
+        self.lookups += 1
+        return ApiKey.verify(db.session, prefix, key_hash)
+
+    def test_parse_authorization(self):
+        """Test that only well-formed keys in a supported scheme are accepted"""
+        self.assertEqual(parse_authorization(f'Bearer {self.key}'), (self.key, self.key[4:12]))
+        self.assertIsNotNone(parse_authorization(f'ApiKey {self.key}'))
+        self.assertIsNone(parse_authorization(f'Basic {self.key}'))
+        self.assertIsNone(parse_authorization('Bearer dfk_short_key'))
+        self.assertIsNone(parse_authorization(None))
+
+    def test_verified_key_is_cached(self):
+        """Test that repeated requests with a key skip the database"""
+        with self.app.test_request_context():
+            for _ in range(3):
+                self.assertEqual(authenticate(f'Bearer {self.key}', SECRET, self.lookup), self.user_id)
+            self.assertEqual(self.lookups, 1)
+            self.assertIsNotNone(ApiKey.query.first().last_used_at)
+
+    def test_rejects_wrong_secret_and_revoked_key(self):
+        """Test that a key with a matching prefix but wrong hash, or a revoked key, fails"""
+        forged = self.key[:13] + ('A' if self.key[13] != 'A' else 'B') + self.key[14:]
+        with self.app.test_request_context():
+            self.assertIsNone(authenticate(f'Bearer {forged}', SECRET, self.lookup))
+            self.assertIsNone(authenticate(f'Bearer {self.key}', 'other-secret', self.lookup))
+
+            api_key = ApiKey.query.first()
+            api_key.revoked_at = api_key.created_at
+            db.session.commit()
+            self.assertIsNone(authenticate(f'Bearer {self.key}', SECRET, self.lookup))
+
+if __name__ == '__main__':
+    unittest.main()
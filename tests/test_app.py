@@ -1,4 +1,5 @@
 import unittest
+import subprocess
 import sys
 import os
 from pathlib import Path
@@ -141,5 +142,17 @@ class UserTestCase(BaseTestCase):
             self.assertTrue(user.check_password('TestPass123'))
             self.assertFalse(user.check_password('WrongPassword'))
 
+class ImportTestCase(unittest.TestCase):
+    """Test that the app imports as a package, the way gunicorn loads it"""
+
+    def test_import_backend_app(self):
+        """Test that backend.app resolves its flat imports itself"""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        # A fresh interpreter, other tests put backend/ on sys.path
+        result = subprocess.run(
+            [sys.executable, '-c', 'import backend.app'], cwd=root, capture_output=True, text=True, timeout=120
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+
 if __name__ == '__main__':
     unittest.main()
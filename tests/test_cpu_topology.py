@@ -0,0 +1,48 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from cpu_topology import parse_cpulist, plan_threads
+
+class CpuTopologyTestCase(unittest.TestCase):
+    """Test per-worker thread planning"""
+
+    def test_parse_cpulist(self):
+        """Test Linux cpulist ranges and single CPUs"""
+        self.assertEqual(parse_cpulist('0-3,8,10-11\n'), [0, 1, 2, 3, 8, 10, 11])
+        self.assertEqual(parse_cpulist(''), [])
+
+    def test_threads_split_evenly_between_workers(self):
+        """Test automatic thread counts without pinning"""
+        plan = plan_threads(workers=4, worker_index=1, cpus=list(range(16)))
+        self.assertEqual((plan.intra_op, plan.inter_op), (4, 1))
+        self.assertIsNone(plan.cpus)
+
+        # Never below one thread, explicit counts win
+        self.assertEqual(plan_threads(workers=8, cpus=[0, 1]).intra_op, 1)
+        self.assertEqual(plan_threads(workers=2, cpus=list(range(16)), intra_op=3, inter_op=2).to_dict(),
+                         {'intra_op': 3, 'inter_op': 2, 'cpus': None, 'numa_node': None})
+
+    def test_pinned_workers_get_disjoint_cores(self):
+        """Test that pinning hands each worker its own core set"""
+        cpus = list(range(12))
+        plans = [plan_threads(3, index, cpus, pin=True, numa_aware=False) for index in range(3)]
+        self.assertEqual([plan.cpus for plan in plans], [[0, 1, 2, 3], [4, 5, 6, 7], [8, 9, 10, 11]])
+        self.assertTrue(all(plan.intra_op == 4 for plan in plans))
+
+    def test_numa_aware_placement(self):
+        """Test that workers are spread across nodes and stay inside one"""
+        nodes = [list(range(0, 8)), list(range(8, 16))]
+        plans = [plan_threads(4, index, list(range(16)), nodes, pin=True) for index in range(4)]
+
+        self.assertEqual([plan.numa_node for plan in plans], [0, 1, 0, 1])
+        self.assertEqual([plan.cpus for plan in plans],
+                         [[0, 1, 2, 3], [8, 9, 10, 11], [4, 5, 6, 7], [12, 13, 14, 15]])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+import os
+import sys
+import tempfile
+
+from flask import Flask
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.upload_store import UploadStore
+from backend.delivery import deliver_file
+
+class DeliveryTestCase(unittest.TestCase):
+    """Test file delivery through nginx or send_file"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = UploadStore(self.tmpdir.name)
+        os.makedirs(self.store.abspath('ab/cd'))
+        with open(self.store.abspath('ab/cd/abcd.png'), 'wb') as f:
+            f.write(b'png bytes')
+
+        self.app = Flask(__name__)
+        self.app.config['X_ACCEL_REDIRECT_PREFIX'] = '/protected-uploads/'
+
+        @self.app.route('/file')
+        def download():
+            return deliver_file(self.store, 'ab/cd/abcd.png', etag='abcd', max_age=60, download_name='a.png')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_x_accel_redirect(self):
+        """Test that nginx is told to send the file when enabled"""
+        self.app.config['X_ACCEL_REDIRECT_ENABLED'] = True
+        response = self.app.test_client().get('/file')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-Accel-Redirect'], '/protected-uploads/ab/cd/abcd.png')
+        self.assertEqual(response.headers['Content-Type'], 'image/png')
+        self.assertIn('private', response.headers['Cache-Control'])
+        self.assertEqual(response.data, b'')
+
+        cached = self.app.test_client().get('/file', headers={'If-None-Match': '"abcd"'})
+        self.assertEqual(cached.status_code, 304)
+
+    def test_send_file_fallback(self):
+        """Test that the app streams the file itself without nginx"""
+        self.app.config['X_ACCEL_REDIRECT_ENABLED'] = False
+        response = self.app.test_client().get('/file')
+
+        self.assertEqual(response.data, b'png bytes')
+        self.assertNotIn('X-Accel-Redirect', response.headers)
+        self.assertEqual(response.headers['ETag'], '"abcd"')
+        response.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,8 +4,13 @@ import os
 from unittest.mock import MagicMock, patch
 import sys
 
+import numpy as np
+import torch
+
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
 
 from backend.deepfake_detector import DeepfakeDetector
 
@@ -38,5 +43,116 @@ class DeepfakeDetectorTestCase(unittest.TestCase):
             
             self.assertTrue(os.path.exists(img_path))
 
+def tiny_vit():
+    """Randomly initialized two-layer ViT classifier, small enough for unit tests"""
+    from transformers import ViTConfig, ViTForImageClassification
+
+    config = ViTConfig(hidden_size=64, num_hidden_layers=2, num_attention_heads=2,
+                       intermediate_size=128, num_labels=2)
+    return ViTForImageClassification(config).eval()
+
+def tiny_detector(model=None, **kwargs):
+    """DeepfakeDetector running a tiny ViT instead of the pretrained hub model"""
+    from transformers import ViTImageProcessor
+
+    with patch.object(DeepfakeDetector, '_load_model'):
+        detector = DeepfakeDetector(device='cpu', **kwargs)
+    detector.image_processor = ViTImageProcessor()
+    detector.input_size = 224
+    detector.model = model if model is not None else tiny_vit()
+    return detector
+
+class TinyViTDetectorTestCase(unittest.TestCase):
+    """Test inference paths of the detector on a tiny ViT"""
+
+    def setUp(self):
+        torch.manual_seed(0)
+
+    def test_reduced_decode_parity(self):
+        """Test that reduced-resolution JPEG decoding keeps predictions within tolerance"""
+        from PIL import Image
+        from backend.image_io import load_image
+
+        detector = tiny_detector()
+
+        # Smooth photo-like content at phone camera resolution
+        y, x = np.mgrid[0:3000, 0:4000]
+        pixels = np.stack([x * 255 // 4000, y * 255 // 3000, (x + y) * 255 // 7000], axis=-1)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            img_path = os.path.join(tmpdir, 'large.jpg')
+            Image.fromarray(pixels.astype(np.uint8)).save(img_path, quality=90)
+
+            full, _ = load_image(img_path)
+            reduced, _ = load_image(img_path, min_size=224)
+
+        self.assertEqual(reduced.shape, (375, 500, 3))
+        full_inputs = detector.preprocess_image(full)
+        reduced_inputs = detector.preprocess_image(reduced)
+        self.assertLess((full_inputs - reduced_inputs).abs().mean().item(), 0.02)
+
+        with torch.no_grad():
+            full_probs = torch.softmax(detector.model(full_inputs).logits, dim=1)
+            reduced_probs = torch.softmax(detector.model(reduced_inputs).logits, dim=1)
+        self.assertLess((full_probs - reduced_probs).abs().max().item(), 0.01)
+
+    def test_analyze_returns_probabilities_and_embedding(self):
+        """Test that the CLS embedding is the classifier input of the same forward pass"""
+        detector = tiny_detector()
+
+        image = np.random.randint(0, 256, (240, 320, 3), dtype=np.uint8)
+        result = detector.analyze(image)
+
+        with torch.no_grad():
+            expected = torch.softmax(detector.model(detector.preprocess_image(image)).logits, dim=1)[0]
+        self.assertEqual(len(result['probabilities']), 2)
+        self.assertAlmostEqual(sum(result['probabilities']), 1.0, places=5)
+        self.assertLess(max(abs(a - b) for a, b in zip(result['probabilities'], expected.tolist())), 1e-5)
+        self.assertEqual(result['embedding'].dtype, np.float16)
+        self.assertEqual(result['embedding'].shape, (64,))
+        self.assertAlmostEqual(float(np.linalg.norm(result['embedding'].astype(np.float32))), 1.0, places=2)
+        self.assertEqual(detector.detect(image)[0], result['prediction'])
+
+    def test_warm_up_reports_phase_timings(self):
+        """Test that warm-up runs every configured batch size and times each phase"""
+        detector = tiny_detector(warmup_batch_sizes=(1, 4), warmup_iterations=3)
+
+        report = detector.warm_up()
+
+        self.assertEqual(set(report['phases']), {'preprocess', 'forward_batch_1', 'forward_batch_4', 'analyze'})
+        self.assertGreater(report['phases']['forward_batch_4']['steady_ms'], 0)
+        self.assertEqual(report['threads']['intra_op'], torch.get_num_threads())
+        self.assertGreater(report['cold_to_steady'], 0)
+
+    def test_compiled_forward_is_cached_and_falls_back_to_eager(self):
+        """Test that traced graphs are reused from disk and failures stay on eager"""
+        model = tiny_vit()
+
+        def build(mode, cache_dir):
+            detector = tiny_detector(model, warmup_batch_sizes=(1, 2))
+            detector._compile(mode, cache_dir)
+            return detector
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            first = build('torchscript', tmpdir)
+            second = build('torchscript', tmpdir)
+            self.assertEqual({r['status'] for r in first.compile_report['batch_sizes'].values()}, {'compiled'})
+            self.assertEqual({r['status'] for r in second.compile_report['batch_sizes'].values()}, {'cached'})
+
+            inputs = torch.randn(2, 3, 224, 224)
+            with torch.no_grad():
+                logits, embedding = second._forward(inputs)
+                expected = model(inputs).logits
+            self.assertTrue(torch.allclose(logits, expected, atol=1e-3))
+            self.assertEqual(tuple(embedding.shape), (2, 64))
+            # Batch sizes that were not compiled run eager
+            self.assertIsNone(second.compiled(torch.randn(3, 3, 224, 224)))
+
+            with patch('torch.compile', side_effect=RuntimeError('no compiler')):
+                fallback = build('inductor', tmpdir)
+            self.assertIsNone(fallback.compiled)
+            self.assertIn('no compiler', fallback.compile_report['error'])
+            self.assertEqual(fallback.analyze(np.zeros((224, 224, 3), dtype=np.uint8))['prediction'],
+                             first.analyze(np.zeros((224, 224, 3), dtype=np.uint8))['prediction'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+from datetime import datetime
+
+from flask import Flask
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend import export
+from backend.export import parse_export_args, serialize_rows, export_response
+
+ROWS = [
+    {'id': '1', 'filename': 'a.png', 'prediction': 'REAL', 'confidence': 0.9,
+     'processing_time': 0.5, 'created_at': '2024-01-01T10:00:00', 'extra': 'ignored in csv'},
+    {'id': '2', 'filename': 'b, "quoted".png', 'prediction': 'DEEPFAKE', 'confidence': 0.8,
+     'processing_time': 0.4, 'created_at': '2024-01-02T11:00:00'},
+]
+
+class ExportTestCase(unittest.TestCase):
+    """Test streaming history export"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+
+    def test_date_range(self):
+        """Test that start is inclusive and a date-only end includes that whole day"""
+        fmt, start, end = parse_export_args({'format': 'CSV', 'start': '2024-01-01', 'end': '2024-01-31'})
+
+        self.assertEqual(fmt, 'csv')
+        self.assertEqual(start, datetime(2024, 1, 1))
+        self.assertEqual(end, datetime(2024, 2, 1))
+        self.assertLess(datetime(2024, 1, 31, 23, 59), end)
+
+    def test_datetime_end_is_exclusive(self):
+        """Test that an end with a time is used as given"""
+        _, start, end = parse_export_args({'end': '2024-01-31T12:00:00'})
+
+        self.assertIsNone(start)
+        self.assertEqual(end, datetime(2024, 1, 31, 12))
+
+    def test_aware_datetimes_normalized_to_utc(self):
+        """Test that datetimes with an offset are compared as the naive UTC created_at is stored"""
+        _, start, end = parse_export_args({'start': '2024-01-31T12:00:00Z', 'end': '2024-01-31T16:00:00+02:00'})
+
+        self.assertEqual(start, datetime(2024, 1, 31, 12))
+        self.assertEqual(end, datetime(2024, 1, 31, 14))
+        self.assertIsNone(end.tzinfo)
+
+    def test_invalid_arguments(self):
+        """Test that bad formats, dates and empty ranges are rejected"""
+        for args in ({'format': 'xml'}, {'start': 'yesterday'},
+                     {'start': '2024-02-01', 'end': '2024-01-01'}, {'start': '2024-01-01T00:00', 'end': '2024-01-01T00:00'}):
+            with self.assertRaises(ValueError):
+                parse_export_args(args)
+
+    def test_ndjson_serialization(self):
+        """Test one JSON document per line"""
+        body = b''.join(serialize_rows(iter(ROWS), 'ndjson')).decode('utf-8')
+        self.assertEqual([json.loads(line) for line in body.splitlines()], ROWS)
+
+    def test_csv_serialization(self):
+        """Test a header row, export fields only and quoting"""
+        body = b''.join(serialize_rows(iter(ROWS), 'csv')).decode('utf-8')
+        rows = list(csv.DictReader(io.StringIO(body)))
+
+        self.assertEqual(list(rows[0]), export.EXPORT_FIELDS)
+        self.assertEqual(rows[1]['filename'], 'b, "quoted".png')
+        self.assertEqual(len(rows), 2)
+
+    def test_rows_streamed_in_chunks(self):
+        """Test that large exports are sent as several bounded chunks"""
+        rows = ({'id': str(i), 'filename': 'x' * 200} for i in range(2000))
+        chunks = list(serialize_rows(rows, 'ndjson'))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) < export.CHUNK_SIZE + 1024 for chunk in chunks))
+
+    def test_gzip_when_accepted(self):
+        """Test that the stream is gzip-encoded only if the client accepts gzip"""
+        with self.app.test_request_context(headers={'Accept-Encoding': 'br, gzip;q=0.8'}):
+            response = export_response(iter(ROWS), 'ndjson')
+            body = b''.join(response.response)
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        self.assertEqual(len(gzip.decompress(body).splitlines()), 2)
+
+        for accept in ('identity', 'gzip;q=0', ''):
+            with self.app.test_request_context(headers={'Accept-Encoding': accept}):
+                response = export_response(iter(ROWS), 'csv')
+                body = b''.join(response.response)
+            self.assertNotIn('Content-Encoding', response.headers)
+            self.assertTrue(body.startswith(b'id,filename'))
+
+if __name__ == '__main__':
+    unittest.main()
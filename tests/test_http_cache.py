@@ -0,0 +1,61 @@
+import unittest
+import os
+import sys
+
+from flask import Flask
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from backend.http_cache import version_etag, conditional_json
+from models import db, DetectionVersion
+
+class HttpCacheTestCase(unittest.TestCase):
+    """Test version-based conditional responses"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.builds = 0
+
+        @self.app.route('/data')
+        def data():
+            def build():
+                self.builds += 1
+                return {'builds': self.builds}
+            return conditional_json(version_etag('u1', DetectionVersion.current(db.session, 'u1')), build)
+
+        with self.app.app_context():
+            db.create_all()
+
+    def test_not_modified_skips_build(self):
+        """Test that a matching If-None-Match is answered without building the body"""
+        client = self.app.test_client()
+        first = client.get('/data')
+        etag = first.headers['ETag']
+
+        self.assertTrue(etag.startswith('W/'))
+        self.assertIn('no-cache', first.headers['Cache-Control'])
+        self.assertEqual(client.get('/data', headers={'If-None-Match': etag}).status_code, 304)
+        self.assertEqual(self.builds, 1)
+
+    def test_bump_changes_etag(self):
+        """Test that a version bump invalidates the previous ETag"""
+        client = self.app.test_client()
+        etag = client.get('/data').headers['ETag']
+
+        with self.app.app_context():
+            DetectionVersion.bump(db.session, ['u1', 'u1', 'u2'])
+            db.session.commit()
+            self.assertEqual(DetectionVersion.current(db.session, 'u1'), 1)
+            self.assertEqual(DetectionVersion.current(db.session, 'u3'), 0)
+
+        response = client.get('/data', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+if __name__ == '__main__':
+    unittest.main()
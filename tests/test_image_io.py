@@ -0,0 +1,73 @@
+import unittest
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.image_io import load_image, sniff_image
+
+def encode(image, fmt):
+    """Encode a PIL image into an in-memory file"""
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt)
+    buffer.seek(0)
+    return buffer
+
+class ImageIOTestCase(unittest.TestCase):
+    """Test single-pass image validation and decoding"""
+
+    def test_sniff_reads_header(self):
+        """Test that format and dimensions come from the header"""
+        info = sniff_image(encode(Image.new('RGB', (64, 32)), 'PNG'))
+        self.assertEqual((info.format, info.width, info.height), ('PNG', 64, 32))
+
+    def test_load_returns_rgb_array(self):
+        """Test that palette and alpha images decode to RGB"""
+        for mode, fmt in [('P', 'GIF'), ('RGBA', 'PNG'), ('L', 'BMP'), ('RGB', 'JPEG')]:
+            image, info = load_image(encode(Image.new(mode, (20, 10)), fmt))
+            self.assertEqual(image.shape, (10, 20, 3))
+            self.assertEqual(image.dtype, np.uint8)
+            self.assertEqual(info.format, fmt)
+
+    def test_pixel_budget_rejected_before_decode(self):
+        """Test that oversized images are rejected from the header"""
+        with self.assertRaises(ValueError):
+            load_image(encode(Image.new('RGB', (200, 200)), 'PNG'), max_pixels=10000)
+
+    def test_reduced_jpeg_decode_covers_min_size(self):
+        """Test that large JPEGs decode at a reduced scale no smaller than min_size"""
+        source = Image.new('RGB', (2000, 1200), (120, 80, 40))
+        image, info = load_image(encode(source, 'JPEG'), min_size=224)
+
+        self.assertEqual((info.width, info.height), (2000, 1200))
+        self.assertEqual(image.shape, (300, 500, 3))
+
+        # Lossless formats and small JPEGs keep their full resolution
+        image, _ = load_image(encode(source, 'PNG'), min_size=224)
+        self.assertEqual(image.shape, (1200, 2000, 3))
+        image, _ = load_image(encode(Image.new('RGB', (300, 300)), 'JPEG'), min_size=224)
+        self.assertEqual(image.shape, (300, 300, 3))
+
+    def test_rejects_non_images(self):
+        """Test that non-image bytes are rejected"""
+        with self.assertRaises(ValueError):
+            load_image(io.BytesIO(b'not an image'))
+
+    def test_rejects_unsupported_format(self):
+        """Test that formats the detector does not accept are rejected"""
+        with self.assertRaises(ValueError):
+            sniff_image(encode(Image.new('RGB', (8, 8)), 'TIFF'))
+
+    def test_rejects_truncated_image(self):
+        """Test that a truncated image fails during decode"""
+        data = encode(Image.effect_noise((64, 64), 50).convert('RGB'), 'PNG').getvalue()
+        with self.assertRaises(ValueError):
+            load_image(io.BytesIO(data[:len(data) // 2]))
+
+if __name__ == '__main__':
+    unittest.main()
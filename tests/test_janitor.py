@@ -0,0 +1,41 @@
+import unittest
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.janitor import UploadJanitor, expiry_for
+
+class JanitorTestCase(unittest.TestCase):
+    """Test upload retention and the janitor sweep"""
+
+    def test_expiry_uses_user_policy_over_default(self):
+        """Test that a user's retention overrides the server default"""
+        created = datetime(2024, 5, 1)
+        self.assertEqual(expiry_for(created, 3, 30), created + timedelta(days=3))
+        self.assertEqual(expiry_for(created, None, 30), created + timedelta(days=30))
+
+    def test_zero_days_keeps_forever(self):
+        """Test that a zero policy never expires"""
+        created = datetime(2024, 5, 1)
+        self.assertIsNone(expiry_for(created, 0, 30))
+        self.assertIsNone(expiry_for(created, None, 0))
+
+    def test_sweep_is_bounded(self):
+        """Test that each sweep handles at most batch_size uploads"""
+        backlog = list(range(450))
+
+        def sweep_fn(batch_size):
+            batch = backlog[:batch_size]
+            del backlog[:batch_size]
+            return len(batch)
+
+        janitor = UploadJanitor(sweep_fn, interval=60, batch_size=200)
+        self.assertEqual([janitor.sweep() for _ in range(4)], [200, 200, 50, 0])
+        self.assertEqual(janitor.purged, 450)
+        self.assertEqual(janitor.sweeps, 4)
+
+if __name__ == '__main__':
+    unittest.main()
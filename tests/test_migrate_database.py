@@ -0,0 +1,129 @@
+import unittest
+import os
+import sys
+import tempfile
+import threading
+
+from flask import Flask
+from pymongo.errors import BulkWriteError
+from pymongo.results import InsertManyResult
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from migrate_database import MigrationCheckpoint, ProgressReporter, migrate_detections
+from models import db, User, Detection
+
+class FakeCollection:
+    """In-memory collection implementing insert_many like an unordered MongoDB insert"""
+
+    def __init__(self, fail_ids=()):
+        self.documents = {}
+        self.batches = []
+        self.fail_ids = set(fail_ids)
+        self._lock = threading.Lock()
+
+    def insert_many(self, documents, ordered=True):
+        with self._lock:
+            self.batches.append([document['_id'] for document in documents])
+            errors = []
+            for index, document in enumerate(documents):
+                if document['_id'] in self.fail_ids:
+                    errors.append({'index': index, 'code': 2, 'errmsg': 'bad document'})
+                elif document['_id'] in self.documents:
+                    errors.append({'index': index, 'code': 11000, 'errmsg': 'duplicate key'})
+                else:
+                    self.documents[document['_id']] = document
+            if errors:
+                raise BulkWriteError({'writeErrors': errors, 'nInserted': len(documents) - len(errors)})
+            return InsertManyResult([document['_id'] for document in documents], True)
+
+class MigrateDetectionsTestCase(unittest.TestCase):
+    """Test batching, checkpointing and resuming of the detection migration"""
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+        db.session.add(User(id='u1', username='alice', email='alice@example.com', password_hash='x'))
+        db.session.add_all(
+            Detection(id=f'd{i}', user_id='u1', filename=f'{i}.png', original_filename=f'{i}.png',
+                      prediction='REAL', confidence=0.9)
+            for i in range(1, 8)
+        )
+        db.session.commit()
+
+        handle, self.checkpoint_path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        os.remove(self.checkpoint_path)
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+        if os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+
+    def migrate(self, collection, user_map=None, batch_size=3):
+        checkpoint = MigrationCheckpoint(self.checkpoint_path)
+        reporter = ProgressReporter('Detections', 7, interval=3600)
+        migrate_detections(db, Detection, collection, user_map or {'u1': 'm1'}, checkpoint,
+                           batch_size, 2, reporter)
+        return MigrationCheckpoint(self.checkpoint_path).state['last_detection_id'], reporter
+
+    def test_batches_in_id_order(self):
+        """Test that every detection is written once in batches of batch_size"""
+        collection = FakeCollection()
+        last_id, reporter = self.migrate(collection)
+
+        self.assertEqual(sorted(collection.batches), [['d1', 'd2', 'd3'], ['d4', 'd5', 'd6'], ['d7']])
+        self.assertEqual(collection.documents['d1']['user_id'], 'm1')
+        self.assertEqual((reporter.inserted, reporter.skipped, reporter.failed), (7, 0, 0))
+        self.assertEqual(last_id, 'd7')
+
+    def test_resume_after_checkpoint(self):
+        """Test that a rerun only reads detections after the checkpoint"""
+        MigrationCheckpoint(self.checkpoint_path).save(last_detection_id='d4')
+        collection = FakeCollection()
+        last_id, reporter = self.migrate(collection)
+
+        self.assertEqual(sorted(collection.documents), ['d5', 'd6', 'd7'])
+        self.assertEqual(last_id, 'd7')
+
+    def test_duplicates_counted_as_skipped(self):
+        """Test that detections already in MongoDB are skipped, not failed"""
+        collection = FakeCollection()
+        collection.documents = {'d2': {}, 'd5': {}}
+        last_id, reporter = self.migrate(collection)
+
+        self.assertEqual((reporter.inserted, reporter.skipped, reporter.failed), (5, 2, 0))
+        self.assertEqual(last_id, 'd7')
+
+    def test_checkpoint_stops_at_failed_batch(self):
+        """Test that the checkpoint never moves past a failed row, and a rerun retries it"""
+        collection = FakeCollection(fail_ids={'d5'})
+        last_id, reporter = self.migrate(collection)
+
+        self.assertEqual(reporter.failed, 1)
+        self.assertEqual(last_id, 'd3')
+        self.assertIn('d7', collection.documents)
+
+        collection.fail_ids.clear()
+        last_id, reporter = self.migrate(collection)
+        self.assertEqual((reporter.inserted, reporter.skipped), (1, 3))
+        self.assertEqual(last_id, 'd7')
+
+    def test_unknown_user_stops_checkpoint(self):
+        """Test that detections of unmigrated users count as failed rows"""
+        last_id, reporter = self.migrate(FakeCollection(), user_map={'other': 'm2'})
+
+        self.assertEqual(reporter.failed, 7)
+        self.assertIsNone(last_id)
+
+if __name__ == '__main__':
+    unittest.main()
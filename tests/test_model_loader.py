@@ -0,0 +1,135 @@
+import unittest
+import os
+import sys
+import threading
+
+from flask import Flask
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+import model_loader as loader_module
+from model_loader import ModelLoader, model_required, READY, FAILED
+
+class FakeDetector:
+    def __init__(self, model_version=None):
+        self.model_version = model_version
+        self.warmed = False
+
+    def warm_up(self):
+        self.warmed = True
+
+class ModelLoaderTestCase(unittest.TestCase):
+    """Test background model loading and readiness gating"""
+
+    def test_ready_after_warm_up(self):
+        """Test that the detector is published only after its warm-up"""
+        loader = ModelLoader()
+        published = []
+        loader.start(FakeDetector, published.append)
+        loader._thread.join(5)
+
+        self.assertEqual(loader.state, READY)
+        self.assertTrue(published[0].warmed)
+        self.assertIn('warm_up_seconds', loader.status())
+
+    def test_failed_load_is_retried(self):
+        """Test that a failing factory is retried until it succeeds"""
+        loader = ModelLoader()
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OSError('weights not available')
+            return FakeDetector()
+
+        loader.start(factory, retry_interval=0.01)
+        loader._thread.join(5)
+        self.assertEqual(loader.state, READY)
+        self.assertEqual(loader.status()['attempts'], 3)
+
+        failing = ModelLoader()
+        with self.assertRaises(OSError):
+            failing.start(lambda: (_ for _ in ()).throw(OSError('offline')), background=False)
+        self.assertEqual(failing.status()['state'], FAILED)
+
+    def test_model_required_answers_503_while_loading(self):
+        """Test that gated endpoints answer 503 until the shared loader is ready"""
+        app = Flask(__name__)
+
+        @app.route('/work')
+        @model_required
+        def work():
+            return {'ok': True}
+
+        release = threading.Event()
+
+        def slow_factory():
+            release.wait(5)
+            return FakeDetector()
+
+        shared = loader_module.model_loader
+        loader_module.model_loader = loader = ModelLoader()
+        try:
+            loader.start(slow_factory)
+            client = app.test_client()
+            response = client.get('/work')
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('Retry-After', response.headers)
+
+            release.set()
+            loader._thread.join(5)
+            self.assertEqual(client.get('/work').status_code, 200)
+        finally:
+            loader_module.model_loader = shared
+
+    def test_swap_keeps_serving_until_new_version_is_warm(self):
+        """Test that a swap publishes the new detector only after its warm-up"""
+        loader = ModelLoader()
+        published = []
+        loader.start(lambda: FakeDetector('v1'), published.append, background=False)
+
+        release = threading.Event()
+
+        def slow_factory():
+            release.wait(5)
+            return FakeDetector('v2')
+
+        swapped = []
+        self.assertTrue(loader.swap(slow_factory, 'v2', on_swapped=swapped.append))
+        self.assertFalse(loader.swap(slow_factory, 'v3'))
+        self.assertEqual(loader.version, 'v1')
+        self.assertEqual(loader.status()['swap']['state'], 'loading')
+
+        release.set()
+        loader._swap_thread.join(5)
+        self.assertEqual(loader.version, 'v2')
+        self.assertEqual([d.model_version for d in published], ['v1', 'v2'])
+        self.assertTrue(swapped[0].warmed)
+        self.assertEqual(loader.status()['swap']['previous'], 'v1')
+
+        # A version that fails to load leaves the current one in place
+        loader.swap(lambda: (_ for _ in ()).throw(OSError('corrupt weights')), 'v3')
+        loader._swap_thread.join(5)
+        self.assertEqual(loader.version, 'v2')
+        self.assertEqual(loader.status()['swap']['state'], FAILED)
+
+    def test_follow_swaps_to_desired_version(self):
+        """Test that a worker follows a version activated elsewhere"""
+        loader = ModelLoader()
+        loader.start(lambda: FakeDetector('v1'), background=False)
+        desired = ['v1']
+
+        loader.follow(lambda: desired[0], lambda version: lambda: FakeDetector(version), interval=0.01)
+        desired[0] = 'v2'
+        for _ in range(500):
+            if loader.version == 'v2':
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(loader.version, 'v2')
+
+if __name__ == '__main__':
+    unittest.main()
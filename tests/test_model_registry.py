@@ -0,0 +1,81 @@
+import unittest
+import os
+import sys
+import tempfile
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from model_registry import ModelRegistry
+
+class ModelRegistryTestCase(unittest.TestCase):
+    """Test the versioned model registry"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = os.path.join(self.tmpdir.name, 'registry')
+        self.weights = os.path.join(self.tmpdir.name, 'model.pth')
+        with open(self.weights, 'wb') as f:
+            f.write(b'weights')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_register_and_activate(self):
+        """Test that versions are copied into the registry and activation is shared"""
+        registry = ModelRegistry(self.root)
+        self.assertIsNone(registry.active())
+
+        registered = registry.register('v1', self.weights, description='first run')
+        self.assertTrue(os.path.exists(registered.path))
+        self.assertEqual(len(registered.sha256), 64)
+        registry.register('v2', self.weights)
+        self.assertEqual([model.version for model in registry.versions()], ['v1', 'v2'])
+
+        # Another worker's registry instance sees the activation
+        other_worker = ModelRegistry(self.root)
+        registry.activate('v2')
+        self.assertEqual(other_worker.active_version(), 'v2')
+        self.assertEqual(other_worker.active().path, os.path.join(self.root, 'v2', 'model.pth'))
+
+    def test_rejects_invalid_changes(self):
+        """Test version names, duplicates, unknown activations and removing the active version"""
+        registry = ModelRegistry(self.root)
+        with self.assertRaises(ValueError):
+            registry.register('../escape', self.weights)
+
+        registry.register('v1', self.weights)
+        with self.assertRaises(ValueError):
+            registry.register('v1', self.weights)
+        with self.assertRaises(KeyError):
+            registry.activate('v9')
+
+        registry.activate('v1')
+        with self.assertRaises(ValueError):
+            registry.remove('v1')
+        self.assertTrue(os.path.exists(registry.get('v1').path))
+
+        registry.register('v2', self.weights)
+        registry.remove('v2')
+        self.assertIsNone(registry.get('v2'))
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'v2')))
+
+    def test_verify_weights(self):
+        """Test that weights changed or removed after registration are rejected"""
+        registry = ModelRegistry(self.root)
+        registered = registry.register('v1', self.weights)
+        registered.verify()
+
+        with open(registered.path, 'ab') as f:
+            f.write(b'tampered')
+        with self.assertRaises(ValueError):
+            registry.get('v1').verify()
+
+        os.remove(registered.path)
+        with self.assertRaises(FileNotFoundError):
+            registry.get('v1').verify()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.password_hasher import PasswordHasher, HasherBusy
+
+class PasswordHasherTestCase(unittest.TestCase):
+    """Test the bounded password hashing limit"""
+
+    def setUp(self):
+        self.hasher = PasswordHasher(max_workers=1, queue_size=1, method='pbkdf2:sha256:1000')
+
+    def test_hash_and_verify(self):
+        """Test that hashes use the configured method and verify"""
+        pwhash = self.hasher.hash('Secret@123')
+        self.assertTrue(pwhash.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(self.hasher.verify(pwhash, 'Secret@123'))
+        self.assertFalse(self.hasher.verify(pwhash, 'wrong'))
+
+    def test_rehash_outdated_method(self):
+        """Test that only hashes made with another method are re-hashed"""
+        old = PasswordHasher(method='pbkdf2:sha256:2000').hash('Secret@123')
+        new = self.hasher.rehash(old, 'Secret@123')
+
+        self.assertTrue(new.startswith('pbkdf2:sha256:1000$'))
+        self.assertIsNone(self.hasher.rehash(new, 'Secret@123'))
+        self.assertEqual(self.hasher.stats()['rehashed'], 1)
+
+    def test_short_method_matches_stored_form(self):
+        """Test that a method given without parameters matches hashes made with werkzeug's defaults"""
+        for method in ('scrypt', 'pbkdf2', 'pbkdf2:sha256'):
+            hasher = PasswordHasher(method=method)
+            pwhash = hasher.hash('Secret@123')
+            self.assertNotEqual(pwhash.split('$', 1)[0], method)
+            self.assertFalse(hasher.needs_rehash(pwhash))
+        self.assertTrue(PasswordHasher(method='scrypt').needs_rehash('scrypt:16384:8:1$salt$hash'))
+
+    def test_rejects_beyond_queue(self):
+        """Test that calls beyond workers + queue are rejected without waiting"""
+        release = threading.Event()
+
+        def slow():
+            release.wait(5)
+
+        threads = [threading.Thread(target=self.hasher._run, args=(slow,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        while self.hasher.stats()['in_flight'] < 2:
+            time.sleep(0.001)
+        try:
+            with self.assertRaises(HasherBusy) as context:
+                self.hasher.hash('Secret@123')
+            self.assertGreaterEqual(context.exception.retry_after, 1)
+            self.assertEqual(self.hasher.stats()['rejected'], 1)
+        finally:
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(self.hasher.stats()['in_flight'], 0)
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'needs fork')
+    def test_limit_holds_across_processes(self):
+        """Test that a hash running in another worker process counts against the limit"""
+        context = multiprocessing.get_context('fork')
+        started, release = context.Event(), context.Event()
+
+        with tempfile.TemporaryDirectory() as slot_dir:
+            def hold_slot():
+                hasher = PasswordHasher(max_workers=1, queue_size=0, slot_dir=slot_dir)
+                hasher._run(lambda: (started.set(), release.wait(10)))
+
+            worker = context.Process(target=hold_slot)
+            worker.start()
+            try:
+                self.assertTrue(started.wait(10))
+                hasher = PasswordHasher(max_workers=1, queue_size=0, method='pbkdf2:sha256:1000', slot_dir=slot_dir)
+                self.assertTrue(hasher.stats()['host_wide'])
+                with self.assertRaises(HasherBusy):
+                    hasher.hash('Secret@123')
+            finally:
+                release.set()
+                worker.join(10)
+
+            # The slot is free again once the other process finished
+            self.assertTrue(hasher.hash('Secret@123').startswith('pbkdf2:sha256:1000$'))
+
+    def test_queued_caller_waits_for_slot(self):
+        """Test that a queued hash runs as soon as the host-wide slot is released"""
+        release = threading.Event()
+        with tempfile.TemporaryDirectory() as slot_dir:
+            hasher = PasswordHasher(max_workers=1, queue_size=1, method='pbkdf2:sha256:1000',
+                                    timeout=5, slot_dir=slot_dir)
+            holder = threading.Thread(target=hasher._run, args=(lambda: release.wait(5),))
+            holder.start()
+            while hasher.stats()['in_flight'] < 1:
+                time.sleep(0.001)
+            threading.Timer(0.1, release.set).start()
+
+            self.assertTrue(hasher.hash('Secret@123').startswith('pbkdf2:sha256:1000$'))
+            holder.join()
+
+            # With the slot held past the timeout the queued caller gives up
+            release.clear()
+            hasher.configure(timeout=0.1)
+            holder = threading.Thread(target=hasher._run, args=(lambda: release.wait(5),))
+            holder.start()
+            while hasher.stats()['in_flight'] < 1:
+                time.sleep(0.001)
+            try:
+                with self.assertRaises(HasherBusy):
+                    hasher.hash('Secret@123')
+            finally:
+                release.set()
+                holder.join()
+            self.assertTrue(hasher.hash('Secret@123').startswith('pbkdf2:sha256:1000$'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+import io
+import os
+import sys
+import tempfile
+
+from PIL import Image
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from backend.upload_store import UploadStore
+from backend.renditions import RenditionBackfill, ensure_thumbnail
+
+class RenditionsTestCase(unittest.TestCase):
+    """Test cached WebP thumbnails"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = UploadStore(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def store_image(self, size=(800, 600)):
+        """Commit a JPEG upload to the store and return its relative path"""
+        buffer = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(buffer, format='JPEG')
+        buffer.seek(0)
+        staged = self.store.stage(buffer, 'jpg')
+        self.store.commit(staged)
+        return staged.relpath
+
+    def test_thumbnail_rendered_on_miss(self):
+        """Test that a missing thumbnail is rendered next to the upload"""
+        relpath = self.store_image()
+        path = ensure_thumbnail(self.store, relpath, 200)
+
+        self.assertEqual(path, self.store.abspath(self.store.rendition_path(relpath)))
+        with Image.open(path) as thumbnail:
+            self.assertEqual(thumbnail.format, 'WEBP')
+            self.assertEqual(thumbnail.size, (200, 150))
+
+    def test_missing_upload_has_no_thumbnail(self):
+        """Test that purged uploads do not get a thumbnail"""
+        self.assertIsNone(ensure_thumbnail(self.store, 'ab/cd/missing.jpg', 200))
+
+    def test_backfill_renders_pending(self):
+        """Test that the backfill renders every upload of the given detections lacking a thumbnail once"""
+        first, second = self.store_image((640, 480)), self.store_image((300, 900))
+        self.store_image((100, 100))  # not referenced by a detection, e.g. purged
+        detections = [('a', first), ('b', second), ('c', first)]
+        batches = []
+
+        def fetch_batch(after_id, limit):
+            batches.append(after_id)
+            return [row for row in detections if row[0] > after_id][:limit]
+
+        backfill = RenditionBackfill(self.store, fetch_batch, 200, pause=0, batch_size=2)
+
+        self.assertEqual(backfill.run_once(), 2)
+        self.assertEqual(batches, ['', 'b'])
+        self.assertEqual(list(backfill.pending()), [])
+
+    def test_backfill_deduplicates_within_batch(self):
+        """Test that an upload shared by detections of one batch is yielded once"""
+        first, second = self.store_image((640, 480)), self.store_image((300, 900))
+        detections = [('a', first), ('b', first), ('c', second)]
+
+        def fetch_batch(after_id, limit):
+            return [row for row in detections if row[0] > after_id][:limit]
+
+        backfill = RenditionBackfill(self.store, fetch_batch, 200, pause=0, batch_size=2)
+        self.assertEqual(list(backfill.pending()), [first, second])
+
+    def test_backfill_runs_in_one_worker(self):
+        """Test that only one backfill on a host holds the lock"""
+        lock_path = os.path.join(self.store.temp_dir, 'rendition-backfill.lock')
+        first, second = (RenditionBackfill(self.store, lambda after_id, limit: [], 200, lock_path=lock_path)
+                         for _ in range(2))
+
+        self.assertTrue(first.claim())
+        self.assertFalse(second.claim())
+        first.release()
+        self.assertTrue(second.claim())
+        second.release()
+
+    def test_release_removes_thumbnail(self):
+        """Test that releasing an upload drops its renditions"""
+        relpath = self.store_image()
+        path = ensure_thumbnail(self.store, relpath, 200)
+
+        self.assertTrue(self.store.release(relpath, lambda: True))
+        self.assertFalse(os.path.exists(path))
+
+if __name__ == '__main__':
+    unittest.main()
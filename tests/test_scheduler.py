@@ -0,0 +1,75 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from scheduler import FairScheduler, INTERACTIVE, BULK
+
+class FairSchedulerTestCase(unittest.TestCase):
+    """Test per-user fair-share scheduling of inference slots"""
+
+    def run_queued(self, scheduler, requests):
+        """Queue requests behind a held slot in the given order, return the order they ran in"""
+        order = []
+        release = threading.Event()
+        holder_running = threading.Event()
+
+        def hold():
+            with scheduler.slot('holder'):
+                holder_running.set()
+                release.wait(5)
+
+        def work(user_id, priority):
+            with scheduler.slot(user_id, priority):
+                order.append(user_id)
+
+        threads = [threading.Thread(target=hold)]
+        threads[0].start()
+        holder_running.wait(5)
+        for i, (user_id, priority) in enumerate(requests):
+            thread = threading.Thread(target=work, args=(user_id, priority))
+            thread.start()
+            threads.append(thread)
+            # Enqueue in a deterministic order
+            while scheduler.stats()['waiting'] < i + 1:
+                time.sleep(0.001)
+
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        return order
+
+    def test_users_share_slots_round_robin(self):
+        """Test that a user's backlog does not delay another user of the same class"""
+        scheduler = FairScheduler(concurrency=1)
+        order = self.run_queued(scheduler, [('bulk-user', BULK)] * 4 + [('other', BULK)] * 2)
+
+        self.assertEqual(order, ['bulk-user', 'other', 'bulk-user', 'other', 'bulk-user', 'bulk-user'])
+
+    def test_priority_classes_are_weighted(self):
+        """Test that interactive requests get their class weight of slots per round"""
+        scheduler = FairScheduler(concurrency=1, class_weights={INTERACTIVE: 2, BULK: 1})
+        order = self.run_queued(scheduler, [('bot', BULK)] * 3 + [('alice', INTERACTIVE)] * 3)
+
+        self.assertEqual(order, ['bot', 'alice', 'alice', 'bot', 'alice', 'bot'])
+
+    def test_wait_times_are_reported(self):
+        """Test per-user wait statistics and slot bookkeeping"""
+        scheduler = FairScheduler(concurrency=1)
+        self.run_queued(scheduler, [('alice', INTERACTIVE)])
+        stats = scheduler.stats()
+
+        self.assertEqual(stats['running'], 0)
+        self.assertEqual(stats['waiting'], 0)
+        self.assertEqual(stats['users']['alice']['requests'], 1)
+        self.assertGreater(stats['users']['alice']['avg_wait_ms'], 0)
+        self.assertEqual(stats['dispatched'], {INTERACTIVE: 2})
+
+if __name__ == '__main__':
+    unittest.main()
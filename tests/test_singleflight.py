@@ -0,0 +1,120 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+import fcntl
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.singleflight import SingleFlight
+
+class SingleFlightTestCase(unittest.TestCase):
+    """Test coalescing of identical concurrent computations"""
+
+    def setUp(self):
+        self.lock_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.lock_dir, ignore_errors=True)
+
+    def test_concurrent_callers_share_one_run(self):
+        """Test that callers arriving while a computation runs wait and share it"""
+        flights = SingleFlight()
+        started, release = threading.Event(), threading.Event()
+        runs, results = [], []
+
+        def compute():
+            runs.append(1)
+            started.set()
+            release.wait(5)
+            return {'prediction': 'real'}
+
+        threads = [threading.Thread(target=lambda: results.append(flights.do('abc', compute))) for _ in range(4)]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while flights.stats()['waiting'] < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(sorted(shared for _, shared in results), [False, True, True, True])
+        self.assertEqual(flights.stats()['in_flight'], 0)
+
+    def test_result_shared_across_workers(self):
+        """Test that a worker arriving during another worker's computation shares its result"""
+        first, second = SingleFlight(self.lock_dir), SingleFlight(self.lock_dir)
+        started, release = threading.Event(), threading.Event()
+        results = []
+
+        def compute():
+            started.set()
+            release.wait(5)
+            return {'embedding': np.ones(4, dtype=np.float16)}
+
+        leader = threading.Thread(target=lambda: results.append(first.do('abc', compute)))
+        leader.start()
+        started.wait(5)
+        follower = threading.Thread(target=lambda: results.append(
+            second.do('abc', lambda: self.fail('should not recompute'))))
+        follower.start()
+        while not os.path.exists(os.path.join(self.lock_dir, 'abc.waiting')):
+            time.sleep(0.001)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+
+        shared_result, shared = next(result for result in results if result[1])
+        self.assertEqual(shared_result['embedding'], [1.0, 1.0, 1.0, 1.0])
+        self.assertEqual(second.stats()['shared_across_workers'], 1)
+        # The last reader removed the result
+        self.assertEqual(os.listdir(self.lock_dir), ['abc.lock'])
+
+    def test_finished_result_is_not_reused(self):
+        """Test that a call after the computation finished computes again"""
+        first, second = SingleFlight(self.lock_dir), SingleFlight(self.lock_dir)
+        self.assertEqual(first.do('abc', lambda: 'first'), ('first', False))
+        self.assertEqual(second.do('abc', lambda: 'second'), ('second', False))
+
+        # Even a result left behind by a crashed follower is not served
+        with open(os.path.join(self.lock_dir, 'abc.json'), 'w') as f:
+            f.write('"stale"')
+        self.assertEqual(second.do('abc', lambda: 'third'), ('third', False))
+
+    def test_sweep_skips_held_locks(self):
+        """Test that sweep removes abandoned files but not a lock in use"""
+        flights = SingleFlight(self.lock_dir, result_ttl=1)
+        held, abandoned = (os.path.join(self.lock_dir, name) for name in ('held.lock', 'abandoned.lock'))
+        for path in (held, abandoned, os.path.join(self.lock_dir, 'abandoned.json')):
+            open(path, 'a').close()
+            os.utime(path, (time.time() - 60, time.time() - 60))
+
+        with open(held, 'a') as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            flights.sweep()
+            self.assertEqual(os.listdir(self.lock_dir), ['held.lock'])
+        flights.sweep()
+        self.assertEqual(os.listdir(self.lock_dir), [])
+
+    def test_failed_leader_is_not_shared(self):
+        """Test that a failure propagates to the leader only"""
+        flights = SingleFlight(self.lock_dir)
+
+        def fail():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            flights.do('abc', fail)
+        self.assertEqual(flights.do('abc', lambda: 'ok'), ('ok', False))
+
+if __name__ == '__main__':
+    unittest.main()
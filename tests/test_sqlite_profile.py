@@ -0,0 +1,119 @@
+import unittest
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config import Config
+from backend.sqlite_profile import is_file_sqlite, sqlite_engine_options, apply_pragmas, init_sqlite_profile
+
+class SqliteProfileTestCase(unittest.TestCase):
+    """Test the managed SQLite profile"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'test.db')
+        self.app = Flask(__name__)
+        self.app.config.from_object(Config)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{self.path}'
+        self.app.config['SQLITE_MANAGED'] = True
+        self.checkpointer = None
+
+    def tearDown(self):
+        if self.checkpointer is not None:
+            self.checkpointer.stop()
+        self.tmpdir.cleanup()
+
+    def init_profile(self, **settings):
+        """Bind a fresh Flask-SQLAlchemy to the app the way create_app does"""
+        self.app.config.update(settings)
+        self.app.config['SQLALCHEMY_ENGINE_OPTIONS'] = sqlite_engine_options(self.app)
+        db = SQLAlchemy()
+        db.init_app(self.app)
+        self.checkpointer = init_sqlite_profile(self.app, db)
+        return db
+
+    def test_only_file_databases_are_managed(self):
+        """Test that in-memory SQLite and other databases are left alone"""
+        self.assertTrue(is_file_sqlite('sqlite:////var/lib/app/users.db'))
+        self.assertFalse(is_file_sqlite('sqlite:///:memory:'))
+        self.assertFalse(is_file_sqlite('sqlite://'))
+        self.assertFalse(is_file_sqlite('postgresql://user@localhost/app'))
+
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db = SQLAlchemy()
+        db.init_app(self.app)
+        self.assertIsNone(init_sqlite_profile(self.app, db))
+
+    def test_engine_options(self):
+        """Test pool sizing and connect arguments from config"""
+        self.app.config.update(SQLITE_POOL_SIZE=3, SQLITE_POOL_MAX_OVERFLOW=7, SQLITE_BUSY_TIMEOUT_MS=2500)
+        options = sqlite_engine_options(self.app)
+
+        self.assertEqual((options['pool_size'], options['max_overflow']), (3, 7))
+        self.assertTrue(options['pool_pre_ping'])
+        self.assertEqual(options['connect_args'], {'check_same_thread': False, 'timeout': 2.5})
+
+    def test_connect_pragmas(self):
+        """Test that every connection gets the configured pragmas"""
+        settings = {key: value for key, value in vars(Config).items() if key.startswith('SQLITE_')}
+        settings.update(SQLITE_SYNCHRONOUS='FULL', SQLITE_BUSY_TIMEOUT_MS=1234, SQLITE_CACHE_SIZE=-2048,
+                        SQLITE_WAL_AUTOCHECKPOINT=500)
+        connection = sqlite3.connect(self.path)
+        try:
+            apply_pragmas(connection, settings)
+            pragma = lambda name: connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+            self.assertEqual(pragma('journal_mode'), 'wal')
+            self.assertEqual(pragma('synchronous'), 2)  # FULL
+            self.assertEqual(pragma('busy_timeout'), 1234)
+            self.assertEqual(pragma('cache_size'), -2048)
+            self.assertEqual(pragma('wal_autocheckpoint'), 500)
+            # Constraint behaviour is the same as without the profile
+            self.assertEqual(pragma('foreign_keys'), 0)
+        finally:
+            connection.close()
+
+    def test_profile_applies_to_pooled_connections(self):
+        """Test that connections from the app's engine use WAL"""
+        db = self.init_profile(SQLITE_CHECKPOINT_INTERVAL=3600)
+        with self.app.app_context():
+            self.assertEqual(db.session.execute(text('PRAGMA journal_mode')).scalar(), 'wal')
+            self.assertEqual(db.session.execute(text('PRAGMA synchronous')).scalar(), 1)  # NORMAL
+            self.assertEqual(db.engine.pool.size(), Config.SQLITE_POOL_SIZE)
+
+    def test_checkpointer(self):
+        """Test PASSIVE checkpoints, TRUNCATE once the WAL is too large, and the background loop"""
+        db = self.init_profile(SQLITE_CHECKPOINT_INTERVAL=0.01, SQLITE_CHECKPOINT_TRUNCATE_BYTES=1)
+        with self.app.app_context():
+            db.session.execute(text('CREATE TABLE t (x INTEGER)'))
+            db.session.execute(text('INSERT INTO t VALUES (1)'))
+            db.session.commit()
+
+        deadline = time.time() + 5
+        while self.checkpointer.checkpoints == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertGreater(self.checkpointer.checkpoints, 0)
+        self.checkpointer.stop()
+
+        with self.app.app_context():
+            db.session.execute(text('INSERT INTO t VALUES (2)'))
+            db.session.commit()
+        self.checkpointer.truncate_bytes = 1 << 30
+        self.assertEqual(self.checkpointer.checkpoint()[0], 'PASSIVE')
+        self.assertGreater(os.path.getsize(self.checkpointer.wal_path), 0)
+        self.checkpointer.truncate_bytes = 1
+        mode, busy, _, _ = self.checkpointer.checkpoint()
+        self.assertEqual((mode, busy), ('TRUNCATE', 0))
+        self.assertEqual(os.path.getsize(self.checkpointer.wal_path), 0)
+
+if __name__ == '__main__':
+    unittest.main()
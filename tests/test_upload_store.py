@@ -0,0 +1,200 @@
+import unittest
+import hashlib
+import io
+import os
+import sys
+import tempfile
+
+from flask import Flask, request, jsonify
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Backend modules import each other by flat name, as when run from backend/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend'))
+
+from backend.upload_store import UploadStore, streaming_request_class, file_references
+from models import db, StoredFile
+
+class UploadStoreTestCase(unittest.TestCase):
+    """Test content-addressed upload staging"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = UploadStore(self.tmpdir.name)
+        self.app = Flask(__name__)
+        self.app.request_class = streaming_request_class(self.store)
+
+        @self.app.route('/upload', methods=['POST'])
+        def upload():
+            file = request.files['file']
+            if request.args.get('reject'):
+                return jsonify({'error': 'rejected'}), 400
+            staged = self.store.stage(file.stream, 'png')
+            self.store.commit(staged)
+            return jsonify({'hash': staged.content_hash, 'size': staged.size, 'path': staged.relpath})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def post(self, data, query=''):
+        return self.app.test_client().post(
+            f'/upload{query}', data={'file': (io.BytesIO(data), 'a.png')},
+            content_type='multipart/form-data'
+        )
+
+    def test_upload_hashed_while_received(self):
+        """Test that a streamed upload is hashed and stored without a copy"""
+        data = os.urandom(300 * 1024)
+        result = self.post(data).get_json()
+
+        self.assertEqual(result['hash'], hashlib.sha256(data).hexdigest())
+        self.assertEqual(result['size'], len(data))
+        with open(self.store.abspath(result['path']), 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(os.listdir(self.store.temp_dir), [])
+
+    def test_unclaimed_upload_removed(self):
+        """Test that a rejected request leaves no temp file behind"""
+        response = self.post(b'data', query='?reject=1')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(os.listdir(self.store.temp_dir), [])
+
+    def test_stage_copies_other_streams(self):
+        """Test that plain streams are copied into the temp area and hashed"""
+        staged = self.store.stage(io.BytesIO(b'same bytes'), 'png')
+
+        self.assertEqual(staged.content_hash, hashlib.sha256(b'same bytes').hexdigest())
+        self.assertTrue(os.path.exists(staged.temp_path))
+        self.store.discard(staged)
+        self.assertFalse(os.path.exists(staged.temp_path))
+
+    def test_extension_from_image_format(self):
+        """Test that identical bytes get one path whatever extension the client used"""
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (8, 8), (10, 20, 30)).save(buffer, format='PNG')
+        png = buffer.getvalue()
+
+        first = self.store.stage(io.BytesIO(png))
+        second = self.store.stage(io.BytesIO(png))
+        self.assertEqual(first.relpath, self.store.path_for(first.content_hash, 'png'))
+        self.assertEqual(second.relpath, first.relpath)
+
+        # A copy stored by an older version under the client's extension is reused
+        legacy = self.store.path_for(first.content_hash, 'jpeg')
+        os.makedirs(os.path.dirname(self.store.abspath(legacy)))
+        open(self.store.abspath(legacy), 'wb').close()
+        open(self.store.abspath(self.store.rendition_path(legacy)), 'wb').close()
+        self.assertEqual(self.store.stage(io.BytesIO(png)).relpath, legacy)
+
+    def test_non_image_rejected_without_extension(self):
+        """Test that sniffing fails for bytes that are not a supported image, leaving no temp file"""
+        with self.assertRaises(ValueError):
+            self.store.stage(io.BytesIO(b'not an image'))
+        self.assertEqual(os.listdir(self.store.temp_dir), [])
+
+class StoredFileReferenceTestCase(unittest.TestCase):
+    """Test deduplicated commits and reference-counted release of stored uploads"""
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.store = UploadStore(self.tmpdir.name)
+        self.app = Flask(__name__)
+        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+        db.init_app(self.app)
+        self.context = self.app.app_context()
+        self.context.push()
+        db.create_all()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+        self.tmpdir.cleanup()
+
+    def upload(self, data):
+        """Stage, reference and commit an upload the way the detect route does"""
+        staged = self.store.stage(io.BytesIO(data), 'png')
+        StoredFile.acquire(db.session, file_references([{'content_hash': staged.content_hash, 'filename': staged.relpath}]))
+        db.session.commit()
+        self.store.commit(staged)
+        return staged
+
+    def release(self, staged, on_drop=None):
+        """Drop one reference and unlink the file if it was the last"""
+        StoredFile.release(db.session, staged.content_hash)
+        db.session.commit()
+
+        def drop_reference():
+            if on_drop is not None:
+                on_drop()
+            return StoredFile.drop_if_unreferenced(db.session, staged.content_hash)
+
+        return self.store.release(staged.relpath, drop_reference)
+
+    def ref_count(self, content_hash):
+        row = db.session.get(StoredFile, content_hash)
+        db.session.expire_all()
+        return row.ref_count if row is not None else None
+
+    def test_identical_uploads_stored_once(self):
+        """Test that identical bytes share one file and one row with a count per reference"""
+        first, second = self.upload(b'same bytes'), self.upload(b'same bytes')
+
+        self.assertEqual(first.relpath, second.relpath)
+        self.assertEqual(self.ref_count(first.content_hash), 2)
+        self.assertTrue(os.path.exists(self.store.abspath(first.relpath)))
+        self.assertEqual(os.listdir(self.store.temp_dir), [])
+
+        counts = file_references([{'content_hash': 'a', 'filename': 'a.png'}] * 3 + [{'filename': 'legacy.png'}])
+        self.assertEqual(counts, [('a', 'a.png', 3)])
+
+    def test_last_reference_unlinks_file(self):
+        """Test that the file and its renditions go only with the last reference"""
+        first, second = self.upload(b'shared'), self.upload(b'shared')
+        path = self.store.abspath(first.relpath)
+        rendition = self.store.abspath(self.store.rendition_path(first.relpath))
+        open(rendition, 'wb').close()
+
+        self.assertFalse(self.release(first))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(self.ref_count(first.content_hash), 1)
+
+        self.assertTrue(self.release(second))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(os.path.exists(rendition))
+        self.assertIsNone(self.ref_count(first.content_hash))
+        self.assertEqual(os.listdir(self.store.temp_dir), [])
+
+    def test_reacquired_during_release_keeps_file(self):
+        """Test that an upload of the same bytes racing with the last release keeps the file"""
+        staged = self.upload(b'raced')
+        path = self.store.abspath(staged.relpath)
+
+        def concurrent_upload():
+            # The file is tombstoned at this point, so the racing upload writes its own copy
+            self.assertFalse(os.path.exists(path))
+            self.upload(b'raced')
+
+        self.assertFalse(self.release(staged, on_drop=concurrent_upload))
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'raced')
+        self.assertEqual(self.ref_count(staged.content_hash), 1)
+        self.assertEqual(os.listdir(self.store.temp_dir), [])
+
+    def test_reference_added_without_copy_restores_file(self):
+        """Test that a reference added while the file is tombstoned puts the bytes back"""
+        staged = self.upload(b'raced')
+
+        def concurrent_reference():
+            StoredFile.acquire(db.session, [(staged.content_hash, staged.relpath, 1)])
+            db.session.commit()
+
+        self.assertFalse(self.release(staged, on_drop=concurrent_reference))
+        self.assertTrue(os.path.exists(self.store.abspath(staged.relpath)))
+        self.assertEqual(self.ref_count(staged.content_hash), 1)
+        self.assertEqual(os.listdir(self.store.temp_dir), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.user_cache import UserCache
+
+class UserCacheTestCase(unittest.TestCase):
+    """Test the per-worker user principal cache"""
+
+    def setUp(self):
+        self.loads = 0
+
+    def loader(self, value='user'):
+        def load():
+            self.loads += 1
+            return value
+        return load
+
+    def test_hit_after_first_load(self):
+        """Test that repeated lookups are served from the cache"""
+        cache = UserCache(ttl=60)
+        cache.get('u1', self.loader())
+        cache.get('u1', self.loader())
+
+        self.assertEqual(self.loads, 1)
+        self.assertEqual(cache.stats()['hit_rate'], 0.5)
+
+    def test_invalidate_forces_reload(self):
+        """Test that invalidation drops the cached user"""
+        cache = UserCache(ttl=60)
+        cache.get('u1', self.loader())
+        cache.invalidate('u1')
+        cache.get('u1', self.loader())
+
+        self.assertEqual(self.loads, 2)
+        self.assertEqual(cache.stats()['invalidations'], 1)
+
+    def test_expired_entry_reloads(self):
+        """Test that entries expire after the TTL"""
+        cache = UserCache(ttl=0.01)
+        cache.get('u1', self.loader())
+        import time
+        time.sleep(0.02)
+        cache.get('u1', self.loader())
+
+        self.assertEqual(self.loads, 2)
+
+    def test_missing_user_not_cached(self):
+        """Test that unknown users are looked up every time"""
+        cache = UserCache(ttl=60)
+        self.assertIsNone(cache.get('ghost', self.loader(None)))
+        self.assertIsNone(cache.get('ghost', self.loader(None)))
+
+        self.assertEqual(self.loads, 2)
+
+    def test_lru_eviction(self):
+        """Test that the cache stays within max_size"""
+        cache = UserCache(ttl=60, max_size=2)
+        for user_id in ('a', 'b', 'c'):
+            cache.get(user_id, self.loader(user_id))
+
+        self.assertEqual(cache.stats()['size'], 2)
+        cache.get('a', self.loader('a'))
+        self.assertEqual(self.loads, 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import unittest
+import os
+import sys
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.vector_index import VectorIndex, pack_embedding
+
+def unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+class VectorIndexTestCase(unittest.TestCase):
+    """Test the per-user similarity index"""
+
+    def setUp(self):
+        self.stored = {
+            'u1': {
+                'a': unit([1, 0, 0]),
+                'b': unit([0.9, 0.1, 0]),
+                'c': unit([0, 1, 0]),
+                'd': unit([0.5, 0.5, 0]),
+            },
+            'u2': {'x': unit([1, 0, 0])},
+        }
+
+        def loader(user_id):
+            vectors = self.stored.get(user_id, {})
+            return list(vectors), [pack_embedding(v) for v in vectors.values()]
+
+        self.index = VectorIndex(loader, max_users=1)
+
+    def test_search_orders_by_similarity(self):
+        """Test that results are the nearest neighbours, best first, without the query"""
+        results = self.index.search('u1', 0, 'a', k=2)
+
+        self.assertEqual([detection_id for detection_id, _ in results], ['b', 'd'])
+        self.assertAlmostEqual(results[0][1], float(unit([0.9, 0.1, 0]) @ unit([1, 0, 0])), places=3)
+
+    def test_search_stays_within_user(self):
+        """Test that other users' detections are never returned"""
+        self.assertIsNone(self.index.search('u2', 0, 'a'))
+        self.assertEqual(self.index.search('u2', 0, 'x'), [])
+
+    def test_reload_on_version_change(self):
+        """Test that a new data version reloads the user's vectors"""
+        self.index.search('u1', 0, 'a')
+        self.index.search('u1', 0, 'b')
+        self.assertEqual(self.index.loads, 1)
+
+        self.stored['u1']['e'] = unit([1, 0.01, 0])
+        results = self.index.search('u1', 1, 'a', k=1)
+        self.assertEqual(results[0][0], 'e')
+        self.assertEqual(self.index.loads, 2)
+
+    def test_add_appends_without_reload(self):
+        """Test that inserts made by this worker extend the cached partition"""
+        self.index.search('u1', 0, 'a')
+        for i in range(20):
+            self.index.add('u1', i + 1, [f'n{i}'], [pack_embedding(unit([0, 0, 1 + i]))])
+        self.index.add('u1', 21, ['e'], [pack_embedding(unit([1, 0.01, 0]))])
+
+        self.assertEqual(self.index.search('u1', 21, 'a', k=1)[0][0], 'e')
+        self.assertEqual(self.index.search('u1', 21, 'n0', k=1)[0][0][0], 'n')
+        self.assertEqual(self.index.loads, 1)
+
+    def test_add_skips_stale_partition(self):
+        """Test that a partition missing another worker's write is reloaded, not extended"""
+        self.index.search('u1', 0, 'a')
+        self.stored['u1']['e'] = unit([1, 0.01, 0])
+        self.index.add('u1', 2, ['f'], [pack_embedding(unit([0, 0, 1]))])
+
+        self.assertEqual(self.index.search('u1', 2, 'a', k=1)[0][0], 'e')
+        self.assertIsNone(self.index.search('u1', 2, 'f'))
+        self.assertEqual(self.index.loads, 2)
+
+    def test_remove_drops_detection(self):
+        """Test that deletes made by this worker rebuild the partition in memory"""
+        self.index.search('u1', 0, 'a')
+        self.index.remove('u1', 1, 'b')
+
+        self.assertEqual([d for d, _ in self.index.search('u1', 1, 'a')], ['d', 'c'])
+        self.assertIsNone(self.index.search('u1', 1, 'b'))
+        self.assertEqual(self.index.search('u1', 1, 'c', k=1)[0][0], 'd')
+        self.assertEqual(self.index.loads, 1)
+
+    def test_search_stays_within_model_version(self):
+        """Test that embeddings of different model versions are never compared"""
+        stored = [('a', unit([1, 0, 0]), 'v1'), ('b', unit([1, 0.1, 0]), 'v1'),
+                  ('c', unit([1, 0, 0, 0]), 'v2'), ('d', unit([1, 0.2, 0, 0]), 'v2')]
+
+        def loader(user_id):
+            return ([d for d, _, _ in stored], [pack_embedding(v) for _, v, _ in stored],
+                    [model_version for _, _, model_version in stored])
+
+        index = VectorIndex(loader)
+        self.assertEqual([d for d, _ in index.search('u1', 0, 'a')], ['b'])
+        self.assertEqual([d for d, _ in index.search('u1', 0, 'd')], ['c'])
+
+    def test_lru_eviction(self):
+        """Test that least recently used partitions are dropped"""
+        self.index.search('u1', 0, 'a')
+        self.index.search('u2', 0, 'x')
+        self.index.search('u1', 0, 'a')
+        self.assertEqual(self.index.loads, 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import os
+import sys
+import threading
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.write_buffer import DetectionWriteBuffer
+
+class DetectionWriteBufferTestCase(unittest.TestCase):
+    """Test write-behind batching of detection records"""
+
+    def setUp(self):
+        self.batches = []
+        self.flushed = threading.Event()
+
+    def record_batch(self, rows):
+        self.batches.append(rows)
+        self.flushed.set()
+
+    def test_submit_returns_id_before_commit(self):
+        """Test that an id is assigned before the row is flushed"""
+        buffer = DetectionWriteBuffer(self.record_batch, max_batch=100, flush_interval_ms=60000)
+        detection_id = buffer.submit({'prediction': 'REAL'})
+
+        self.assertTrue(detection_id)
+        self.assertEqual(self.batches, [])
+        self.assertEqual(buffer.pending_count(), 1)
+        buffer.close()
+
+    def test_flush_on_batch_size(self):
+        """Test that reaching max_batch triggers a group commit"""
+        buffer = DetectionWriteBuffer(self.record_batch, max_batch=3, flush_interval_ms=60000)
+        ids = [buffer.submit({'prediction': 'REAL'}) for _ in range(3)]
+
+        self.assertTrue(self.flushed.wait(5))
+        self.assertEqual([row['id'] for row in self.batches[0]], ids)
+        buffer.close()
+
+    def test_flush_on_interval(self):
+        """Test that pending rows are flushed after the interval"""
+        buffer = DetectionWriteBuffer(self.record_batch, max_batch=100, flush_interval_ms=20)
+        buffer.submit({'prediction': 'DEEPFAKE'})
+
+        self.assertTrue(self.flushed.wait(5))
+        self.assertEqual(len(self.batches[0]), 1)
+        buffer.close()
+
+    def test_close_flushes_pending(self):
+        """Test that shutdown persists everything still buffered"""
+        buffer = DetectionWriteBuffer(self.record_batch, max_batch=100, flush_interval_ms=60000)
+        buffer.submit({'prediction': 'REAL'})
+        buffer.submit({'prediction': 'REAL'})
+        buffer.close()
+
+        self.assertEqual(sum(len(batch) for batch in self.batches), 2)
+        self.assertEqual(buffer.flushed_records, 2)
+        with self.assertRaises(RuntimeError):
+            buffer.submit({'prediction': 'REAL'})
+
+    def test_failed_flush_is_counted(self):
+        """Test that a failing flush does not kill the buffer"""
+        def fail(rows):
+            raise IOError('disk full')
+
+        buffer = DetectionWriteBuffer(fail, max_batch=100, flush_interval_ms=60000)
+        buffer.submit({'prediction': 'REAL'})
+        buffer.close()
+
+        self.assertEqual(buffer.failed_records, 1)
+
+    def test_on_flushed_reports_dropped_records(self):
+        """Test that each record's callback learns whether its row was stored"""
+        outcomes = {}
+
+        def drop_second(rows):
+            return [rows[1]['id']]
+
+        buffer = DetectionWriteBuffer(drop_second, max_batch=100, flush_interval_ms=60000)
+        ids = [buffer.submit({'prediction': 'REAL'}, lambda stored, i=i: outcomes.__setitem__(i, stored))
+               for i in range(3)]
+        buffer.close()
+
+        self.assertEqual(outcomes, {0: True, 1: False, 2: True})
+        self.assertEqual((buffer.flushed_records, buffer.failed_records), (2, 1))
+        self.assertEqual(len(ids), 3)
+
+    def test_on_flushed_after_failed_flush(self):
+        """Test that a failing flush reports every record of the batch as dropped"""
+        outcomes = []
+
+        def fail(rows):
+            raise IOError('disk full')
+
+        buffer = DetectionWriteBuffer(fail, max_batch=100, flush_interval_ms=60000)
+        buffer.submit({'prediction': 'REAL'}, outcomes.append)
+        buffer.close()
+
+        self.assertEqual(outcomes, [False])
+
+if __name__ == '__main__':
+    unittest.main()